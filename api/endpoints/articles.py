@@ -7,7 +7,9 @@ from sqlalchemy.orm import Session
 from api.utils.db_utils import get_db, check_results
 from api.utils.repositories.article_repository import ArticleRepository
 from db.models.models import Article, SentimentAnalysis
+from lib.logger import get_logger
 
+logger = get_logger(__name__)
 router = APIRouter()
 article_repository = ArticleRepository()
 
@@ -18,7 +20,7 @@ async def get_article_tooltip(article_id: str, db: Session = Depends(get_db)) ->
     Fetch basic article information for tooltip display
     """
     # Log request parameters
-    print(f"Article id: {article_id}")
+    logger.debug("Article tooltip requested", extra={"article_id": article_id})
 
     # Get tooltip data from repository
     result = article_repository.get_with_tooltip(db, article_id)
@@ -32,7 +34,7 @@ async def get_article_detail(article_id: str, db: Session = Depends(get_db)) ->
     """
     Fetch detailed article information including sentiments and media details.
     """
-    print(f"Article id: {article_id}")
+    logger.debug("Article detail requested", extra={"article_id": article_id})
 
     # Get full article details from repository
     result = article_repository.get_full_article_detail(db, article_id)
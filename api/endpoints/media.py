@@ -1,91 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload, Session
+from sqlalchemy.orm import Session
 
-from api.utils.db_utils import get_db_session
-from db.models.models import Media, ChiefEditorHistory, SentimentAnalysis, Article
+from api.utils.db_utils import get_db
+from api.utils.repositories.media_repository import MediaRepository
+from lib.logger import get_logger
 
+logger = get_logger(__name__)
 router = APIRouter()
+media_repository = MediaRepository()
 
 
 @router.get("/")
-async def get_media_list(db: Session = Depends(get_db_session)):
+async def get_media_list(db: Session = Depends(get_db)):
     """
     Fetch list of media along with the count of analyzed and total articles.
     """
-    media_list = (
-        db.query(
-            Media,
-            func.count(Article.id).label("total_count"),
-            func.count(SentimentAnalysis.id).label("analyzed_count"),
-        )
-        .outerjoin(Article, Article.media_id == Media.id)
-        .outerjoin(SentimentAnalysis, SentimentAnalysis.article_id == Article.id)
-        .options(joinedload(Media.chief_editors))
-        .group_by(Media.id, Media.title, Media.base_url, Media.description, Media.slug, Media.language_code)
-        .all()
-    )
-
-    # Convert result to a list of dictionaries
-    result = [
-        {
-            "id": media.id,
-            "title": media.title,
-            "slug": media.slug,
-            "description": media.description,
-            "total_count": total_count,
-            "analyzed_count": analyzed_count,
-            "language_code": media.language_code,
-            "editors": media.chief_editors,
-        }
-        for media, total_count, analyzed_count in media_list
-    ]
-
-    return {"media": result}
+    return {"media": media_repository.get_list_with_counts(db)}
 
 
 @router.get("/{media_slug}/")
-async def get_media(media_slug: str):
+async def get_media(media_slug: str, db: Session = Depends(get_db)):
     """
     Fetch basic article information for tooltip display
     """
     # Log request parameters
-    print(f"Media slug: {media_slug}")
+    logger.debug("Media requested", extra={"media_slug": media_slug})
 
-    session = get_db_session()
+    result = media_repository.get_by_slug_with_counts(db, media_slug)
 
-    # Start with the base query
-    result = (
-        session
-        .query(
-            Media,
-            func.count(Article.id).label("total_count"),
-            func.count(SentimentAnalysis.id).label("analyzed_count"),
-        )
-        .outerjoin(Article, Article.media_id == Media.id)
-        .outerjoin(SentimentAnalysis, SentimentAnalysis.article_id == Article.id)
-        .filter(Media.slug == media_slug)
-        .group_by(Media.id, Media.title, Media.base_url, Media.description, Media.slug, Media.language_code)
-        .first()
-    )
-    
     # Check if media exists
     if result is None:
         raise HTTPException(status_code=404, detail=f"Media with slug '{media_slug}' not found")
-    
-    media, total_count, analyzed_count = result
-
-    chief_editors = (
-        session
-        .query(ChiefEditorHistory)
-        .filter(ChiefEditorHistory.media_id == media.id)
-        .all()
-    )
 
-    # Prepare the result data
-    return {
-        "media": media,
-        "chief_editors": chief_editors,
-        "total_count": total_count,
-        "analyzed_count": analyzed_count,
-    }
+    return result
@@ -1,13 +1,17 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal
 
 from fastapi import APIRouter, Query, Depends
 from sqlalchemy.orm import Session
 
 from api.utils.db_utils import get_db, check_results, FilterParams
+from api.utils.repositories.co_mention_repository import CoMentionRepository
 from api.utils.repositories.sentiment_repository import SentimentRepository
+from lib.logger import get_logger
 
+logger = get_logger(__name__)
 router = APIRouter()
 sentiment_repository = SentimentRepository()
+co_mention_repository = CoMentionRepository()
 
 
 @router.get("/daily-stats/media/{media_id}")
@@ -20,8 +24,9 @@ async def get_daily_article_and_sentiment_stats(
 ) -> List[Dict[str, Any]]:
     """Get daily counts of articles and their sentiment analyses"""
     # Log request parameters
-    print(
-        f"Media IDs: {media_id}, Paywall: {paywall}, Start Date: {start_date}, End Date: {end_date}")
+    logger.debug("Daily stats requested", extra={
+        "media_id": media_id, "paywall": paywall, "start_date": start_date, "end_date": end_date
+    })
 
     # Create filter parameters
     filters = FilterParams(
@@ -40,7 +45,7 @@ async def get_daily_article_and_sentiment_stats(
 
 @router.get("/parties/")
 async def get_party_sentiment(
-        media_id: int = Query(1),
+        media_id: List[int] = Query([1], description="One or more media ids, several are compared per media"),
         parties: List[str] = Query([], description="List of party names"),
         start_date: str = None,
         end_date: str = None,
@@ -52,8 +57,9 @@ async def get_party_sentiment(
     If parties list is empty, returns sentiment data for all parties.
     """
     # Log request parameters
-    print(
-        f"Parties: {parties}, Start Date: {start_date}, End Date: {end_date}, Paywall: {paywall}")
+    logger.debug("Party sentiment requested", extra={
+        "media_id": media_id, "parties": parties, "start_date": start_date, "end_date": end_date, "paywall": paywall
+    })
 
     # Create filter parameters
     filters = FilterParams(
@@ -72,7 +78,7 @@ async def get_party_sentiment(
 
 @router.get("/parties/summary/")
 async def get_party_sentiment_summary(
-        media_id: int = Query(...),
+        media_id: List[int] = Query(..., description="One or more media ids, several are compared per media"),
         start_date: str = None,
         end_date: str = None,
         paywall: bool = False,
@@ -82,8 +88,9 @@ async def get_party_sentiment_summary(
     Fetch sentiment data summary for all parties.
     """
     # Log request parameters
-    print(
-        f"Media ID: {media_id}, Start Date: {start_date}, End Date: {end_date}, Paywall: {paywall}")
+    logger.debug("Party sentiment summary requested", extra={
+        "media_id": media_id, "start_date": start_date, "end_date": end_date, "paywall": paywall
+    })
 
     # Create filter parameters
     filters = FilterParams(
@@ -102,7 +109,7 @@ async def get_party_sentiment_summary(
 
 @router.get("/parties/progress/")
 async def get_party_sentiment_progress(
-        media_id: int = Query(...),
+        media_id: List[int] = Query(..., description="One or more media ids, several are compared per media"),
         parties: List[str] = Query([], description="List of party names"),
         start_date: str = None,
         end_date: str = None,
@@ -114,8 +121,9 @@ async def get_party_sentiment_progress(
     If parties list is empty, returns sentiment data for all parties.
     """
     # Log request parameters
-    print(
-        f"Media ID: {media_id}, Parties: {parties}, Start Date: {start_date}, End Date: {end_date}, Paywall: {paywall}")
+    logger.debug("Party sentiment progress requested", extra={
+        "media_id": media_id, "parties": parties, "start_date": start_date, "end_date": end_date, "paywall": paywall
+    })
 
     # Create filter parameters
     filters = FilterParams(
@@ -132,19 +140,58 @@ async def get_party_sentiment_progress(
     return results
 
 
+@router.get("/parties/trend/")
+async def get_party_sentiment_trend(
+        media_id: List[int] = Query(..., description="One or more media ids, several are compared per media"),
+        parties: List[str] = Query([], description="List of party names"),
+        bucket: Literal["day", "week", "month"] = Query("month", description="Bucket size of the trend"),
+        start_date: str = None,
+        end_date: str = None,
+        paywall: bool = False,
+        db: Session = Depends(get_db)
+) -> List[Dict[str, Any]]:
+    """
+    Fetch per-party sentiment statistics over time: mean, median, p10, p90 and
+    mention count of the scores in every day, week or month.
+    If parties list is empty, returns the trend of all parties.
+    """
+    # Log request parameters
+    logger.debug("Party sentiment trend requested", extra={
+        "media_id": media_id, "parties": parties, "bucket": bucket,
+        "start_date": start_date, "end_date": end_date, "paywall": paywall
+    })
+
+    # Create filter parameters
+    filters = FilterParams(
+        media_id=media_id,
+        paywall=paywall,
+        start_date=start_date,
+        end_date=end_date
+    )
+
+    # Get data from repository
+    results = sentiment_repository.get_party_sentiment_trend(db, parties, filters, bucket)
+    check_results(results)
+
+    return results
+
+
 @router.get("/summary/")
 async def get_sentiment_summary(
-        media_id: int = Query(...),
+        media_id: List[int] = Query(..., description="One or more media ids, several are compared per media"),
         start_date: str = None,
         end_date: str = None,
         db: Session = Depends(get_db)
-) -> Dict[int, int]:
+) -> Dict[int, Any]:
     """
     Get summary of sentiment counts for a media.
-    Returns a dictionary where keys are sentiment scores and values are counts.
+    Returns a dictionary where keys are sentiment scores and values are counts,
+    keyed by media id first when several medias are requested.
     """
     # Log request parameters
-    print(f"Media ID: {media_id}, Start Date: {start_date}, End Date: {end_date}")
+    logger.debug("Sentiment summary requested", extra={
+        "media_id": media_id, "start_date": start_date, "end_date": end_date
+    })
 
     # Create filter parameters
     filters = FilterParams(
@@ -161,7 +208,7 @@ async def get_sentiment_summary(
 
 @router.get("/politicians/summary/")
 async def get_politician_mention_summary(
-        media_id: int = Query(...),
+        media_id: List[int] = Query(..., description="One or more media ids, several are compared per media"),
         start_date: str = None,
         end_date: str = None,
         paywall: bool = False,
@@ -173,8 +220,9 @@ async def get_politician_mention_summary(
     Returns a list of politicians with their sentiment score distribution, limited to N most mentioned.
     """
     # Log request parameters
-    print(
-        f"Media ID: {media_id}, Start Date: {start_date}, End Date: {end_date}, Paywall: {paywall}, Limit: {limit}")
+    logger.debug("Politician mention summary requested", extra={
+        "media_id": media_id, "start_date": start_date, "end_date": end_date, "paywall": paywall, "limit": limit
+    })
 
     # Create filter parameters
     filters = FilterParams(
@@ -188,4 +236,36 @@ async def get_politician_mention_summary(
     results = sentiment_repository.get_politician_mention_summary(db, filters, limit)
     check_results(results)
     
-    return results
\ No newline at end of file
+    return results
+
+@router.get("/co-mentions/")
+async def get_co_mention_graph(
+        media_id: List[int] = Query(..., description="One or more media ids, their co-mentions are summed"),
+        start_date: str = None,
+        end_date: str = None,
+        top_k: int = Query(50, ge=1, le=500, description="Number of most frequent pairs to return"),
+        min_count: int = Query(1, ge=1, description="Minimum number of co-mentions of a pair"),
+        db: Session = Depends(get_db)
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Fetch the graph of parties and politicians mentioned in the same articles.
+    Returns nodes and the `top_k` heaviest edges with their co-mention count and the
+    mean score of both entities. Dates are matched by whole months.
+    """
+    # Log request parameters
+    logger.debug("Co-mention graph requested", extra={
+        "media_id": media_id, "start_date": start_date, "end_date": end_date, "top_k": top_k, "min_count": min_count
+    })
+
+    # Create filter parameters
+    filters = FilterParams(
+        media_id=media_id,
+        start_date=start_date,
+        end_date=end_date
+    )
+
+    # Get data from repository
+    results = co_mention_repository.get_graph(db, filters, top_k, min_count)
+    check_results(results)
+
+    return results
@@ -1,8 +1,17 @@
 # uvicorn api.main:app --reload
-from fastapi import FastAPI
+import asyncio
+import os
+import signal
+import time
+
+from fastapi import FastAPI, Request
 from starlette.middleware.cors import CORSMiddleware
 
 from api.endpoints import articles, sentiments, media
+from api.utils.db_utils import db_session
+from lib.logger import correlation_id, get_logger, set_correlation_id, reset_correlation_id
+
+logger = get_logger(__name__)
 
 app = FastAPI()
 app.add_middleware(
@@ -18,6 +27,57 @@ app.include_router(articles.router, prefix="/articles", tags=["articles"])
 app.include_router(sentiments.router, prefix="/sentiments", tags=["sentiments"])
 app.include_router(media.router, prefix="/media", tags=["media"])
 
+
+def refresh_analytics_snapshot():
+    """Load a new analytics snapshot and swap it in, requests keep using the old one meanwhile"""
+    try:
+        # Imported here, the snapshot columns are only loaded with the snapshot enabled
+        from api.utils.analytics_snapshot import AnalyticsSnapshot
+
+        with db_session() as session:
+            sentiments.sentiment_repository.snapshot = AnalyticsSnapshot.load(session)
+    except Exception:
+        # Summaries keep being answered, from the previous snapshot or the database
+        logger.exception("Analytics snapshot refresh failed")
+
+
+@app.on_event("startup")
+async def load_analytics_snapshot():
+    """Answer score summaries from memory with ANALYTICS_SNAPSHOT=on, `kill -HUP` reloads the snapshot"""
+    if os.getenv("ANALYTICS_SNAPSHOT", "off") != "on":
+        return
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, refresh_analytics_snapshot)
+    if hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, lambda: loop.run_in_executor(None, refresh_analytics_snapshot))
+
+
+@app.middleware("http")
+async def log_requests(request: Request, call_next):
+    """
+    Bind a request id to every log record and log request timings
+    """
+    token = set_correlation_id(request.headers.get("x-request-id"))
+    started_at = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        logger.exception("Unhandled error", extra={"method": request.method, "path": request.url.path})
+        raise
+    else:
+        response.headers["X-Request-ID"] = correlation_id.get()
+        logger.info("Request handled", extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+        })
+        return response
+    finally:
+        reset_correlation_id(token)
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Transparency API"}
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+In-memory analytics snapshot of party and politician mentions.
+
+Every mention row is loaded once into compact NumPy columns (entity id, media,
+paywall flag, category code, timestamp, score), and the score summaries of
+`SentimentRepository` are answered with vectorized filters and `np.bincount`
+instead of a database round trip. Answers are those of the SQL path as of the
+moment the snapshot was loaded.
+
+The API loads a snapshot at startup when ANALYTICS_SNAPSHOT=on and reloads it
+on SIGHUP.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import Integer, case, cast, func, select
+from sqlalchemy.orm import Session
+
+from api.utils.db_utils import FilterParams
+from api.utils.repositories.sentiment_repository import VALID_SCORES
+from db.models.models import Parties, PartyAnalysis, Politicians, PoliticianAnalysis
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+SCORES = len(VALID_SCORES)
+# Stands for unresolved entities, unknown categories and scores off the 0-10 scale
+MISSING = -1
+# Rows are fetched from the database in chunks of this size
+LOAD_CHUNK = 100_000
+
+# Rows shaped like the ones of the SQL queries they replace
+ScoreTotal = namedtuple("ScoreTotal", ["sentiment_score", "count", "media_id"])
+MonthlyScores = namedtuple("MonthlyScores", ["date", "entity_id", *[f"score_{i}" for i in range(SCORES)], "media_id"])
+
+
+def parse_timestamp(value: str) -> np.datetime64:
+    # Like the cast to `timestamp` of the SQL filters, an offset is dropped
+    return np.datetime64(datetime.fromisoformat(value).replace(tzinfo=None), "us")
+
+
+def count_by(keys: List[np.ndarray], sizes: List[int]) -> np.ndarray:
+    """Row counts of every combination of small non-negative integer keys, as a dense array of shape `sizes`"""
+    flat = np.ravel_multi_index(keys, sizes) if len(keys[0]) else np.zeros(0, dtype=np.intp)
+    return np.bincount(flat, minlength=int(np.prod(sizes))).reshape(sizes)
+
+
+class MentionColumns:
+    """Columns of one mention table, a row per party or politician mention"""
+
+    def __init__(
+        self,
+        entity_id: np.ndarray,
+        media_id: np.ndarray,
+        paywall: np.ndarray,
+        category: np.ndarray,
+        date_time: np.ndarray,
+        score: np.ndarray,
+        categories: Dict[str, int]
+    ):
+        self.entity_id = entity_id
+        self.media_id = media_id
+        self.paywall = paywall
+        self.category = category
+        self.date_time = date_time
+        self.score = score
+        self.categories = categories
+        self.entities = int(entity_id.max(initial=MISSING)) + 1
+
+    def __len__(self):
+        return len(self.entity_id)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (
+            self.entity_id, self.media_id, self.paywall, self.category, self.date_time, self.score
+        ))
+
+    @classmethod
+    def load(cls, db: Session, model, entity_column) -> "MentionColumns":
+        query = select(
+            func.coalesce(entity_column, MISSING),
+            model.media_id,
+            model.paywall,
+            func.coalesce(model.category, ""),
+            model.date_time,
+            case((model.score.in_(VALID_SCORES), cast(model.score, Integer)), else_=MISSING),
+        ).execution_options(yield_per=LOAD_CHUNK)
+
+        categories: Dict[str, int] = {}
+        chunks = {name: [] for name in ("entity_id", "media_id", "paywall", "category", "date_time", "score")}
+        for rows in db.execute(query).partitions():
+            entity_id, media_id, paywall, category, date_time, score = zip(*rows)
+            chunks["entity_id"].append(np.array(entity_id, dtype=np.int32))
+            chunks["media_id"].append(np.array(media_id, dtype=np.int16))
+            chunks["paywall"].append(np.array(paywall, dtype=bool))
+            chunks["category"].append(np.fromiter(
+                (categories.setdefault(value, len(categories)) for value in category), dtype=np.int32, count=len(rows)
+            ))
+            chunks["date_time"].append(np.array(date_time, dtype="datetime64[us]"))
+            chunks["score"].append(np.array(score, dtype=np.int8))
+
+        dtypes = {"entity_id": np.int32, "media_id": np.int16, "paywall": bool, "category": np.int32,
+                  "date_time": "datetime64[us]", "score": np.int8}
+        return cls(
+            **{name: np.concatenate(parts) if parts else np.zeros(0, dtype=dtypes[name]) for name, parts in chunks.items()},
+            categories=categories
+        )
+
+    def mask(self, filters: FilterParams, entity_ids: Optional[List[int]] = None) -> np.ndarray:
+        """Rows matching the filters, the same conditions as `QueryBuilder.apply_filters`"""
+        mask = np.ones(len(self), dtype=bool)
+        if filters.media_ids:
+            mask &= np.isin(self.media_id, filters.media_ids)
+        if filters.category:
+            mask &= self.category == self.categories.get(filters.category, MISSING)
+        if filters.paywall is not None:
+            mask &= self.paywall == filters.paywall
+        if filters.start_date:
+            mask &= self.date_time >= parse_timestamp(filters.start_date)
+        if filters.end_date:
+            mask &= self.date_time <= parse_timestamp(filters.end_date)
+        if entity_ids is not None:
+            mask &= np.isin(self.entity_id, entity_ids)
+        return mask
+
+
+class AnalyticsSnapshot:
+    """Party and politician mentions with their entity titles, keyed by model"""
+
+    def __init__(self, mentions: Dict[type, MentionColumns], titles: Dict[type, Dict[int, str]]):
+        self.mentions = mentions
+        self.titles = titles
+        self.loaded_at = datetime.now()
+
+    @classmethod
+    def load(cls, db: Session) -> "AnalyticsSnapshot":
+        started_at = time.perf_counter()
+        snapshot = cls(
+            mentions={
+                PartyAnalysis: MentionColumns.load(db, PartyAnalysis, PartyAnalysis.party_id),
+                PoliticianAnalysis: MentionColumns.load(db, PoliticianAnalysis, PoliticianAnalysis.politician_id),
+            },
+            titles={
+                Parties: dict(db.query(Parties.id, Parties.title).all()),
+                Politicians: dict(db.query(Politicians.id, Politicians.title).all()),
+            }
+        )
+        logger.info("Analytics snapshot loaded", extra={
+            "parties": len(snapshot.mentions[PartyAnalysis]),
+            "politicians": len(snapshot.mentions[PoliticianAnalysis]),
+            "size_mb": round(sum(columns.nbytes for columns in snapshot.mentions.values()) / 2 ** 20, 1),
+            "seconds": round(time.perf_counter() - started_at, 3),
+        })
+        return snapshot
+
+    @staticmethod
+    def _medias(columns: MentionColumns, mask: np.ndarray, filters: FilterParams):
+        """Dense media index of the masked rows and the media ids, a single group unless medias are compared"""
+        if not filters.compares_media:
+            return np.zeros(int(mask.sum()), dtype=np.intp), [None]
+        media_ids = sorted(filters.media_ids)
+        return np.searchsorted(media_ids, columns.media_id[mask]), media_ids
+
+    def score_counts(self, model, filters: FilterParams, entity_ids: Optional[List[int]] = None) -> list:
+        """
+        (entity_id, score, count) rows of the resolved mentions with a valid score,
+        (media_id, entity_id, score, count) rows when several medias are compared
+        """
+        columns = self.mentions[model]
+        mask = columns.mask(filters, entity_ids) & (columns.entity_id >= 0) & (columns.score >= 0)
+        media, media_ids = self._medias(columns, mask, filters)
+
+        counts = count_by(
+            [media, columns.entity_id[mask], columns.score[mask]],
+            [len(media_ids), columns.entities, SCORES]
+        )
+        return [
+            (*([media_ids[m]] if filters.compares_media else []), int(entity), int(score), int(counts[m, entity, score]))
+            for m, entity, score in zip(*np.nonzero(counts))
+        ]
+
+    def score_totals(self, model, filters: FilterParams) -> List[ScoreTotal]:
+        """Mention counts per valid score, resolved or not, per media when several medias are compared"""
+        columns = self.mentions[model]
+        mask = columns.mask(filters) & (columns.score >= 0)
+        media, media_ids = self._medias(columns, mask, filters)
+
+        counts = count_by([media, columns.score[mask]], [len(media_ids), SCORES])
+        return [
+            ScoreTotal(str(score), int(counts[m, score]), media_ids[m])
+            for m, score in zip(*np.nonzero(counts))
+        ]
+
+    def monthly_score_counts(
+        self,
+        model,
+        filters: FilterParams,
+        entity_ids: Optional[List[int]] = None
+    ) -> List[MonthlyScores]:
+        """Per month and resolved entity (and media when compared), the mention count of every score, by month"""
+        columns = self.mentions[model]
+        mask = columns.mask(filters, entity_ids) & (columns.entity_id >= 0)
+        if not mask.any():
+            return []
+        media, media_ids = self._medias(columns, mask, filters)
+
+        months = columns.date_time[mask].astype("datetime64[M]").astype(np.int64)
+        first_month = months.min()
+        # Mentions with an invalid score still make their group appear, in the extra last score slot
+        scores = columns.score[mask]
+        counts = count_by(
+            [months - first_month, columns.entity_id[mask], media, np.where(scores >= 0, scores, SCORES)],
+            [int(months.max() - first_month) + 1, columns.entities, len(media_ids), SCORES + 1]
+        )
+        return [
+            MonthlyScores(
+                str(np.datetime64(int(first_month + month), "M")),
+                int(entity),
+                *(int(count) for count in counts[month, entity, m, :SCORES]),
+                media_ids[m]
+            )
+            for month, entity, m in zip(*np.nonzero(counts.sum(axis=-1)))
+        ]
+
+    def top_entities(self, model, media_ids: List[int], limit: int) -> List[int]:
+        """Ids of the `limit` most mentioned resolved entities in the medias, ties by lowest id"""
+        columns = self.mentions[model]
+        mask = np.isin(columns.media_id, media_ids) & (columns.entity_id >= 0)
+        counts = np.bincount(columns.entity_id[mask], minlength=columns.entities)
+        # Stable sort on the negated counts keeps ascending ids within a count
+        ranked = np.argsort(-counts, kind="stable")[:limit]
+        return [int(entity) for entity in ranked if counts[entity]]
@@ -1,11 +1,9 @@
-import re
 from contextlib import contextmanager
-from typing import Any, Generic, List, Optional, Type, TypeVar
+from typing import Any, Generic, List, Optional, Type, TypeVar, Union
 
 from fastapi import HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session, Query
-from unidecode import unidecode
 
 from db.db_connector import DBConnector
 
@@ -55,33 +53,15 @@ def check_results(results, detail="No data found for the given parameters"):
     return results
 
 
-def slugify(text):
+class FilterParams:
     """
-    Convert text to a URL-friendly slug.
-    
-    Args:
-        text (str): The text to convert to a slug
-        
-    Returns:
-        str: A URL-friendly slug
+    Base class for common filter parameters.
+    `media_id` is a single media or a list of medias to compare.
     """
-    # Convert to ASCII
-    text = unidecode(text)
-    # Convert to lowercase
-    text = text.lower()
-    # Remove non-alphanumeric characters and replace with hyphens
-    text = re.sub(r'[^a-z0-9]+', '-', text)
-    # Remove leading/trailing hyphens
-    text = text.strip('-')
-    return text
-
-
-class FilterParams:
-    """Base class for common filter parameters"""
     
     def __init__(
         self,
-        media_id: Optional[int] = None,
+        media_id: Union[int, List[int], None] = None,
         category: Optional[str] = None,
         paywall: Optional[bool] = None,
         start_date: Optional[str] = None,
@@ -93,6 +73,19 @@ class FilterParams:
         self.start_date = start_date
         self.end_date = end_date
 
+    @property
+    def media_ids(self) -> List[int]:
+        if self.media_id is None:
+            return []
+        if isinstance(self.media_id, int):
+            return [self.media_id]
+        return list(dict.fromkeys(self.media_id))
+
+    @property
+    def compares_media(self) -> bool:
+        """Several medias are requested, results are grouped by media"""
+        return len(self.media_ids) > 1
+
 
 class QueryBuilder:
     """Helper class to build common queries with filters"""
@@ -100,8 +93,11 @@ class QueryBuilder:
     @staticmethod
     def apply_filters(query: Query, article, filters: FilterParams) -> Query:
         """Apply common filters to a query"""
-        if filters.media_id:
-            query = query.filter(article.media_id == filters.media_id)
+        media_ids = filters.media_ids
+        if len(media_ids) == 1:
+            query = query.filter(article.media_id == media_ids[0])
+        elif media_ids:
+            query = query.filter(article.media_id.in_(media_ids))
             
         if filters.category:
             query = query.filter(article.category == filters.category)
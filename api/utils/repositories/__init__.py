@@ -1,9 +1,11 @@
 from .article_repository import ArticleRepository
 from .sentiment_repository import SentimentRepository
 from .media_repository import MediaRepository
+from .co_mention_repository import CoMentionRepository
 
 __all__ = [
     "ArticleRepository",
     "SentimentRepository",
-    "MediaRepository"
+    "MediaRepository",
+    "CoMentionRepository"
 ]
\ No newline at end of file
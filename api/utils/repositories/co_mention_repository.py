@@ -0,0 +1,82 @@
+from datetime import date
+from typing import List, Dict, Any
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from api.utils.db_utils import BaseRepository, FilterParams
+from db.helpers.partitions import month_start
+from db.models.models import CoMention, Parties, Politicians
+
+
+class CoMentionRepository(BaseRepository[CoMention]):
+    """Repository for the precomputed co-mention graph of parties and politicians"""
+
+    def __init__(self):
+        super().__init__(CoMention)
+
+    @staticmethod
+    def _month(value: str) -> date:
+        return month_start(date.fromisoformat(value[:10]))
+
+    def get_graph(
+        self,
+        db: Session,
+        filters: FilterParams,
+        top_k: int = 50,
+        min_count: int = 1
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Get the `top_k` most frequent pairs of entities mentioned in the same analysis,
+        summed over the filtered medias and the months of the date range, as graph
+        nodes and weighted edges with the mean score of both entities in those analyses
+        """
+        count = func.sum(CoMention.count).label("count")
+        query = (
+            db.query(
+                CoMention.entity_a_type, CoMention.entity_a_id,
+                CoMention.entity_b_type, CoMention.entity_b_id,
+                count,
+                func.sum(CoMention.score_a_sum).label("score_a_sum"),
+                func.sum(CoMention.score_b_sum).label("score_b_sum"),
+            )
+            .group_by(CoMention.entity_a_type, CoMention.entity_a_id, CoMention.entity_b_type, CoMention.entity_b_id)
+            .having(count >= min_count)
+            .order_by(count.desc(), CoMention.entity_a_id, CoMention.entity_b_id)
+        )
+
+        # Counts are kept per media and month only, dates select whole months
+        if filters.media_ids:
+            query = query.filter(CoMention.media_id.in_(filters.media_ids))
+        if filters.start_date:
+            query = query.filter(CoMention.month >= self._month(filters.start_date))
+        if filters.end_date:
+            query = query.filter(CoMention.month <= self._month(filters.end_date))
+
+        results = query.limit(top_k).all()
+        titles = {
+            CoMention.PARTY: dict(db.query(Parties.id, Parties.title).all()),
+            CoMention.POLITICIAN: dict(db.query(Politicians.id, Politicians.title).all()),
+        }
+
+        # Format response
+        nodes, edges = {}, []
+        for row in results:
+            pair = ((row.entity_a_type, row.entity_a_id), (row.entity_b_type, row.entity_b_id))
+            for entity_type, entity_id in pair:
+                node = nodes.setdefault(f"{entity_type}:{entity_id}", {
+                    "id": f"{entity_type}:{entity_id}",
+                    "type": entity_type,
+                    "name": titles[entity_type].get(entity_id),
+                    "co_mentions": 0,
+                })
+                node["co_mentions"] += row.count
+            edges.append({
+                "source": f"{row.entity_a_type}:{row.entity_a_id}",
+                "target": f"{row.entity_b_type}:{row.entity_b_id}",
+                "count": row.count,
+                "source_mean": round(row.score_a_sum / row.count, 2),
+                "target_mean": round(row.score_b_sum / row.count, 2),
+            })
+
+        return {"nodes": list(nodes.values()), "edges": edges} if edges else {}
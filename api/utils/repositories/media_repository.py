@@ -1,9 +1,70 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
 from api.utils.db_utils import BaseRepository
-from db.models.models import Media
+from db.models.models import Media, MediaCounts, ChiefEditorHistory
 
 
 class MediaRepository(BaseRepository[Media]):
     """Repository for handling Media operations"""
-    
+
     def __init__(self):
-        super().__init__(Media)
\ No newline at end of file
+        super().__init__(Media)
+
+    @staticmethod
+    def _with_counts(db: Session):
+        """Media joined with the precomputed counts view"""
+        return (
+            db.query(
+                Media,
+                func.coalesce(MediaCounts.total_count, 0).label("total_count"),
+                func.coalesce(MediaCounts.analyzed_count, 0).label("analyzed_count"),
+            )
+            .outerjoin(MediaCounts, MediaCounts.media_id == Media.id)
+        )
+
+    def get_list_with_counts(self, db: Session) -> List[Dict[str, Any]]:
+        """Get all media with article counts and chief editors"""
+        media_list = self._with_counts(db).order_by(Media.id).all()
+
+        # Load editors in one small query instead of joining them into the count query
+        editors = defaultdict(list)
+        for editor in db.query(ChiefEditorHistory).order_by(ChiefEditorHistory.id).all():
+            editors[editor.media_id].append(editor)
+
+        return [
+            {
+                "id": media.id,
+                "title": media.title,
+                "slug": media.slug,
+                "description": media.description,
+                "total_count": total_count,
+                "analyzed_count": analyzed_count,
+                "language_code": media.language_code,
+                "editors": editors[media.id],
+            }
+            for media, total_count, analyzed_count in media_list
+        ]
+
+    def get_by_slug_with_counts(self, db: Session, media_slug: str) -> Optional[Dict[str, Any]]:
+        """Get media by slug with article counts and chief editors"""
+        result = self._with_counts(db).filter(Media.slug == media_slug).first()
+        if result is None:
+            return None
+
+        media, total_count, analyzed_count = result
+        chief_editors = (
+            db.query(ChiefEditorHistory)
+            .filter(ChiefEditorHistory.media_id == media.id)
+            .all()
+        )
+
+        return {
+            "media": media,
+            "chief_editors": chief_editors,
+            "total_count": total_count,
+            "analyzed_count": analyzed_count,
+        }
@@ -1,19 +1,33 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 from collections import defaultdict
-import json
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, text
+from sqlalchemy import func, case, text, cast, Integer
 
 from api.utils.db_utils import BaseRepository, FilterParams, QueryBuilder
-from db.models.models import Article, SentimentAnalysis, PartyAnalysis, PoliticianAnalysis
+from db.models.models import Article, SentimentAnalysis, PartyAnalysis, PoliticianAnalysis, Parties, Politicians
+from db.parsers.entity_resolver import CachedAliasIndex
+
+if TYPE_CHECKING:
+    from api.utils.analytics_snapshot import AnalyticsSnapshot
+
+# `date_trunc` units accepted for trend buckets
+TREND_BUCKETS = ("day", "week", "month")
+# Scores are stored as text, only values on the 0-10 scale are aggregated
+VALID_SCORES = [str(score) for score in range(11)]
 
 
 class SentimentRepository(BaseRepository[SentimentAnalysis]):
-    """Repository for handling SentimentAnalysis operations"""
+    """
+    Repository for handling SentimentAnalysis operations.
+    Score summaries are answered from `snapshot` instead of the database while one is loaded.
+    """
 
     def __init__(self):
         super().__init__(SentimentAnalysis)
+        self.snapshot: Optional["AnalyticsSnapshot"] = None
+        # Alias indexes of the requested entity names, built once per process
+        self.alias_indexes = {model: CachedAliasIndex(model) for model in (Parties, Politicians)}
 
     def get_daily_stats_by_media(
         self,
@@ -52,6 +66,55 @@ class SentimentRepository(BaseRepository[SentimentAnalysis]):
             for date, articles_count, analysed_count in results
         ]
 
+    def _resolve_names(self, db: Session, model, names: List[str]) -> List[int]:
+        """Resolve requested entity names to ids through the alias index"""
+        index = self.alias_indexes[model].get(db)
+        return [entity_id for entity_id in (index.resolve(db, name) for name in names) if entity_id is not None]
+
+    @staticmethod
+    def _titles(db: Session, model, ids=None) -> Dict[int, str]:
+        """Map entity ids to their canonical titles"""
+        query = db.query(model.id, model.title)
+        if ids is not None:
+            query = query.filter(model.id.in_(ids))
+        return dict(query.all())
+
+    @staticmethod
+    def _media_columns(model, filters: FilterParams) -> list:
+        """Media column to select and group by when several medias are compared in one query"""
+        return [model.media_id.label("media_id")] if filters.compares_media else []
+
+    @staticmethod
+    def _media_key(row, filters: FilterParams) -> Dict[str, int]:
+        return {"media_id": row.media_id} if filters.compares_media else {}
+
+    @staticmethod
+    def _score_distribution(results, titles: Dict[int, str], by_media: bool = False) -> List[Dict[str, Any]]:
+        """
+        Build per-entity score histograms from (entity_id, score, count) rows,
+        per media from (media_id, entity_id, score, count) rows with `by_media`
+        """
+        sentiment_data = defaultdict(lambda: defaultdict(int))
+
+        for row in results:
+            media_id, (entity_id, sentiment_score, count) = (row[0], row[1:]) if by_media else (None, row)
+            try:
+                sentiment_score = int(sentiment_score)  # Assuming score is a string, cast it to an int
+                if 0 <= sentiment_score <= 10:  # Only count scores in the range 0-10
+                    sentiment_data[(media_id, titles[entity_id])][sentiment_score] += count
+            except (TypeError, ValueError):
+                continue  # Skip invalid sentiment scores
+
+        # Prepare the result data in the desired format
+        return [
+            {
+                "name": name,
+                **({"media_id": media_id} if by_media else {}),
+                **{f"{score}": count for score, count in sentiment_scores.items()}
+            }
+            for (media_id, name), sentiment_scores in sentiment_data.items()
+        ]
+
     def get_party_sentiment(
         self,
         db: Session,
@@ -62,23 +125,24 @@ class SentimentRepository(BaseRepository[SentimentAnalysis]):
         # Start with the base query
         query = (
             db.query(
-                Article.id.label('article_id'),
-                PartyAnalysis.name.label("party"),
+                SentimentAnalysis.article_id.label('article_id'),
+                Parties.title.label("party"),
                 PartyAnalysis.score.label("sentiment_score"),
-                Article.date_time.label("date")
+                PartyAnalysis.date_time.label("date"),
+                *self._media_columns(PartyAnalysis, filters)
             )
             .join(SentimentAnalysis, SentimentAnalysis.id == PartyAnalysis.sentiment_id)
-            .join(Article, Article.id == SentimentAnalysis.article_id)
+            .join(Parties, Parties.id == PartyAnalysis.party_id)
         )
 
         # Apply common filters
-        query = QueryBuilder.apply_filters(query, Article, filters)
+        query = QueryBuilder.apply_filters(query, PartyAnalysis, filters)
 
         # Apply party filter
         if parties:
-            query = query.filter(PartyAnalysis.name.in_(parties))
+            query = query.filter(PartyAnalysis.party_id.in_(self._resolve_names(db, Parties, parties)))
 
-        query = query.order_by(Article.date_time.asc())
+        query = query.order_by(PartyAnalysis.date_time.asc())
 
         # Execute the query
         results = query.all()
@@ -86,12 +150,13 @@ class SentimentRepository(BaseRepository[SentimentAnalysis]):
         # Format response
         return [
             {
-                "article_id": article_id,
-                "party": party,
-                "sentiment_score": sentiment_score,
-                "date": date.date()  # Only include the date part for scatter plot
+                "article_id": row.article_id,
+                "party": row.party,
+                "sentiment_score": row.sentiment_score,
+                "date": row.date.date(),  # Only include the date part for scatter plot
+                **self._media_key(row, filters)
             }
-            for article_id, party, sentiment_score, date in results
+            for row in results
         ]
 
     def get_party_sentiment_summary(
@@ -100,80 +165,131 @@ class SentimentRepository(BaseRepository[SentimentAnalysis]):
         filters: FilterParams
     ) -> List[Dict[str, Any]]:
         """Get party sentiment summary with score distribution for all parties"""
-        # Start with the base query
+        if self.snapshot is not None:
+            results = self.snapshot.score_counts(PartyAnalysis, filters)
+            return self._score_distribution(results, self.snapshot.titles[Parties], filters.compares_media)
+
+        # Count scores per party in the database, grouping on the integer party id
         query = (
             db.query(
-                PartyAnalysis.name.label("party"),
-                PartyAnalysis.score.label("sentiment_score")
+                *self._media_columns(PartyAnalysis, filters),
+                PartyAnalysis.party_id.label("party_id"),
+                PartyAnalysis.score.label("sentiment_score"),
+                func.count(PartyAnalysis.id).label("count")
             )
-            .join(SentimentAnalysis, SentimentAnalysis.id == PartyAnalysis.sentiment_id)
-            .join(Article, Article.id == SentimentAnalysis.article_id)
+            .filter(PartyAnalysis.party_id.isnot(None))
+            .group_by(*self._media_columns(PartyAnalysis, filters), PartyAnalysis.party_id, PartyAnalysis.score)
         )
 
         # Apply common filters
-        query = QueryBuilder.apply_filters(query, Article, filters)
+        query = QueryBuilder.apply_filters(query, PartyAnalysis, filters)
 
         # Execute the query
         results = query.all()
 
-        # Format response using dictionary to count scores
-        # Prepare a structure to store the sentiment score counts for each party
-        party_sentiment_data = defaultdict(lambda: defaultdict(int))
+        return self._score_distribution(results, self._titles(db, Parties), filters.compares_media)
 
-        # Process the results and count the sentiment scores
-        for party, sentiment_score in results:
-            try:
-                sentiment_score = int(sentiment_score)  # Assuming score is a string, cast it to an int
-                if 0 <= sentiment_score <= 10:  # Only count scores in the range 0-10
-                    party_sentiment_data[party][sentiment_score] += 1
-            except ValueError:
-                continue  # Skip invalid sentiment scores
+    def get_party_sentiment_progress(
+        self,
+        db: Session,
+        parties: List[str],
+        filters: FilterParams
+    ) -> List[Dict[str, Any]]:
+        """Get sentiment progress over time for specified parties"""
+        party_ids = self._resolve_names(db, Parties, parties) if parties else None
+
+        if self.snapshot is not None:
+            results = self.snapshot.monthly_score_counts(PartyAnalysis, filters, party_ids)
+            titles = self.snapshot.titles[Parties]
+        else:
+            # Base query to get sentiment scores over time
+            query = (
+                db.query(
+                    func.to_char(PartyAnalysis.date_time, 'YYYY-MM').label("date"),
+                    PartyAnalysis.party_id.label("party_id"),
+                    *[func.count(case((PartyAnalysis.score == str(i), 1))).label(str(i)) for i in range(11)],
+                    *self._media_columns(PartyAnalysis, filters)
+                )
+                .filter(PartyAnalysis.party_id.isnot(None))
+                .group_by("date", PartyAnalysis.party_id, *self._media_columns(PartyAnalysis, filters))
+                .order_by("date")
+            )
 
-        # Prepare the result data in the desired format
+            # Apply party filter if specified
+            if party_ids is not None:
+                query = query.filter(PartyAnalysis.party_id.in_(party_ids))
+
+            # Apply common filters
+            query = QueryBuilder.apply_filters(query, PartyAnalysis, filters)
+
+            # Execute the query
+            results = query.all()
+            titles = self._titles(db, Parties)
+
+        # Format response
         return [
             {
-                "name": party,
-                **{f"{score}": count for score, count in sentiment_scores.items()}
+                "date": row[0],
+                "party": titles[row[1]],
+                **{str(i): row[i + 2] for i in range(11)},
+                **self._media_key(row, filters)
             }
-            for party, sentiment_scores in party_sentiment_data.items()
+            for row in results
         ]
 
-    def get_party_sentiment_progress(
+    def get_party_sentiment_trend(
         self,
         db: Session,
         parties: List[str],
-        filters: FilterParams
+        filters: FilterParams,
+        bucket: str = "month"
     ) -> List[Dict[str, Any]]:
-        """Get sentiment progress over time for specified parties"""
-        # Base query to get sentiment scores over time
+        """Get per-party score statistics (mean, median, p10, p90, count) per day, week or month"""
+        if bucket not in TREND_BUCKETS:
+            raise ValueError(f"Unknown bucket '{bucket}', expected one of: {', '.join(TREND_BUCKETS)}")
+
+        score = cast(PartyAnalysis.score, Integer)
+        bucket_start = func.date_trunc(bucket, PartyAnalysis.date_time).label("bucket")
+
+        # Aggregate in the database, a few rows per party and bucket instead of every mention
         query = (
             db.query(
-                func.to_char(Article.date_time, 'YYYY-MM').label("date"),
-                PartyAnalysis.name.label("party"),
-                *[func.count(case((PartyAnalysis.score == str(i), 1))).label(str(i)) for i in range(11)]
+                bucket_start,
+                PartyAnalysis.party_id.label("party_id"),
+                func.count(PartyAnalysis.id).label("count"),
+                func.avg(score).label("mean"),
+                func.percentile_cont(0.5).within_group(score).label("median"),
+                func.percentile_cont(0.1).within_group(score).label("p10"),
+                func.percentile_cont(0.9).within_group(score).label("p90"),
+                *self._media_columns(PartyAnalysis, filters)
             )
-            .join(SentimentAnalysis, SentimentAnalysis.id == PartyAnalysis.sentiment_id)
-            .join(Article, Article.id == SentimentAnalysis.article_id)
-            .group_by("date", "party")
-            .order_by("date")
+            .filter(PartyAnalysis.party_id.isnot(None), PartyAnalysis.score.in_(VALID_SCORES))
+            .group_by(bucket_start, PartyAnalysis.party_id, *self._media_columns(PartyAnalysis, filters))
+            .order_by(bucket_start, PartyAnalysis.party_id)
         )
 
         # Apply party filter if specified
         if parties:
-            query = query.filter(PartyAnalysis.name.in_(parties))
+            query = query.filter(PartyAnalysis.party_id.in_(self._resolve_names(db, Parties, parties)))
 
         # Apply common filters
-        query = QueryBuilder.apply_filters(query, Article, filters)
+        query = QueryBuilder.apply_filters(query, PartyAnalysis, filters)
 
         # Execute the query
         results = query.all()
+        titles = self._titles(db, Parties)
 
         # Format response
         return [
             {
-                "date": row[0],
-                "party": row[1],
-                **{str(i): row[i + 2] for i in range(11)}
+                "date": row.bucket.date().isoformat(),
+                "party": titles[row.party_id],
+                "count": row.count,
+                "mean": round(float(row.mean), 2),
+                "median": row.median,
+                "p10": row.p10,
+                "p90": row.p90,
+                **self._media_key(row, filters)
             }
             for row in results
         ]
@@ -182,27 +298,40 @@ class SentimentRepository(BaseRepository[SentimentAnalysis]):
         self,
         db: Session,
         filters: FilterParams
-    ) -> Dict[int, int]:
-        """Get summary of sentiment counts for a media"""
-        # Start with the base query
-        query = (
-            db.query(
-                PartyAnalysis.score.label("sentiment_score"),
-                func.count(PartyAnalysis.id).label("count")
+    ) -> Dict[int, Any]:
+        """
+        Get summary of sentiment counts for a media, or per media ({media_id: {score: count}})
+        when several medias are compared
+        """
+        if self.snapshot is not None:
+            results = self.snapshot.score_totals(PartyAnalysis, filters)
+        else:
+            # Start with the base query
+            query = (
+                db.query(
+                    PartyAnalysis.score.label("sentiment_score"),
+                    func.count(PartyAnalysis.id).label("count"),
+                    *self._media_columns(PartyAnalysis, filters)
+                )
+                # Scores off the 0-10 scale are left out, as in the snapshot
+                .filter(PartyAnalysis.score.in_(VALID_SCORES))
+                .group_by(PartyAnalysis.score, *self._media_columns(PartyAnalysis, filters))
             )
-            .join(SentimentAnalysis, SentimentAnalysis.id == PartyAnalysis.sentiment_id)
-            .join(Article, Article.id == SentimentAnalysis.article_id)
-            .group_by(PartyAnalysis.score)
-        )
 
-        # Apply common filters
-        query = QueryBuilder.apply_filters(query, Article, filters)
+            # Apply common filters
+            query = QueryBuilder.apply_filters(query, PartyAnalysis, filters)
 
-        # Execute the query
-        results = query.all()
+            # Execute the query
+            results = query.all()
 
         # Format response as a dictionary with sentiment score as key and count as value
-        return {int(score): count for score, count in results if score is not None}
+        if not filters.compares_media:
+            return {int(row.sentiment_score): row.count for row in results}
+
+        summary = {media_id: {} for media_id in filters.media_ids}
+        for row in results:
+            summary[row.media_id][int(row.sentiment_score)] = row.count
+        return summary
 
     def get_politician_mention_summary(
         self,
@@ -210,60 +339,56 @@ class SentimentRepository(BaseRepository[SentimentAnalysis]):
         filters: FilterParams,
         limit: int = 10
     ) -> List[Dict[str, Any]]:
-        """Get politician sentiment summary with score distribution for most mentioned politicians"""
+        """
+        Get politician sentiment summary with score distribution for most mentioned politicians,
+        per media when several medias are compared (the same politicians for every media)
+        """
+        if self.snapshot is not None:
+            top_politicians = self.snapshot.top_entities(PoliticianAnalysis, filters.media_ids, limit)
+            results = self.snapshot.score_counts(PoliticianAnalysis, filters, top_politicians)
+            return self._score_distribution(results, self.snapshot.titles[Politicians], filters.compares_media)
+
         # First, get the total mention count for each politician
         mention_counts = (
             db.query(
-                PoliticianAnalysis.name.label("politician"),
+                PoliticianAnalysis.politician_id.label("politician_id"),
                 func.count(PoliticianAnalysis.id).label("total_mentions")
             )
-            .join(SentimentAnalysis, SentimentAnalysis.id == PoliticianAnalysis.sentiment_id)
-            .join(Article, Article.id == SentimentAnalysis.article_id)
-            .filter(Article.media_id == filters.media_id)
-            .group_by(PoliticianAnalysis.name)
-            .order_by(func.count(PoliticianAnalysis.id).desc())
+            .filter(
+                PoliticianAnalysis.media_id.in_(filters.media_ids),
+                PoliticianAnalysis.politician_id.isnot(None)
+            )
+            .group_by(PoliticianAnalysis.politician_id)
+            .order_by(func.count(PoliticianAnalysis.id).desc(), PoliticianAnalysis.politician_id)
             .limit(limit)
             .all()
         )
 
         # Get the list of top N politicians
-        top_politicians = [name for name, _ in mention_counts]
+        top_politicians = [politician_id for politician_id, _ in mention_counts]
 
         # Now get the sentiment distribution for these politicians
         query = (
             db.query(
-                PoliticianAnalysis.name.label("politician"),
-                PoliticianAnalysis.score.label("sentiment_score")
+                *self._media_columns(PoliticianAnalysis, filters),
+                PoliticianAnalysis.politician_id.label("politician_id"),
+                PoliticianAnalysis.score.label("sentiment_score"),
+                func.count(PoliticianAnalysis.id).label("count")
+            )
+            .filter(PoliticianAnalysis.politician_id.in_(top_politicians))
+            .group_by(
+                *self._media_columns(PoliticianAnalysis, filters),
+                PoliticianAnalysis.politician_id,
+                PoliticianAnalysis.score
             )
-            .join(SentimentAnalysis, SentimentAnalysis.id == PoliticianAnalysis.sentiment_id)
-            .join(Article, Article.id == SentimentAnalysis.article_id)
-            .filter(PoliticianAnalysis.name.in_(top_politicians))
         )
 
         # Apply common filters
-        query = QueryBuilder.apply_filters(query, Article, filters)
+        query = QueryBuilder.apply_filters(query, PoliticianAnalysis, filters)
 
         # Execute the query
         results = query.all()
 
-        # Format response using dictionary to count scores
-        # Prepare a structure to store the sentiment score counts for each politician
-        politician_sentiment_data = defaultdict(lambda: defaultdict(int))
-
-        # Process the results and count the sentiment scores
-        for politician, sentiment_score in results:
-            try:
-                sentiment_score = int(sentiment_score)  # Assuming score is a string, cast it to an int
-                if 0 <= sentiment_score <= 10:  # Only count scores in the range 0-10
-                    politician_sentiment_data[politician][sentiment_score] += 1
-            except ValueError:
-                continue  # Skip invalid sentiment scores
-
-        # Prepare the result data in the desired format
-        return [
-            {
-                "name": politician,
-                **{f"{score}": count for score, count in sentiment_scores.items()}
-            }
-            for politician, sentiment_scores in politician_sentiment_data.items()
-        ]
\ No newline at end of file
+        return self._score_distribution(
+            results, self._titles(db, Politicians, top_politicians), filters.compares_media
+        )
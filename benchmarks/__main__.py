@@ -0,0 +1,148 @@
+"""
+Benchmark suite entry point.
+
+    python -m benchmarks seed --articles 1000000 --reset
+    python -m benchmarks run --output bench_report.json
+    python -m benchmarks compare baseline.json bench_report.json
+    python -m benchmarks parity --articles 20000 --reset
+    python -m benchmarks extract --pages .scrapy/httpcache/postimees
+
+The database is taken from the usual DB_* environment variables and must be
+a local instance unless --allow-remote is passed.
+"""
+import argparse
+import json
+import os
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generator import CorpusConfig, SyntheticCorpusGenerator
+from benchmarks.report import BenchmarkReport, compare_reports
+from benchmarks.suites import SUITES
+from db.helpers.utils import get_db_address
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "postgres", "db"}
+
+
+def create_session(allow_remote: bool):
+    load_dotenv()
+    if os.getenv("DB_HOST") not in LOCAL_HOSTS and not allow_remote:
+        sys.exit(f"Refusing to benchmark against non-local DB_HOST={os.getenv('DB_HOST')!r}")
+    engine = create_engine(get_db_address())
+    return sessionmaker(bind=engine)()
+
+
+def corpus_config(args) -> CorpusConfig:
+    return CorpusConfig(
+        articles=args.articles,
+        politicians=args.politicians,
+        analysed_ratio=args.analysed_ratio,
+        paywall_ratio=args.paywall_ratio,
+        days=args.days,
+        seed=args.seed,
+    )
+
+
+def seed(args):
+    session = create_session(args.allow_remote)
+    generator = SyntheticCorpusGenerator(session, corpus_config(args))
+    if args.reset:
+        generator.reset()
+    result = generator.seed()
+    logger.info("Corpus seeded", extra={"corpus": result})
+
+
+def run(args):
+    session = create_session(args.allow_remote)
+    config = corpus_config(args)
+    report = BenchmarkReport({"corpus": config.to_dict(), "suites": args.suites})
+
+    for name in args.suites:
+        SUITES[name](report, session, config, args.repeat)
+
+    report.save(args.output)
+    logger.info("Benchmark report saved", extra={"path": args.output, "cases": len(report.results)})
+
+
+def parity(args):
+    # Imported here, benchmarks.snapshot imports the suites
+    from api.utils.analytics_snapshot import AnalyticsSnapshot
+    from benchmarks.snapshot import seed_edge_cases, snapshot_mismatches
+
+    session = create_session(args.allow_remote)
+    if args.reset:
+        generator = SyntheticCorpusGenerator(session, corpus_config(args))
+        generator.reset()
+        generator.seed()
+        seed_edge_cases(session)
+    mismatches = snapshot_mismatches(session, corpus_config(args), AnalyticsSnapshot.load(session))
+    if mismatches:
+        sys.exit(f"Snapshot results differ from the database: {', '.join(mismatches)}")
+    logger.info("Snapshot results match the database")
+
+
+def extract(args):
+    # Imported here, parsel is only installed together with the crawler
+    from benchmarks.extraction import bench_extraction
+
+    report = BenchmarkReport({"pages": args.pages})
+    bench_extraction(report, args.pages, args.repeat)
+    report.save(args.output)
+    logger.info("Benchmark report saved", extra={"path": args.output, "cases": len(report.results)})
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.candidate, encoding="utf-8") as file:
+        candidate = json.load(file)
+    json.dump(compare_reports(baseline, candidate), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, handler in (("seed", seed), ("run", run), ("parity", parity)):
+        subparser = subparsers.add_parser(command)
+        subparser.set_defaults(handler=handler)
+        subparser.add_argument("--articles", type=int, default=100_000)
+        subparser.add_argument("--politicians", type=int, default=500)
+        subparser.add_argument("--analysed-ratio", type=float, default=0.7)
+        subparser.add_argument("--paywall-ratio", type=float, default=0.3)
+        subparser.add_argument("--days", type=int, default=5 * 365)
+        subparser.add_argument("--seed", type=int, default=42)
+        subparser.add_argument("--allow-remote", action="store_true")
+
+    subparsers.choices["seed"].add_argument("--reset", action="store_true", help="Drop and recreate all tables")
+    subparsers.choices["parity"].add_argument(
+        "--reset", action="store_true", help="Recreate all tables and seed the corpus with edge cases first"
+    )
+    subparsers.choices["run"].add_argument("--output", default="bench_report.json")
+    subparsers.choices["run"].add_argument("--repeat", type=int, default=5)
+    subparsers.choices["run"].add_argument("--suites", nargs="+", choices=sorted(SUITES), default=list(SUITES))
+
+    extract_parser = subparsers.add_parser("extract", help="Article extraction over saved pages, no database")
+    extract_parser.set_defaults(handler=extract)
+    extract_parser.add_argument("--pages", required=True, help="Directory of .html files or a Scrapy HTTP cache")
+    extract_parser.add_argument("--output", default="bench_report_extract.json")
+    extract_parser.add_argument("--repeat", type=int, default=5)
+
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.set_defaults(handler=compare)
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark of article extraction over saved Postimees pages.
+
+Pages are read from a directory of `.html` files or from the Scrapy HTTP cache
+(`.scrapy/httpcache/<spider>`), and extracted with the legacy per-field
+`response.css` path and with `extract_article`. Reports pages per second,
+allocations and the number of pages where both paths disagree.
+"""
+import gzip
+import os
+import re
+import time
+import tracemalloc
+from typing import Callable, Iterator, List
+
+from parsel import Selector
+
+from benchmarks.report import BenchmarkReport
+from lib.crawler.helpers.extraction import extract_article
+from lib.crawler.helpers.utils import clean_text
+
+
+def iter_pages(path: str) -> Iterator[str]:
+    """HTML of saved pages: `*.html` files or `response_body` files of the Scrapy cache"""
+    for directory, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(directory, name)
+            if name.endswith(".html"):
+                with open(file_path, "rb") as file:
+                    yield file.read().decode("utf-8", errors="replace")
+            elif name == "response_body":
+                with open(file_path, "rb") as file:
+                    body = file.read()
+                if body[:2] == b"\x1f\x8b":
+                    body = gzip.decompress(body)
+                yield body.decode("utf-8", errors="replace")
+
+
+def legacy_clean_text(text):
+    cleaned_text = re.sub(r'[\xa0\u200b]', ' ', text)
+    cleaned_text = re.sub(r'&[a-zA-Z]+;', '', cleaned_text)
+    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
+    return cleaned_text.strip()
+
+
+def legacy_extract(html: str) -> dict:
+    """`parse_article` and the pipeline cleaning before the precompiled extraction"""
+    response = Selector(text=html)
+    title = response.css('.article__headline::text').get()
+    if not title:
+        title = response.css('.article-superheader__headline::text').get()
+    return {
+        "article_id": response.css('meta[name="cXenseParse:articleId"]::attr(content)').get(),
+        "date_time": response.css('.article__publish-date::attr(content)').get(),
+        "authors": response.css('.author .author__name::text').get(),
+        "paywall": bool(response.css('.article__premium-flag')),
+        "category": response.css("ul.breadcrumb__items li.breadcrumb-item:last-child a::text").get(),
+        "preview_url": response.css(".figure__image-wrapper img::attr(src)").get(),
+        "title": title,
+        "body": legacy_clean_text(" ".join(response.css('.article-body-content p ::text').getall())),
+    }
+
+
+def current_extract(html: str) -> dict:
+    fields = extract_article(Selector(text=html).root)
+    fields["body"] = clean_text(" ".join(fields["body"]))
+    return fields
+
+
+def measure_allocations(extract: Callable[[str], dict], pages: List[str]) -> dict:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for html in pages:
+        extract(html)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    return {"peak_kb": round(peak / 1024, 1), "retained_kb": round(allocated / 1024, 1), "retained_blocks": blocks}
+
+
+def bench_extraction(report: BenchmarkReport, pages_path: str, repeat: int):
+    pages = list(iter_pages(pages_path))
+    if not pages:
+        raise SystemExit(f"No saved pages found in {pages_path}")
+
+    mismatches = sum(1 for html in pages if legacy_extract(html) != current_extract(html))
+
+    for name, extract in (("extract.legacy", legacy_extract), ("extract.precompiled", current_extract)):
+        timings = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            for html in pages:
+                extract(html)
+            timings.append(time.perf_counter() - started_at)
+
+        report.record(
+            name,
+            timings,
+            pages=len(pages),
+            pages_per_sec=round(len(pages) / min(timings), 1),
+            mismatches=mismatches,
+            **measure_allocations(extract, pages)
+        )
@@ -0,0 +1,273 @@
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from db.helpers.co_mentions import CO_MENTION_SOURCES_BACKFILL, CO_MENTIONS_BACKFILL
+from db.helpers.partitions import ensure_month_partition, iter_months
+from db.models.models import (
+    Article,
+    ArticleAnalysis,
+    Base,
+    ChiefEditorHistory,
+    Media,
+    Parties,
+    PartyAnalysis,
+    PoliticianAnalysis,
+    Politicians,
+    SentimentAnalysis,
+)
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+MEDIAS = [
+    {"id": 1, "title": "Rus.Postimees", "base_url": "https://rus.postimees.ee", "slug": "rus-postimees",
+     "language_code": "ru", "description": "Synthetic benchmark media"},
+    {"id": 2, "title": "Postimees", "base_url": "https://www.postimees.ee", "slug": "postimees",
+     "language_code": "ee", "description": "Synthetic benchmark media"},
+]
+
+PARTIES = [
+    "Eesti Reformierakond",
+    "Eesti Konservatiivne Rahvaerakond",
+    "Eesti Keskerakond",
+    "ISAMAA Erakond",
+    "Sotsiaaldemokraatlik Erakond",
+    "Erakond Eesti 200",
+    "Erakond Parempoolsed",
+    "Erakond Eestimaa Rohelised",
+    "EESTIMAA ÜHENDATUD VASAKPARTEI",
+    "Eesti Rahvuslased ja Konservatiivid",
+    "Eesti Vabaduspartei - Põllumeeste Kogu",
+    "KOOS organisatsioon osutab suveräänsusele",
+    "Vabaerakond Aru Pähe",
+    "Rahva Ühtsuse Erakond",
+]
+
+CATEGORIES = ["Eesti", "Arvamus", "Majandus", "Tallinn", "Maailm", "Postimees"]
+
+VOCABULARY = (
+    "valitsus riigikogu eelarve maks minister koalitsioon opositsioon valimised reform "
+    "linn tallinn tartu haridus tervis majandus energia kaitse julgeolek pension palk "
+    "ettevõte hind inflatsioon kool õpetaja arst haigla tee raudtee sadam piir keel "
+    "otsus seadus eelnõu arutelu kriitika toetus lubadus plaan aasta päev nädal kuu"
+).split()
+
+
+class CorpusConfig:
+    """Parameters of a synthetic benchmark corpus"""
+
+    def __init__(
+        self,
+        articles: int = 100_000,
+        politicians: int = 500,
+        analysed_ratio: float = 0.7,
+        paywall_ratio: float = 0.3,
+        days: int = 5 * 365,
+        seed: int = 42,
+        batch_size: int = 5_000
+    ):
+        self.articles = articles
+        self.politicians = politicians
+        self.analysed_ratio = analysed_ratio
+        self.paywall_ratio = paywall_ratio
+        self.days = days
+        self.seed = seed
+        self.batch_size = batch_size
+        self.end_date = datetime(2025, 1, 1)
+
+    @property
+    def start_date(self) -> datetime:
+        return self.end_date - timedelta(days=self.days)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "articles": self.articles,
+            "politicians": self.politicians,
+            "analysed_ratio": self.analysed_ratio,
+            "paywall_ratio": self.paywall_ratio,
+            "days": self.days,
+            "seed": self.seed,
+        }
+
+
+def zipf_weights(size: int, exponent: float = 1.1) -> List[float]:
+    """Weights of a Zipf-like distribution, so a few entities get most mentions"""
+    return [1.0 / (rank ** exponent) for rank in range(1, size + 1)]
+
+
+class SyntheticCorpusGenerator:
+    """
+    Seeds a database with a reproducible synthetic corpus of medias, articles
+    and sentiment analysis rows with realistic skew in mentions and scores.
+    """
+
+    def __init__(self, session: Session, config: CorpusConfig):
+        self.session = session
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.politician_names = [f"Poliitik {i:04d}" for i in range(1, config.politicians + 1)]
+        self.party_ids = {name: index for index, name in enumerate(PARTIES, start=1)}
+        self.politician_ids = {name: index for index, name in enumerate(self.politician_names, start=1)}
+        self.party_weights = list(accumulate(zipf_weights(len(PARTIES), 0.9)))
+        self.politician_weights = list(accumulate(zipf_weights(len(self.politician_names), 1.1)))
+
+    def reset(self):
+        """Drop and recreate all tables"""
+        bind = self.session.get_bind()
+        self.session.close()
+        Base.metadata.drop_all(bind)
+        Base.metadata.create_all(bind)
+
+    def seed(self) -> Dict[str, Any]:
+        """Insert the whole corpus and return row counts with timing"""
+        started_at = time.perf_counter()
+        counts = {"articles": 0, "sentiments": 0, "parties": 0, "politicians": 0}
+
+        self._insert(Media, MEDIAS)
+        self._insert(ChiefEditorHistory, [
+            {"media_id": media["id"], "name": f"Editor {media['id']}", "start_date": self.config.start_date.date()}
+            for media in MEDIAS
+        ])
+        self._insert(Parties, [
+            {"id": index, "title": title, "aliases": None} for index, title in enumerate(PARTIES, start=1)
+        ])
+        self._insert(Politicians, [
+            {"id": index, "title": name, "aliases": None, "current_party": self.random.randint(1, len(PARTIES))}
+            for index, name in enumerate(self.politician_names, start=1)
+        ])
+        for month in iter_months(self.config.start_date, self.config.end_date):
+            ensure_month_partition(self.session.get_bind(), Article.__tablename__, month)
+        self.session.commit()
+
+        for batch in self._article_batches():
+            self._insert(Article, batch["articles"])
+            self._insert(SentimentAnalysis, batch["sentiments"])
+            self._insert(ArticleAnalysis, batch["article_analyses"])
+            self._insert(PartyAnalysis, batch["parties"])
+            self._insert(PoliticianAnalysis, batch["politicians"])
+            self.session.commit()
+
+            counts["articles"] += len(batch["articles"])
+            counts["sentiments"] += len(batch["sentiments"])
+            counts["parties"] += len(batch["parties"])
+            counts["politicians"] += len(batch["politicians"])
+            logger.info("Seeded batch", extra=dict(counts))
+
+        self._reset_sequences()
+        self.session.execute(text(
+            "INSERT INTO article_keys (article_id, media_id, id, date_time) "
+            "SELECT article_id, media_id, id, date_time FROM articles"
+        ))
+        self.session.execute(text(CO_MENTIONS_BACKFILL))
+        self.session.execute(text(CO_MENTION_SOURCES_BACKFILL))
+        self.session.execute(text("REFRESH MATERIALIZED VIEW media_counts"))
+        self.session.execute(text("ANALYZE"))
+        self.session.commit()
+
+        return {**counts, "seconds": round(time.perf_counter() - started_at, 3)}
+
+    def _insert(self, model, rows: List[Dict[str, Any]]):
+        if rows:
+            self.session.execute(insert(model), rows)
+
+    def _reset_sequences(self):
+        for model in (Media, ChiefEditorHistory, Parties, Politicians, Article,
+                      SentimentAnalysis, ArticleAnalysis, PartyAnalysis, PoliticianAnalysis):
+            table = model.__tablename__
+            self.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT max(id) FROM {table}), 0) + 1, false)"
+            ))
+
+    def _words(self, count: int) -> str:
+        return " ".join(self.random.choices(VOCABULARY, k=count))
+
+    def _score(self) -> int:
+        # Most mentions are neutral to slightly negative, extremes are rare
+        return max(0, min(10, round(self.random.gauss(4.5, 2.0))))
+
+    def _article_batches(self) -> Iterator[Dict[str, List[Dict[str, Any]]]]:
+        config = self.config
+        total_seconds = config.days * 24 * 3600
+        sentiment_id = party_id = politician_id = 0
+
+        for batch_start in range(0, config.articles, config.batch_size):
+            batch = {"articles": [], "sentiments": [], "article_analyses": [], "parties": [], "politicians": []}
+
+            for article_id in range(batch_start + 1, min(batch_start + config.batch_size, config.articles) + 1):
+                media_id = 1 if self.random.random() < 0.4 else 2
+                date_time = config.start_date + timedelta(seconds=self.random.randrange(total_seconds))
+                batch["articles"].append({
+                    "id": article_id,
+                    "article_id": article_id,
+                    "media_id": media_id,
+                    "url": f"https://bench.example/{media_id}/{article_id}",
+                    "title": self._words(self.random.randint(5, 12)).capitalize(),
+                    "date_time": date_time,
+                    "authors": f"Autor {self.random.randint(1, 200)}",
+                    "paywall": self.random.random() < config.paywall_ratio,
+                    "category": self.random.choice(CATEGORIES),
+                    "preview_url": None,
+                    "body": self._words(int(self.random.lognormvariate(5.5, 0.6))),
+                })
+
+                if self.random.random() >= config.analysed_ratio:
+                    continue
+
+                sentiment_id += 1
+                parties = self._mentions(PARTIES, self.party_weights, 3)
+                politicians = self._mentions(self.politician_names, self.politician_weights, 5)
+                batch["sentiments"].append({
+                    "id": sentiment_id,
+                    "article_id": article_id,
+                    "media_id": media_id,
+                    "date_time": date_time,
+                    "model": "bench-model",
+                    "sentiment": {
+                        "article": {
+                            "title": {"score": self._score(), "explanation": "synthetic"},
+                            "body": {"score": self._score(), "explanation": "synthetic"},
+                        },
+                        "parties": parties,
+                        "politicians": politicians,
+                    },
+                })
+                article = batch["articles"][-1]
+                filter_columns = {key: article[key] for key in ("media_id", "date_time", "paywall", "category")}
+                analysis = batch["sentiments"][-1]["sentiment"]["article"]
+                batch["article_analyses"].append({
+                    "id": sentiment_id,
+                    "sentiment_id": sentiment_id,
+                    "title_score": analysis["title"]["score"],
+                    "title_explanation": analysis["title"]["explanation"],
+                    "body_score": analysis["body"]["score"],
+                    "body_explanation": analysis["body"]["explanation"],
+                })
+                for party in parties:
+                    party_id += 1
+                    batch["parties"].append({
+                        "id": party_id, "sentiment_id": sentiment_id, "name": party["name"],
+                        "party_id": self.party_ids[party["name"]],
+                        "score": str(party["score"]), "explanation": party["explanation"], **filter_columns,
+                    })
+                for politician in politicians:
+                    politician_id += 1
+                    batch["politicians"].append({
+                        "id": politician_id, "sentiment_id": sentiment_id, "name": politician["name"],
+                        "politician_id": self.politician_ids[politician["name"]],
+                        "score": str(politician["score"]), "explanation": politician["explanation"],
+                        **filter_columns,
+                    })
+
+            yield batch
+
+    def _mentions(self, names: List[str], cum_weights: List[float], max_mentions: int) -> List[Dict[str, Any]]:
+        count = min(self.random.randint(0, max_mentions), len(names))
+        picked = dict.fromkeys(self.random.choices(names, cum_weights=cum_weights, k=count))
+        return [{"name": name, "score": self._score(), "explanation": "synthetic"} for name in picked]
@@ -0,0 +1,95 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def current_commit() -> Optional[str]:
+    """Return the commit hash of the working tree, if available"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkReport:
+    """Collects timings of benchmark cases into a machine-readable report"""
+
+    def __init__(self, metadata: Optional[Dict[str, Any]] = None):
+        self.metadata = {
+            "commit": current_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            **(metadata or {}),
+        }
+        self.results: List[Dict[str, Any]] = []
+
+    def measure(self, name: str, fn: Callable[[], Any], repeat: int = 5, warmup: int = 1, **params) -> Any:
+        """Run `fn` several times and record its timing statistics"""
+        result = None
+        for _ in range(warmup):
+            result = fn()
+
+        timings = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - started_at)
+
+        self.record(name, timings, rows=_row_count(result), **params)
+        return result
+
+    def record(self, name: str, timings: List[float], **params):
+        """Record externally measured timings (in seconds) of a benchmark case"""
+        ordered = sorted(timings)
+        entry = {
+            "name": name,
+            "repeat": len(timings),
+            "min_ms": round(ordered[0] * 1000, 3),
+            "median_ms": round(statistics.median(ordered) * 1000, 3),
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+            **{key: value for key, value in params.items() if value is not None},
+        }
+        self.results.append(entry)
+        logger.info("Benchmark %s: median %.3f ms", name, entry["median_ms"], extra={"benchmark": entry})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"metadata": self.metadata, "results": self.results}
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2, default=str)
+
+
+def compare_reports(baseline: Dict[str, Any], candidate: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Compare median timings of two reports case by case"""
+    baseline_results = {result["name"]: result for result in baseline["results"]}
+    comparison = []
+
+    for result in candidate["results"]:
+        previous = baseline_results.get(result["name"])
+        if previous is None:
+            continue
+        ratio = result["median_ms"] / previous["median_ms"] if previous["median_ms"] else None
+        comparison.append({
+            "name": result["name"],
+            "baseline_ms": previous["median_ms"],
+            "candidate_ms": result["median_ms"],
+            "ratio": round(ratio, 3) if ratio is not None else None,
+        })
+
+    return comparison
+
+
+def _row_count(result: Any) -> Optional[int]:
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return None
@@ -0,0 +1,101 @@
+"""
+Parity and latency of the in-memory analytics snapshot.
+
+Every `SentimentRepository` method served from the snapshot is run for the
+filter cases of the sentiment suite against the database and against the
+snapshot, and both results must be the same. Timings are recorded under
+`snapshot.*`, next to the `sentiment.*` timings of the SQL path.
+
+`python -m benchmarks parity --reset` seeds a corpus with `seed_edge_cases`
+first and exits with an error on any mismatch, so it can run unattended.
+"""
+import json
+import time
+from typing import Any, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api.utils.analytics_snapshot import AnalyticsSnapshot
+from api.utils.repositories import SentimentRepository
+from benchmarks.generator import CorpusConfig, PARTIES
+from benchmarks.report import BenchmarkReport
+from benchmarks.suites import filter_cases
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Party and politician summaries, monthly progress and the score histogram
+SNAPSHOT_METHODS = {
+    "get_party_sentiment_summary":
+        lambda repository, db, filters: repository.get_party_sentiment_summary(db, filters),
+    "get_party_sentiment_progress":
+        lambda repository, db, filters: repository.get_party_sentiment_progress(db, [], filters),
+    "get_party_sentiment_progress[parties]":
+        lambda repository, db, filters: repository.get_party_sentiment_progress(db, PARTIES[:3], filters),
+    "get_sentiment_summary":
+        lambda repository, db, filters: repository.get_sentiment_summary(db, filters),
+    "get_politician_mention_summary":
+        lambda repository, db, filters: repository.get_politician_mention_summary(db, filters, 10),
+}
+
+
+# Mentions the synthetic corpus doesn't have: scores off the 0-10 scale and
+# names that aren't resolved to an entity, copied from every nth mention
+EDGE_CASES = """
+INSERT INTO {table} (sentiment_id, name, {column}, score, explanation, media_id, date_time, paywall, category)
+SELECT sentiment_id, name, {column}, 'n/a', 'off-scale', media_id, date_time, paywall, category
+FROM {table} WHERE id % 97 = 0
+UNION ALL
+SELECT sentiment_id, 'Unresolved ' || name, NULL, score, 'unresolved', media_id, date_time, paywall, category
+FROM {table} WHERE id % 89 = 0
+"""
+
+
+def seed_edge_cases(db: Session):
+    for table, column in (("parties_analysis", "party_id"), ("politicians_analysis", "politician_id")):
+        db.execute(text(EDGE_CASES.format(table=table, column=column)))
+    db.commit()
+
+
+def canonical(result: Any) -> Any:
+    # Lists are compared unordered, the SQL path leaves the order of ties to the planner
+    if isinstance(result, list):
+        return sorted(json.dumps(item, sort_keys=True, default=str) for item in result)
+    return json.dumps(result, sort_keys=True, default=str)
+
+
+def snapshot_mismatches(db: Session, config: CorpusConfig, snapshot: AnalyticsSnapshot) -> List[str]:
+    """Cases where the snapshot answers differently from the database"""
+    sql, in_memory = SentimentRepository(), SentimentRepository()
+    in_memory.snapshot = snapshot
+
+    mismatches = []
+    for case, filters in filter_cases(config).items():
+        for name, method in SNAPSHOT_METHODS.items():
+            if canonical(method(sql, db, filters)) != canonical(method(in_memory, db, filters)):
+                mismatches.append(f"{name}[{case}]")
+    return mismatches
+
+
+def bench_analytics_snapshot(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    started_at = time.perf_counter()
+    snapshot = AnalyticsSnapshot.load(db)
+    load_time = time.perf_counter() - started_at
+
+    mismatches = snapshot_mismatches(db, config, snapshot)
+    if mismatches:
+        logger.warning("Snapshot results differ from the database", extra={"cases": mismatches})
+    report.record(
+        "snapshot.load",
+        [load_time],
+        rows=sum(len(columns) for columns in snapshot.mentions.values()),
+        size_mb=round(sum(columns.nbytes for columns in snapshot.mentions.values()) / 2 ** 20, 1),
+        mismatches=len(mismatches)
+    )
+
+    repository = SentimentRepository()
+    repository.snapshot = snapshot
+    for case, filters in filter_cases(config).items():
+        for name, method in SNAPSHOT_METHODS.items():
+            report.measure(f"snapshot.{name}[{case}]", lambda: method(repository, db, filters), repeat=repeat)
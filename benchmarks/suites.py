@@ -0,0 +1,210 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Dict
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from api.endpoints.articles import search_articles
+from api.utils.db_utils import FilterParams
+from api.utils.repositories import ArticleRepository, CoMentionRepository, MediaRepository, SentimentRepository
+from benchmarks.generator import CorpusConfig, PARTIES
+from benchmarks.report import BenchmarkReport
+from db.models.models import Article, SentimentAnalysis
+
+
+def filter_cases(config: CorpusConfig) -> Dict[str, FilterParams]:
+    """Representative filter combinations used by the frontend"""
+    window_start = (config.end_date - timedelta(days=90)).date().isoformat()
+    return {
+        "media1_all": FilterParams(media_id=1, paywall=False),
+        "media2_all": FilterParams(media_id=2, paywall=False),
+        "compare_all": FilterParams(media_id=[1, 2], paywall=False),
+        "media2_90d": FilterParams(
+            media_id=2, paywall=False, start_date=window_start, end_date=config.end_date.date().isoformat()
+        ),
+    }
+
+
+def bench_sentiment_repository(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    repository = SentimentRepository()
+    parties = PARTIES[:3]
+
+    for case, filters in filter_cases(config).items():
+        report.measure(f"sentiment.get_daily_stats_by_media[{case}]",
+                       lambda: repository.get_daily_stats_by_media(db, filters), repeat=repeat)
+        report.measure(f"sentiment.get_party_sentiment[{case}]",
+                       lambda: repository.get_party_sentiment(db, parties, filters), repeat=repeat)
+        report.measure(f"sentiment.get_party_sentiment_summary[{case}]",
+                       lambda: repository.get_party_sentiment_summary(db, filters), repeat=repeat)
+        report.measure(f"sentiment.get_party_sentiment_progress[{case}]",
+                       lambda: repository.get_party_sentiment_progress(db, [], filters), repeat=repeat)
+        report.measure(f"sentiment.get_party_sentiment_trend[{case}]",
+                       lambda: repository.get_party_sentiment_trend(db, [], filters, "week"), repeat=repeat)
+        report.measure(f"sentiment.get_sentiment_summary[{case}]",
+                       lambda: repository.get_sentiment_summary(db, filters), repeat=repeat)
+        report.measure(f"sentiment.get_politician_mention_summary[{case}]",
+                       lambda: repository.get_politician_mention_summary(db, filters, 10), repeat=repeat)
+
+
+def bench_analytics_snapshot(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    # Imported here, benchmarks.snapshot imports this module
+    from benchmarks.snapshot import bench_analytics_snapshot as bench
+
+    bench(report, db, config, repeat)
+
+
+def bench_co_mention_repository(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    repository = CoMentionRepository()
+
+    for case, filters in filter_cases(config).items():
+        report.measure(f"co_mention.get_graph[{case}]",
+                       lambda: repository.get_graph(db, filters, 50), repeat=repeat)
+
+
+def bench_article_repository(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    repository = ArticleRepository()
+    analysed_article_id = db.query(func.max(SentimentAnalysis.article_id)).scalar()
+    latest_article_id = db.query(func.max(Article.id)).scalar()
+
+    report.measure("article.get_with_tooltip",
+                   lambda: repository.get_with_tooltip(db, latest_article_id), repeat=repeat)
+    report.measure("article.get_full_article_detail",
+                   lambda: repository.get_full_article_detail(db, analysed_article_id), repeat=repeat)
+
+
+def bench_media_repository(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    repository = MediaRepository()
+
+    report.measure("media.get_list_with_counts", lambda: repository.get_list_with_counts(db), repeat=repeat)
+    report.measure("media.get_by_slug_with_counts",
+                   lambda: repository.get_by_slug_with_counts(db, "postimees"), repeat=repeat)
+
+
+def bench_search(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    for value in ("valitsus", "eelarve minister", "riigi*"):
+        report.measure(f"articles.search[{value}]",
+                       lambda: asyncio.run(search_articles(value, 20, db)), repeat=repeat)
+
+
+def bench_pipeline(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    from lib.crawler.pipelines import PostimeesPipeline
+
+    pipeline = PostimeesPipeline()
+    items = 200
+    first_id = config.articles + 1
+    timings = []
+
+    # The first pass inserts new rows, the following passes take the update path
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for article_id in range(first_id, first_id + items):
+            pipeline.process_item({
+                "article_id": article_id,
+                "media_id": 2,
+                "url": f"https://bench.example/pipeline/{article_id}",
+                "title": " Pipeline benchmark article ",
+                "date_time": config.end_date.isoformat(),
+                "authors": "Benchmark",
+                "paywall": [],
+                "category": "Eesti",
+                "preview_url": None,
+                "body": ["Lõik\xa0üks. ", "Lõik &amp; kaks.  "],
+            }, None)
+        timings.append((time.perf_counter() - started_at) / items)
+
+    report.record("pipeline.process_item", timings, items_per_run=items)
+
+
+def benchmark_articles(first_id: int, count: int, date_time, suffix: str = ""):
+    return [
+        Article(
+            article_id=article_id,
+            media_id=2,
+            url=f"https://bench.example/upsert/{article_id}{suffix}",
+            title="Upsert benchmark article",
+            date_time=date_time,
+            authors="Benchmark",
+            paywall=True,
+            category="Eesti",
+            body="Lõik üks. Lõik kaks.",
+        )
+        for article_id in range(first_id, first_id + count)
+    ]
+
+
+def legacy_upsert(db, articles):
+    """Write path before the composite-key upsert: lookup by article_id, then insert or update the URL"""
+    for article in articles:
+        existing = db.session.query(Article).filter(Article.article_id == article.article_id).first()
+        if existing:
+            existing.url = article.url
+        else:
+            db.session.add(article)
+        db.session.commit()
+
+
+def bench_upsert(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    from db.db_connector import DBConnector
+
+    connector = DBConnector()
+    rows = 1000
+    first_id = config.articles + 100_000
+    date_time = config.end_date.replace(microsecond=0)
+
+    def cleanup():
+        connector.session.query(Article).filter(Article.article_id >= first_id).delete()
+        connector.session.commit()
+
+    for name, write in (
+        ("legacy", lambda articles: legacy_upsert(connector, articles)),
+        ("batch", lambda articles: connector.upsert_articles(articles)),
+    ):
+        for operation in ("insert", "update"):
+            timings, counts = [], {}
+            for run in range(repeat):
+                cleanup()
+                if operation == "update":
+                    connector.upsert_articles(benchmark_articles(first_id, rows, date_time))
+                articles = benchmark_articles(first_id, rows, date_time, suffix=f"?run={run}")
+                started_at = time.perf_counter()
+                counts = write(articles) or {}
+                timings.append(time.perf_counter() - started_at)
+            report.record(f"articles.upsert.{name}[{operation}]", timings, rows=rows,
+                          rows_per_sec=round(rows / min(timings)), **counts)
+    cleanup()
+
+
+def bench_analyzer(report: BenchmarkReport, db: Session, config: CorpusConfig, repeat: int):
+    from db.db_connector import DBConnector
+    from lib.sentiment.analyzers.registry import get_analyzer
+
+    batch_articles = 200
+    for batch_size in (1, 8):
+        analyzer = get_analyzer("fake", 2, batch_size=batch_size, latency=0, error_rate=0.01, malformed_rate=0.01)
+        timings = []
+        for _ in range(repeat):
+            articles = DBConnector().pending_articles(2, analyzer.model_name).limit(batch_articles).all()
+            if not articles:
+                break
+            started_at = time.perf_counter()
+            analyzer.analyze(articles)
+            timings.append((time.perf_counter() - started_at) / len(articles))
+
+        if timings:
+            report.record(f"analyzer.fake[batch_size={batch_size}]", timings,
+                          articles_per_run=batch_articles, token_usage=analyzer.usage.report())
+
+
+SUITES = {
+    "sentiment": bench_sentiment_repository,
+    "co_mention": bench_co_mention_repository,
+    "snapshot": bench_analytics_snapshot,
+    "article": bench_article_repository,
+    "media": bench_media_repository,
+    "search": bench_search,
+    "pipeline": bench_pipeline,
+    "analyzer": bench_analyzer,
+    "upsert": bench_upsert,
+}
@@ -1,13 +1,23 @@
-from sqlalchemy import create_engine, or_, desc
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, or_, and_, desc, exists, text, literal, literal_column, select, update, func, \
+    inspect, tuple_, values, column, delete
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
+from db.helpers.co_mentions import VALID_SCORE, mention_key, mention_pairs
+from db.helpers.partitions import ensure_month_partition, month_start
 from db.helpers.utils import get_db_address
 from db.models.models import *
+from lib.crawler.helpers.fingerprint import DUPLICATE_THRESHOLD, band_buckets, signature, similarity
+from lib.logger import get_logger
 
 # Load environment variables
 load_dotenv()
 
+logger = get_logger(__name__)
+
 
 class DBConnector:
     """Class for managing database connections and operations."""
@@ -35,6 +45,16 @@ class DBConnector:
                 )
 
 
+    def article_urls(self, media_id: int):
+        """URLs of the stored articles of a media, streamed"""
+        query = self.session.query(Article.url).filter_by(media_id=media_id).order_by(desc(Article.date_time))
+        for article_url, in query.yield_per(1000):
+            yield article_url
+
+    def article_date_time(self, article_url):
+        """Publish date of a stored article, None when the URL is not crawled yet"""
+        return self.session.query(Article.date_time).filter_by(url=article_url).limit(1).scalar()
+
     def analysis_exists(self, article_id, model_name):
         return (
             self
@@ -47,43 +67,193 @@ class DBConnector:
             .first()
         )
 
+    def pending_articles(self, media_id: int, model_name: str, paywall: bool = False):
+        """Query of the media's articles that have no analysis by the given model yet"""
+        analysed = exists().where(
+            SentimentAnalysis.article_id == Article.id,
+            SentimentAnalysis.model == model_name
+        )
+        return (
+            self
+            .session
+            .query(Article)
+            .filter(Article.media_id == media_id, Article.paywall == paywall, ~analysed)
+            .order_by(desc(Article.date_time))
+        )
+
     def insert_analysis_response(self, analysis_response: SentimentAnalysis):
         self.session.add(analysis_response)
         self.session.commit()
 
     def update_analysis_response(self, analysis_response: SentimentAnalysis):
-        existing_record = self.analysis_exists(analysis_response.article_id)
+        existing_record = self.analysis_exists(analysis_response.article_id, analysis_response.model)
 
         if existing_record:
-            print(f"Updating analysis for article {analysis_response.article_id} with model {analysis_response.model}.")
+            logger.info("Updating analysis", extra={
+                "article_id": analysis_response.article_id, "model": analysis_response.model
+            })
             existing_record.sentiment = analysis_response.sentiment  # Update sentiment
             self.session.commit()
             return existing_record
         else:
-            print(
-                f"No existing analysis found for article {analysis_response.article_id} with model {analysis_response.model}.")
+            logger.warning("No existing analysis found", extra={
+                "article_id": analysis_response.article_id, "model": analysis_response.model
+            })
             return None
 
-    def insert_or_update_article(self, article: Article):
+    # Parsed article fields refreshed by `upsert_articles(..., overwrite=True)`
+    overwritten_article_fields = ('url', 'title', 'body', 'authors', 'paywall', 'category', 'preview_url')
+
+    def upsert_articles(self, articles: List[Article], enqueue: bool = False, overwrite: bool = False) -> Dict[str, int]:
+        """
+        Insert new articles and update existing ones, an article is identified by its
+        (article_id, media_id) key in `article_keys`. Existing rows get the new URL, all
+        parsed fields with `overwrite`, and their party and politician analyses the new
+        paywall and category. An article republished under another date is moved to it.
+        New articles are fingerprinted and linked to their near-duplicate, if any, new free
+        articles are queued for analysis with `enqueue`. Returns the inserted and updated counts.
+        """
+        # One statement can't update a row twice, the last version of an article wins
+        unique = {}
+        for article in articles:
+            # RETURNING gives the key back typed, so it must be typed the same here
+            article.article_id = int(article.article_id)
+            if isinstance(article.date_time, str):
+                # Offsets are dropped like the cast to `timestamp` does
+                article.date_time = datetime.fromisoformat(article.date_time).replace(tzinfo=None)
+            unique[(article.article_id, article.media_id)] = article
+        if not unique:
+            return {"inserted": 0, "updated": 0}
+
         try:
-            # Check if the article with the same URL already exists
-            existing_article = self.session.query(Article).filter(Article.article_id == article.article_id).first()
+            for month in {month_start(article.date_time) for article in unique.values()}:
+                ensure_month_partition(self.engine, Article.__tablename__, month)
 
-            if existing_article:  # If article exists, update the 'url' field
-                print(f"Article with URL {article.url} already exists. Updating URL field.")
-                existing_article.url = article.url  # Update the 'url' field (or any other field)
-            else:
-                # If article does not exist, insert the new article
-                self.session.add(article)
+            # New articles claim their key and id, concurrent writers of one article wait for each other here
+            claimed = self.session.execute(
+                insert(ArticleKey)
+                .values([
+                    {
+                        "article_id": article.article_id, "media_id": article.media_id,
+                        "id": func.nextval('articles_id_seq'), "date_time": article.date_time,
+                    }
+                    for article in unique.values()
+                ])
+                .on_conflict_do_nothing()
+                .returning(ArticleKey.article_id, ArticleKey.media_id, ArticleKey.id)
+            ).all()
+            inserted = []
+            for row in claimed:
+                article = unique[(row.article_id, row.media_id)]
+                article.id = row.id
+                inserted.append(article)
 
-            # Commit the changes
-            self.session.commit()
-            print(f"Article with URL {article.url} has been inserted or updated.")
+            claimed_keys = {(row.article_id, row.media_id) for row in claimed}
+            updated = [article for key, article in unique.items() if key not in claimed_keys]
+            if updated:
+                stored = self.session.execute(
+                    select(ArticleKey.article_id, ArticleKey.media_id, ArticleKey.id, ArticleKey.date_time)
+                    .where(tuple_(ArticleKey.article_id, ArticleKey.media_id).in_(
+                        [(article.article_id, article.media_id) for article in updated]
+                    ))
+                    .with_for_update()
+                ).all()
+                for row in stored:
+                    article = unique[(row.article_id, row.media_id)]
+                    article.id = row.id
+                    if row.date_time != article.date_time:
+                        self.move_article(article, row.date_time)
+
+            columns = ('id', 'article_id', 'media_id', 'date_time') + self.overwritten_article_fields
+            statement = insert(Article).values([
+                {column: getattr(article, column) for column in columns} for article in unique.values()
+            ])
+            updated_fields = self.overwritten_article_fields if overwrite else ('url',)
+            self.session.execute(statement.on_conflict_do_update(
+                index_elements=['id', 'date_time'],
+                set_={field: statement.excluded[field] for field in updated_fields}
+            ))
 
+            if overwrite:
+                self.refresh_analysis_filters(updated)
+            for article in inserted:
+                self.fingerprint_article(article)
+            if enqueue:
+                self.enqueue_analysis([article for article in inserted if not article.paywall])
+            self.session.commit()
         except Exception as e:
-            # Rollback the session in case of integrity error
-            print("Integrity error:", e)
+            logger.error("Article upsert failed: %s", e, extra={"articles": len(unique)})
             self.session.rollback()
+            return {"inserted": 0, "updated": 0, "failed": len(unique)}
+
+        counts = {"inserted": len(inserted), "updated": len(updated)}
+        logger.debug("Articles upserted", extra=counts)
+        return counts
+
+    def move_article(self, article: Article, previous_date_time: datetime):
+        """
+        Move a stored article republished under another date, the caller commits.
+        The row changes partition and the analyses, fingerprint and queue entry
+        referencing it follow through ON UPDATE CASCADE, the copies of the date
+        on party and politician analyses and the co-mention months are moved here.
+        """
+        logger.info("Article date changed", extra={
+            "article_id": article.id, "previous_date_time": previous_date_time, "date_time": article.date_time
+        })
+        self.session.execute(
+            update(Article)
+            .where(Article.id == article.id, Article.date_time == previous_date_time)
+            .values(date_time=article.date_time)
+        )
+        self.session.execute(
+            update(ArticleKey)
+            .where(ArticleKey.article_id == article.article_id, ArticleKey.media_id == article.media_id)
+            .values(date_time=article.date_time)
+        )
+        for model in (PartyAnalysis, PoliticianAnalysis):
+            self.session.execute(
+                update(model)
+                .where(model.sentiment_id == SentimentAnalysis.id, SentimentAnalysis.article_id == article.id)
+                .values(date_time=article.date_time)
+            )
+
+        month = month_start(article.date_time)
+        sources = (
+            self.session
+            .query(CoMentionSource)
+            .join(SentimentAnalysis, SentimentAnalysis.id == CoMentionSource.sentiment_id)
+            .filter(SentimentAnalysis.article_id == article.id, CoMentionSource.month != month)
+            .with_for_update(of=CoMentionSource)
+            .all()
+        )
+        for source in sources:
+            self.add_co_mentions(source.media_id, source.month, source.mentions, -1)
+            self.add_co_mentions(source.media_id, month, source.mentions, 1)
+            source.month = month
+
+    def refresh_analysis_filters(self, articles: List[Article]):
+        """Copy the paywall and category of stored articles onto their party and politician analyses, the caller commits"""
+        if not articles:
+            return
+        changed = values(
+            column('article_id', Integer), column('paywall', Boolean), column('category', String),
+            name='changed'
+        ).data([(article.id, bool(article.paywall), article.category) for article in articles])
+
+        for model in (PartyAnalysis, PoliticianAnalysis):
+            self.session.execute(
+                update(model)
+                .where(
+                    model.sentiment_id == SentimentAnalysis.id,
+                    SentimentAnalysis.article_id == changed.c.article_id,
+                    or_(model.paywall != changed.c.paywall, model.category.is_distinct_from(changed.c.category))
+                )
+                .values(paywall=changed.c.paywall, category=changed.c.category)
+            )
+
+    def insert_or_update_article(self, article: Article, enqueue: bool = False, overwrite: bool = False) -> Dict[str, int]:
+        """Upsert a single article, see `upsert_articles`"""
+        return self.upsert_articles([article], enqueue=enqueue, overwrite=overwrite)
 
     def insert_article_analysis(self, analysis: ArticleAnalysis):
         existing_record = self.session.query(ArticleAnalysis).filter_by(
@@ -118,6 +288,317 @@ class DBConnector:
 
         self.session.commit()
 
+    def record_co_mentions(
+        self,
+        analysis: SentimentAnalysis,
+        parties: List[PartyAnalysis],
+        politicians: List[PoliticianAnalysis]
+    ) -> int:
+        """
+        Count every pair of resolved entities mentioned together in one analysis into
+        `co_mentions`. An analysis is counted once, however often it is synced again.
+        When a replaced analysis mentions other entities, its previous pairs are
+        subtracted first. Returns the number of pairs counted.
+        """
+        # An entity mentioned twice counts once, with its lowest score
+        mentions: Dict[str, int] = {}
+        for entity_type, rows, key in (
+            (CoMention.PARTY, parties, "party_id"), (CoMention.POLITICIAN, politicians, "politician_id")
+        ):
+            for row in rows:
+                entity_id, score = getattr(row, key), str(row.score)
+                if entity_id is None or not VALID_SCORE.fullmatch(score):
+                    continue
+                entity = mention_key((entity_type, entity_id))
+                mentions[entity] = min(mentions.get(entity, 10), int(score))
+        month = month_start(analysis.date_time)
+
+        inserted = self.session.execute(
+            insert(CoMentionSource)
+            .values(sentiment_id=analysis.id, media_id=analysis.media_id, month=month, mentions=mentions)
+            .on_conflict_do_nothing()
+            .returning(CoMentionSource.sentiment_id)
+        ).first()
+        if inserted is None:
+            # Counted before, locked so concurrent syncs of the analysis apply their changes one by one
+            source = self.session.query(CoMentionSource).filter_by(sentiment_id=analysis.id).with_for_update().one()
+            if (source.media_id, source.month, source.mentions) == (analysis.media_id, month, mentions):
+                self.session.commit()
+                return 0
+            self.add_co_mentions(source.media_id, source.month, source.mentions, -1)
+            source.media_id, source.month, source.mentions = analysis.media_id, month, mentions
+
+        counted = self.add_co_mentions(analysis.media_id, month, mentions, 1)
+        self.session.commit()
+        return counted
+
+    def add_co_mentions(self, media_id: int, month: date, mentions: Dict[str, int], sign: int) -> int:
+        """Add (`sign` 1) or subtract (`sign` -1) the pairs of one analysis, the caller commits"""
+        pairs = [
+            {
+                "media_id": media_id, "month": month,
+                "entity_a_type": a[0], "entity_a_id": a[1], "entity_b_type": b[0], "entity_b_id": b[1],
+                "count": sign, "score_a_sum": sign * score_a, "score_b_sum": sign * score_b,
+            }
+            for a, score_a, b, score_b in mention_pairs(mentions)
+        ]
+        if not pairs:
+            return 0
+
+        statement = insert(CoMention).values(pairs)
+        self.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[column.name for column in CoMention.__table__.primary_key],
+                set_={
+                    "count": CoMention.count + statement.excluded.count,
+                    "score_a_sum": CoMention.score_a_sum + statement.excluded.score_a_sum,
+                    "score_b_sum": CoMention.score_b_sum + statement.excluded.score_b_sum,
+                }
+            )
+        )
+        if sign < 0:
+            # Pairs no analysis mentions anymore
+            self.session.execute(
+                delete(CoMention).where(CoMention.media_id == media_id, CoMention.month == month, CoMention.count <= 0)
+            )
+        return len(pairs)
+
+    def enqueue_analysis(self, articles: List[Article]):
+        """Add articles to the analysis queue, the caller commits"""
+        if not articles:
+            return
+        self.session.execute(
+            insert(AnalysisQueue)
+            .values([
+                {"article_id": article.id, "media_id": article.media_id, "date_time": article.date_time,
+                 "status": AnalysisQueue.QUEUED, "attempts": 0}
+                for article in articles
+            ])
+            .on_conflict_do_nothing(index_elements=['article_id'])
+        )
+
+    def enqueue_pending(self, media_id: int, model_name: str) -> int:
+        """Queue all free articles of a media without an analysis by `model_name`, returns the number queued"""
+        pending = (
+            self
+            .pending_articles(media_id, model_name)
+            .filter(Article.date_time.isnot(None))
+            .order_by(None)
+            .with_entities(
+                Article.id, Article.media_id, Article.date_time,
+                literal(AnalysisQueue.QUEUED), literal(0)
+            )
+        )
+        result = self.session.execute(
+            insert(AnalysisQueue)
+            .from_select(['article_id', 'media_id', 'date_time', 'status', 'attempts'], pending.statement)
+            .on_conflict_do_nothing(index_elements=['article_id'])
+        )
+        self.session.commit()
+        return result.rowcount
+
+    # Most similar LSH candidates compared on their full signature
+    max_duplicate_candidates = 100
+
+    def fingerprint_article(self, article: Article) -> ArticleFingerprint:
+        """
+        Store the fingerprint of a flushed article, linked to the most similar stored
+        article at or above `DUPLICATE_THRESHOLD`. The caller commits.
+        """
+        fingerprint = ArticleFingerprint(
+            article_id=article.id, media_id=article.media_id, date_time=article.date_time,
+            signature=signature(article.title, article.body)
+        )
+        self.session.add(fingerprint)
+        if fingerprint.signature is None:
+            return fingerprint
+        packed = fingerprint.signature
+
+        buckets = list(enumerate(band_buckets(packed)))
+        shared_buckets = (
+            select(ArticleLshBucket.article_id)
+            .where(tuple_(ArticleLshBucket.band, ArticleLshBucket.bucket).in_(buckets))
+            .group_by(ArticleLshBucket.article_id)
+            .order_by(desc(func.count()))
+            .limit(self.max_duplicate_candidates)
+        )
+        candidates = (
+            self.session
+            .query(ArticleFingerprint)
+            .filter(ArticleFingerprint.article_id.in_(shared_buckets.scalar_subquery()))
+            .all()
+        )
+
+        scored = [(similarity(packed, candidate.signature), candidate) for candidate in candidates]
+        best_similarity, best = max(scored, key=lambda pair: pair[0], default=(0.0, None))
+        if best is not None and best_similarity >= DUPLICATE_THRESHOLD:
+            fingerprint.canonical_article_id = best.canonical_article_id or best.article_id
+            fingerprint.similarity = best_similarity
+            logger.info("Near-duplicate article linked", extra={
+                "url": article.url, "canonical_article_id": fingerprint.canonical_article_id,
+                "similarity": best_similarity
+            })
+
+        self.session.flush()
+        self.session.execute(
+            insert(ArticleLshBucket)
+            .values([{"band": band, "bucket": bucket, "article_id": article.id} for band, bucket in buckets])
+            .on_conflict_do_nothing()
+        )
+        return fingerprint
+
+    def fingerprint_missing(self, media_id: int, batch_size: int = 500) -> int:
+        """Fingerprint the stored articles of a media without one, oldest first so originals become canonical"""
+        fingerprinted = exists().where(ArticleFingerprint.article_id == Article.id)
+        done = 0
+        while True:
+            articles = (
+                self.session
+                .query(Article)
+                .filter(Article.media_id == media_id, ~fingerprinted)
+                .order_by(Article.date_time, Article.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not articles:
+                return done
+            for article in articles:
+                self.fingerprint_article(article)
+            self.session.commit()
+            done += len(articles)
+            logger.info("Fingerprinted articles", extra={"media_id": media_id, "done": done})
+
+    def canonical_analysis(self, article_id: int, model_name: str) -> Optional[SentimentAnalysis]:
+        """Analysis by `model_name` of the canonical article, when the article is a near-duplicate"""
+        canonical_id = (
+            select(ArticleFingerprint.canonical_article_id)
+            .where(ArticleFingerprint.article_id == article_id)
+            .scalar_subquery()
+        )
+        return (
+            self.session
+            .query(SentimentAnalysis)
+            .filter(SentimentAnalysis.article_id == canonical_id, SentimentAnalysis.model == model_name)
+            .first()
+        )
+
+    def get_crawl_state(self, media_id: int) -> CrawlState:
+        """Crawl state of the media, a new pending state on its first crawl"""
+        state = self.session.get(CrawlState, media_id)
+        if state is None:
+            state = CrawlState(media_id=media_id)
+            self.session.add(state)
+        return state
+
+    def save_crawl_state(self, state: CrawlState):
+        self.session.add(state)
+        self.session.commit()
+        logger.debug("Crawl state saved", extra={
+            "media_id": state.media_id,
+            "newest": state.newest_date_time,
+            "oldest": state.oldest_date_time
+        })
+
+    def plan_crawl_windows(self, media_id: int, since: datetime, until: datetime, size: timedelta) -> int:
+        """Split the range into windows of `size`, skipping windows that overlap already planned ones"""
+        planned = 0
+        start = since
+        while start < until:
+            end = start + size
+            result = self.session.execute(text("""
+                INSERT INTO crawl_windows (media_id, start_date_time, end_date_time, status)
+                SELECT :media_id, :start, :end, :status
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM crawl_windows
+                    WHERE media_id = :media_id AND start_date_time < :end AND end_date_time > :start
+                )
+                ON CONFLICT DO NOTHING
+            """), {"media_id": media_id, "start": start, "end": end, "status": CrawlWindow.PENDING})
+            planned += result.rowcount
+            start = end
+
+        self.session.commit()
+        return planned
+
+    def claim_crawl_windows(self, media_id: int, claimed_by: str, limit: int, stale_after: timedelta) -> list:
+        """Claim pending windows, newest first, and windows whose claim went stale"""
+        claimable = (
+            select(CrawlWindow.id)
+            .where(
+                CrawlWindow.media_id == media_id,
+                or_(
+                    CrawlWindow.status == CrawlWindow.PENDING,
+                    and_(CrawlWindow.status == CrawlWindow.RUNNING, CrawlWindow.claimed_at < func.now() - stale_after)
+                )
+            )
+            .order_by(desc(CrawlWindow.start_date_time))
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = self.session.execute(
+            update(CrawlWindow)
+            .where(CrawlWindow.id.in_(claimable.scalar_subquery()))
+            .values(status=CrawlWindow.RUNNING, claimed_by=claimed_by, claimed_at=func.now())
+            .returning(CrawlWindow.id, CrawlWindow.start_date_time, CrawlWindow.end_date_time, CrawlWindow.cursor_end)
+        ).all()
+        self.session.commit()
+        return claimed
+
+    def update_crawl_window(self, window_id: int, cursor_end: datetime):
+        """Save the progress of a window, which also renews its claim"""
+        self.session.execute(
+            update(CrawlWindow)
+            .where(CrawlWindow.id == window_id)
+            .values(cursor_end=cursor_end, claimed_at=func.now())
+        )
+        self.session.commit()
+
+    def complete_crawl_window(self, window_id: int):
+        self.session.execute(
+            update(CrawlWindow)
+            .where(CrawlWindow.id == window_id)
+            .values(status=CrawlWindow.DONE, completed_at=func.now())
+        )
+        self.session.commit()
+
+    def extend_crawl_state(self, state: CrawlState):
+        """Grow the crawled range of the media downwards over adjacent completed windows"""
+        if inspect(state).persistent:
+            # Other processes extend the same range
+            self.session.refresh(state)
+        if state.oldest_date_time is None:
+            # A media without a crawled range starts it at its newest completed window
+            seed = (
+                self.session
+                .query(CrawlWindow.start_date_time, CrawlWindow.end_date_time)
+                .filter_by(media_id=state.media_id, status=CrawlWindow.DONE)
+                .order_by(desc(CrawlWindow.end_date_time))
+                .first()
+            )
+            if seed is None:
+                return
+            state.oldest_date_time = seed.start_date_time
+            state.newest_date_time = state.newest_date_time or seed.end_date_time
+
+        windows = (
+            self.session
+            .query(CrawlWindow.start_date_time, CrawlWindow.end_date_time)
+            .filter_by(media_id=state.media_id, status=CrawlWindow.DONE)
+            .filter(CrawlWindow.start_date_time < state.oldest_date_time)
+            .order_by(desc(CrawlWindow.end_date_time))
+            .all()
+        )
+        for start, end in windows:
+            if end >= state.oldest_date_time > start:
+                state.oldest_date_time = start
+        self.save_crawl_state(state)
+
+    def refresh_media_counts(self):
+        """Refresh the per-media counts view without blocking readers"""
+        self.session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY media_counts"))
+        self.session.commit()
+        logger.info("Media counts refreshed")
+
     def close(self):
         """Close the session."""
         self.session.close()
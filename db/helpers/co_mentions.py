@@ -0,0 +1,66 @@
+import re
+from typing import Dict, List, Tuple
+
+# Scores counted into `co_mentions`, the 0-10 scale written as digits
+VALID_SCORE = re.compile(r"[0-9]|10")
+
+# (type, id) of a mentioned entity, keyed as "party:12" in `co_mention_sources.mentions`
+Entity = Tuple[str, int]
+
+
+def mention_key(entity: Entity) -> str:
+    return f"{entity[0]}:{entity[1]}"
+
+
+def parse_mention_key(key: str) -> Entity:
+    entity_type, entity_id = key.split(":")
+    return entity_type, int(entity_id)
+
+
+def mention_pairs(mentions: Dict[str, int]) -> List[Tuple[Entity, int, Entity, int]]:
+    """Every pair of mentioned entities with their scores, ordered by (type, id) like the backfill"""
+    entities = sorted((parse_mention_key(key), score) for key, score in mentions.items())
+    return [
+        (a, score_a, b, score_b)
+        for index, (a, score_a) in enumerate(entities) for b, score_b in entities[index + 1:]
+    ]
+
+
+# Resolved mentions of every analysis with a valid score, an entity
+# mentioned twice in one analysis counts once with its lowest score
+MENTIONS = """
+mentions AS (
+    SELECT sentiment_id, 'party' AS type, party_id AS id, min(score::int) AS score,
+           min(media_id) AS media_id, min(date_time) AS date_time
+    FROM parties_analysis
+    WHERE party_id IS NOT NULL AND score ~ '^([0-9]|10)$'
+    GROUP BY sentiment_id, party_id
+    UNION ALL
+    SELECT sentiment_id, 'politician', politician_id, min(score::int),
+           min(media_id), min(date_time)
+    FROM politicians_analysis
+    WHERE politician_id IS NOT NULL AND score ~ '^([0-9]|10)$'
+    GROUP BY sentiment_id, politician_id
+)
+"""
+
+# Counts all stored analyses into empty `co_mentions` and `co_mention_sources` tables
+CO_MENTIONS_BACKFILL = f"""
+WITH {MENTIONS}
+INSERT INTO co_mentions (media_id, month, entity_a_type, entity_a_id, entity_b_type, entity_b_id,
+                         count, score_a_sum, score_b_sum)
+SELECT a.media_id, date_trunc('month', a.date_time)::date, a.type, a.id, b.type, b.id,
+       count(*), sum(a.score), sum(b.score)
+FROM mentions a
+JOIN mentions b ON b.sentiment_id = a.sentiment_id AND (a.type, a.id) < (b.type, b.id)
+GROUP BY 1, 2, 3, 4, 5, 6
+"""
+
+CO_MENTION_SOURCES_BACKFILL = f"""
+WITH {MENTIONS}
+INSERT INTO co_mention_sources (sentiment_id, media_id, month, mentions)
+SELECT sentiment_id, min(media_id), date_trunc('month', min(date_time))::date,
+       jsonb_object_agg(type || ':' || id, score)
+FROM mentions
+GROUP BY sentiment_id
+"""
@@ -0,0 +1,87 @@
+from datetime import date, datetime
+from typing import Iterator, Set, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+# Tables range-partitioned by month on `date_time`
+PARTITIONED_TABLES = ("articles",)
+
+# Partitions known to exist (committed), so each month is only checked once per process
+_known_partitions: Set[str] = set()
+# Tables known to be partitioned, a table not partitioned yet is checked again
+_partitioned_tables: Set[str] = set()
+# How long creating a partition waits for the lock on its parent
+PARTITION_LOCK_TIMEOUT = "10s"
+
+
+def month_start(value: Union[date, datetime]) -> date:
+    return date(value.year, value.month, 1)
+
+
+def next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def iter_months(start: Union[date, datetime], end: Union[date, datetime]) -> Iterator[date]:
+    """Yield the first day of every month between `start` and `end` inclusive"""
+    current = month_start(start)
+    while current <= month_start(end):
+        yield current
+        current = next_month(current)
+
+
+def month_partition_name(table: str, month: date) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+
+def create_month_partition(connection: Connection, table: str, month: date) -> str:
+    """Create the partition of `table` holding rows of the given month"""
+    name = month_partition_name(table, month)
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    ))
+    return name
+
+
+def create_default_partition(connection: Connection, table: str) -> str:
+    """Create the catch-all partition for rows outside any month partition"""
+    name = f"{table}_default"
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} DEFAULT"))
+    return name
+
+
+def is_partitioned(connection: Connection, table: str) -> bool:
+    if table not in _partitioned_tables and connection.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table}
+    ).scalar():
+        _partitioned_tables.add(table)
+    return table in _partitioned_tables
+
+
+def ensure_month_partition(engine: Engine, table: str, value: Union[str, date, datetime]):
+    """
+    Make sure the month partition for `value` exists before writing into it.
+    Does nothing when the table is not partitioned (migration not applied yet).
+
+    The partition is created and committed in a transaction of its own, ahead of
+    the write: created inline, a rollback of the write would drop it again while
+    it stays cached, and the rows of its month would go to the default partition.
+    A write must not hold locks on `table` yet, the creation waits for them at
+    most `PARTITION_LOCK_TIMEOUT` and then raises.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    month = month_start(value)
+    name = month_partition_name(table, month)
+    if name in _known_partitions:
+        return
+
+    with engine.begin() as connection:
+        if not is_partitioned(connection, table):
+            return
+        connection.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        create_month_partition(connection, table, month)
+    _known_partitions.add(name)
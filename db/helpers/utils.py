@@ -1,4 +1,7 @@
 import os
+import re
+
+from unidecode import unidecode
 
 
 def get_db_address():
@@ -9,4 +12,25 @@ def get_db_address():
         'database': os.getenv('DB_NAME'),
         'sslmode': os.getenv('DB_SSL_MODE', 'require')
     }
-    return f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}/{db_config['database']}?sslmode={db_config['sslmode']}"
\ No newline at end of file
+    return f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}/{db_config['database']}?sslmode={db_config['sslmode']}"
+
+
+def slugify(text):
+    """
+    Convert text to a URL-friendly slug.
+    
+    Args:
+        text (str): The text to convert to a slug
+        
+    Returns:
+        str: A URL-friendly slug
+    """
+    # Convert to ASCII
+    text = unidecode(text)
+    # Convert to lowercase
+    text = text.lower()
+    # Remove non-alphanumeric characters and replace with hyphens
+    text = re.sub(r'[^a-z0-9]+', '-', text)
+    # Remove leading/trailing hyphens
+    text = text.strip('-')
+    return text
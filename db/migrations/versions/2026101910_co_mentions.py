@@ -0,0 +1,98 @@
+"""Co-mention graph
+
+Monthly co-mention counts and score sums of party and politician pairs per
+media, and the mentions every analysis contributed to them so a replaced
+analysis can be subtracted before it is counted again. Both are backfilled
+from the stored analyses.
+
+The backfill is a frozen copy of `db.helpers.co_mentions` as of this revision.
+
+Revision ID: 2026101910
+Revises: 202610199
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '2026101910'
+down_revision: Union[str, None] = '202610199'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Resolved mentions of every analysis with a 0-10 score, an entity
+# mentioned twice in one analysis counts once with its lowest score
+MENTIONS = """
+mentions AS (
+    SELECT sentiment_id, 'party' AS type, party_id AS id, min(score::int) AS score,
+           min(media_id) AS media_id, min(date_time) AS date_time
+    FROM parties_analysis
+    WHERE party_id IS NOT NULL AND score ~ '^([0-9]|10)$'
+    GROUP BY sentiment_id, party_id
+    UNION ALL
+    SELECT sentiment_id, 'politician', politician_id, min(score::int),
+           min(media_id), min(date_time)
+    FROM politicians_analysis
+    WHERE politician_id IS NOT NULL AND score ~ '^([0-9]|10)$'
+    GROUP BY sentiment_id, politician_id
+)
+"""
+
+CO_MENTIONS_BACKFILL = f"""
+WITH {MENTIONS}
+INSERT INTO co_mentions (media_id, month, entity_a_type, entity_a_id, entity_b_type, entity_b_id,
+                         count, score_a_sum, score_b_sum)
+SELECT a.media_id, date_trunc('month', a.date_time)::date, a.type, a.id, b.type, b.id,
+       count(*), sum(a.score), sum(b.score)
+FROM mentions a
+JOIN mentions b ON b.sentiment_id = a.sentiment_id AND (a.type, a.id) < (b.type, b.id)
+GROUP BY 1, 2, 3, 4, 5, 6
+"""
+
+CO_MENTION_SOURCES_BACKFILL = f"""
+WITH {MENTIONS}
+INSERT INTO co_mention_sources (sentiment_id, media_id, month, mentions)
+SELECT sentiment_id, min(media_id), date_trunc('month', min(date_time))::date,
+       jsonb_object_agg(type || ':' || id, score)
+FROM mentions
+GROUP BY sentiment_id
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'co_mentions',
+        sa.Column('media_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('entity_a_type', sa.String(10), nullable=False),
+        sa.Column('entity_a_id', sa.Integer(), nullable=False),
+        sa.Column('entity_b_type', sa.String(10), nullable=False),
+        sa.Column('entity_b_id', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('score_a_sum', sa.Integer(), nullable=False),
+        sa.Column('score_b_sum', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['media_id'], ['medias.id']),
+        sa.PrimaryKeyConstraint('media_id', 'month', 'entity_a_type', 'entity_a_id', 'entity_b_type', 'entity_b_id')
+    )
+    op.create_table(
+        'co_mention_sources',
+        sa.Column('sentiment_id', sa.Integer(), nullable=False),
+        sa.Column('media_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('mentions', postgresql.JSONB(), nullable=False),
+        sa.ForeignKeyConstraint(['sentiment_id'], ['sentiment_analysis.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['media_id'], ['medias.id']),
+        sa.PrimaryKeyConstraint('sentiment_id')
+    )
+
+    op.execute(CO_MENTIONS_BACKFILL)
+    op.execute(CO_MENTION_SOURCES_BACKFILL)
+
+
+def downgrade() -> None:
+    op.drop_table('co_mention_sources')
+    op.drop_table('co_mentions')
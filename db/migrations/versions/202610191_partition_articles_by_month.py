@@ -0,0 +1,179 @@
+"""Partition articles by publication month
+
+Range-partitions `articles` by `date_time` (one partition per month plus a
+default partition) and denormalizes `media_id`/`date_time` onto
+`sentiment_analysis`, so date-range filters prune partitions and old months
+can be vacuumed/reindexed independently.
+
+Postgres requires the partition key in every unique constraint, so the
+primary key becomes (id, date_time) and `uq_article_media` becomes
+(article_id, media_id, date_time). The (article_id, media_id) key alone stays
+unique in the new `article_keys` table. Sentiment rows reference articles
+through (article_id, date_time).
+
+Revision ID: 202610191
+Revises: 202503231
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '202610191'
+down_revision: Union[str, None] = '202503231'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months created ahead of the newest article
+FUTURE_MONTHS = 12
+
+
+def next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def create_month_partition(month: date):
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS articles_{month:%Y_%m} PARTITION OF articles "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    )
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    # Denormalize article columns onto sentiment rows
+    op.add_column('sentiment_analysis', sa.Column('media_id', sa.Integer(), nullable=True))
+    op.add_column('sentiment_analysis', sa.Column('date_time', sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE sentiment_analysis sa
+        SET media_id = a.media_id, date_time = a.date_time
+        FROM articles a
+        WHERE a.id = sa.article_id
+    """)
+    op.alter_column('sentiment_analysis', 'media_id', nullable=False)
+    op.alter_column('sentiment_analysis', 'date_time', nullable=False)
+    op.drop_constraint('sentiment_analysis_article_id_fkey', 'sentiment_analysis', type_='foreignkey')
+
+    # Keep the id sequence alive while the old table is dropped
+    op.rename_table('articles', 'articles_legacy')
+    op.execute("ALTER TABLE articles_legacy RENAME CONSTRAINT articles_pkey TO articles_legacy_pkey")
+    op.execute("ALTER TABLE articles_legacy RENAME CONSTRAINT uq_article_media TO uq_article_media_legacy")
+    op.execute("ALTER INDEX ix_title RENAME TO ix_title_legacy")
+    op.execute("ALTER SEQUENCE articles_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE articles (
+            id INTEGER NOT NULL DEFAULT nextval('articles_id_seq'),
+            article_id INTEGER NOT NULL,
+            media_id INTEGER NOT NULL REFERENCES medias (id),
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            date_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            authors TEXT,
+            paywall BOOLEAN NOT NULL,
+            category VARCHAR(100),
+            preview_url VARCHAR(255),
+            body TEXT NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+            PRIMARY KEY (id, date_time),
+            CONSTRAINT uq_article_media UNIQUE (article_id, media_id, date_time)
+        ) PARTITION BY RANGE (date_time)
+    """)
+    op.execute("ALTER SEQUENCE articles_id_seq OWNED BY articles.id")
+
+    oldest, newest = connection.execute(sa.text("SELECT min(date_time), max(date_time) FROM articles_legacy")).one()
+    today = date.today()
+    newest = max(newest.date(), today) if newest else today
+    last_month = date(newest.year + (newest.month + FUTURE_MONTHS - 1) // 12,
+                      (newest.month + FUTURE_MONTHS - 1) % 12 + 1, 1)
+    month = date((oldest or today).year, (oldest or today).month, 1)
+    while month <= last_month:
+        create_month_partition(month)
+        month = next_month(month)
+    op.execute("CREATE TABLE IF NOT EXISTS articles_default PARTITION OF articles DEFAULT")
+
+    op.execute("""
+        INSERT INTO articles (id, article_id, media_id, url, title, date_time, authors, paywall,
+                              category, preview_url, body, created_at)
+        SELECT id, article_id, media_id, url, title, date_time, authors, paywall,
+               category, preview_url, body, created_at
+        FROM articles_legacy
+    """)
+    op.drop_table('articles_legacy')
+
+    op.create_table(
+        'article_keys',
+        sa.Column('article_id', sa.Integer(), nullable=False),
+        sa.Column('media_id', sa.Integer(), nullable=False),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date_time', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['media_id'], ['medias.id']),
+        sa.PrimaryKeyConstraint('article_id', 'media_id'),
+        sa.UniqueConstraint('id')
+    )
+    op.execute("""
+        INSERT INTO article_keys (article_id, media_id, id, date_time)
+        SELECT article_id, media_id, id, date_time FROM articles
+    """)
+
+    op.create_index('ix_title', 'articles', ['title'])
+    op.create_foreign_key(
+        'fk_sentiment_analysis_article', 'sentiment_analysis', 'articles',
+        ['article_id', 'date_time'], ['id', 'date_time'], onupdate='CASCADE'
+    )
+    op.create_foreign_key(None, 'sentiment_analysis', 'medias', ['media_id'], ['id'])
+    op.create_index('ix_sentiment_analysis_media_date', 'sentiment_analysis', ['media_id', 'date_time'])
+    op.create_index('ix_sentiment_analysis_article', 'sentiment_analysis', ['article_id'])
+    op.execute("ANALYZE articles")
+
+
+def downgrade() -> None:
+    op.drop_table('article_keys')
+    op.drop_index('ix_sentiment_analysis_article', 'sentiment_analysis')
+    op.drop_index('ix_sentiment_analysis_media_date', 'sentiment_analysis')
+    op.drop_constraint('sentiment_analysis_media_id_fkey', 'sentiment_analysis', type_='foreignkey')
+    op.drop_constraint('fk_sentiment_analysis_article', 'sentiment_analysis', type_='foreignkey')
+
+    op.rename_table('articles', 'articles_partitioned')
+    op.execute("ALTER TABLE articles_partitioned RENAME CONSTRAINT articles_pkey TO articles_partitioned_pkey")
+    op.execute("ALTER TABLE articles_partitioned RENAME CONSTRAINT uq_article_media TO uq_article_media_partitioned")
+    op.execute("ALTER INDEX ix_title RENAME TO ix_title_partitioned")
+    op.execute("ALTER SEQUENCE articles_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE articles (
+            id INTEGER NOT NULL DEFAULT nextval('articles_id_seq') PRIMARY KEY,
+            article_id INTEGER NOT NULL,
+            media_id INTEGER NOT NULL REFERENCES medias (id),
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            date_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            authors TEXT,
+            paywall BOOLEAN NOT NULL,
+            category VARCHAR(100),
+            preview_url VARCHAR(255),
+            body TEXT NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now()
+        )
+    """)
+    op.execute("ALTER SEQUENCE articles_id_seq OWNED BY articles.id")
+    op.execute("""
+        INSERT INTO articles (id, article_id, media_id, url, title, date_time, authors, paywall,
+                              category, preview_url, body, created_at)
+        SELECT id, article_id, media_id, url, title, date_time, authors, paywall,
+               category, preview_url, body, created_at
+        FROM articles_partitioned
+    """)
+    # Partitions are dropped together with their parent
+    op.drop_table('articles_partitioned')
+
+    op.create_unique_constraint('uq_article_media', 'articles', ['article_id', 'media_id'])
+    op.create_index('ix_title', 'articles', ['title'])
+    op.create_foreign_key(
+        'sentiment_analysis_article_id_fkey', 'sentiment_analysis', 'articles', ['article_id'], ['id']
+    )
+    op.drop_column('sentiment_analysis', 'date_time')
+    op.drop_column('sentiment_analysis', 'media_id')
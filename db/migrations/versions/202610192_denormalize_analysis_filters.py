@@ -0,0 +1,64 @@
+"""Denormalize article filter columns onto party and politician analyses
+
+Copies media_id, date_time, paywall and category from the article onto
+`parties_analysis` and `politicians_analysis`, so the sentiment aggregates
+filter and group a single table through a covering index.
+
+Revision ID: 202610192
+Revises: 202610191
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '202610192'
+down_revision: Union[str, None] = '202610191'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('parties_analysis', 'politicians_analysis')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('media_id', sa.Integer(), nullable=True))
+        op.add_column(table, sa.Column('date_time', sa.DateTime(), nullable=True))
+        op.add_column(table, sa.Column('paywall', sa.Boolean(), nullable=True))
+        op.add_column(table, sa.Column('category', sa.String(100), nullable=True))
+
+        op.execute(f"""
+            UPDATE {table} analysis
+            SET media_id = a.media_id,
+                date_time = a.date_time,
+                paywall = a.paywall,
+                category = a.category
+            FROM sentiment_analysis sa
+            JOIN articles a ON a.id = sa.article_id AND a.date_time = sa.date_time
+            WHERE sa.id = analysis.sentiment_id
+        """)
+
+        op.alter_column(table, 'media_id', nullable=False)
+        op.alter_column(table, 'date_time', nullable=False)
+        op.alter_column(table, 'paywall', nullable=False)
+        op.create_foreign_key(None, table, 'medias', ['media_id'], ['id'])
+        op.create_index(
+            f'ix_{table}_filters', table, ['media_id', 'paywall', 'date_time'],
+            postgresql_include=['name', 'score']
+        )
+        op.create_index(f'ix_{table}_sentiment', table, ['sentiment_id'])
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_sentiment', table)
+        op.drop_index(f'ix_{table}_filters', table)
+        op.drop_constraint(f'{table}_media_id_fkey', table, type_='foreignkey')
+        op.drop_column(table, 'category')
+        op.drop_column(table, 'paywall')
+        op.drop_column(table, 'date_time')
+        op.drop_column(table, 'media_id')
@@ -0,0 +1,43 @@
+"""Materialized view with per-media counts
+
+Serves the article/analysis counts of `/media/` and `/media/{slug}/` from a
+precomputed view refreshed after crawl and analysis runs.
+
+Revision ID: 202610193
+Revises: 202610192
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '202610193'
+down_revision: Union[str, None] = '202610192'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # `analyzed_count` counts analyses, an article analyzed by several models counts once per model
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS media_counts AS
+        SELECT m.id AS media_id,
+               COALESCE(a.total_count, 0) AS total_count,
+               COALESCE(s.analyzed_count, 0) AS analyzed_count,
+               now() AS refreshed_at
+        FROM medias m
+        LEFT JOIN (
+            SELECT media_id, count(*) AS total_count FROM articles GROUP BY media_id
+        ) a ON a.media_id = m.id
+        LEFT JOIN (
+            SELECT media_id, count(*) AS analyzed_count FROM sentiment_analysis GROUP BY media_id
+        ) s ON s.media_id = m.id
+    """)
+    # A unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_media_counts_media ON media_counts (media_id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS media_counts")
@@ -0,0 +1,132 @@
+"""Resolve party and politician names to entity ids
+
+Adds `party_id`/`politician_id` to the analysis tables and backfills them
+through an alias index of the entity titles and aliases. Names without a
+matching title or alias are registered as new parties/politicians.
+
+Also adds the unique `name_key` (normalized title with sorted tokens) that
+new entities are registered on, filled for the existing entities. Of entities
+sharing a key, the lowest id gets it.
+
+The name normalization is a frozen copy of `db.parsers.entity_resolver` as of
+this revision, so replaying the migration doesn't change with the resolver.
+
+Revision ID: 202610194
+Revises: 202610193
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+import re
+from typing import Dict, List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from unidecode import unidecode
+
+# revision identifiers, used by Alembic.
+revision: str = '202610194'
+down_revision: Union[str, None] = '202610193'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (analysis table, id column, entity table)
+ENTITIES = (
+    ('parties_analysis', 'party_id', 'parties'),
+    ('politicians_analysis', 'politician_id', 'politicians'),
+)
+
+ALIAS_SEPARATORS = re.compile(r'[,;\n]')
+
+
+def name_keys(name: str) -> List[str]:
+    """Keys a name is indexed under: normalized and with tokens in sorted order"""
+    key = re.sub(r'[^a-z0-9]+', '-', unidecode(name or '').lower()).strip('-')
+    if not key:
+        return []
+    sorted_key = '-'.join(sorted(key.split('-')))
+    return [key] if sorted_key == key else [key, sorted_key]
+
+
+def load_index(connection, entity_table: str) -> Dict[str, int]:
+    """Keys of all titles and aliases, the first entity claiming a key in id order wins"""
+    index: Dict[str, int] = {}
+    rows = connection.execute(sa.text(f"SELECT id, title, aliases FROM {entity_table} ORDER BY id"))
+    for entity_id, title, aliases in rows:
+        for name in [title, *ALIAS_SEPARATORS.split(aliases or '')]:
+            for key in name_keys(name):
+                index.setdefault(key, entity_id)
+    return index
+
+
+def fill_name_keys(connection, entity_table: str):
+    taken = set()
+    rows = connection.execute(sa.text(f"SELECT id, title FROM {entity_table} ORDER BY id")).all()
+    for entity_id, title in rows:
+        keys = name_keys(title)
+        if not keys or keys[-1] in taken:
+            continue
+        taken.add(keys[-1])
+        connection.execute(
+            sa.text(f"UPDATE {entity_table} SET name_key = :key WHERE id = :id"),
+            {"key": keys[-1], "id": entity_id}
+        )
+
+
+def resolve(connection, index: Dict[str, int], entity_table: str, name: str):
+    keys = name_keys(name)
+    for key in keys:
+        if key in index:
+            return index[key]
+    if not keys:
+        return None
+
+    entity_id = connection.execute(
+        sa.text(f"INSERT INTO {entity_table} (title, name_key) VALUES (:title, :key) RETURNING id"),
+        {"title": name.strip(), "key": keys[-1]}
+    ).scalar()
+    for key in keys:
+        index[key] = entity_id
+    return entity_id
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    for table, column, entity_table in ENTITIES:
+        op.add_column(entity_table, sa.Column('name_key', sa.Text(), nullable=True))
+        fill_name_keys(connection, entity_table)
+        op.create_index(f'uq_{entity_table}_name_key', entity_table, ['name_key'], unique=True)
+
+        op.add_column(table, sa.Column(column, sa.Integer(), nullable=True))
+        op.create_foreign_key(None, table, entity_table, [column], ['id'])
+
+        index = load_index(connection, entity_table)
+        names = [name for (name,) in connection.execute(sa.text(f"SELECT DISTINCT name FROM {table}"))]
+        for name in names:
+            connection.execute(
+                sa.text(f"UPDATE {table} SET {column} = :entity_id WHERE name = :name"),
+                {"entity_id": resolve(connection, index, entity_table, name), "name": name}
+            )
+
+        op.drop_index(f'ix_{table}_filters', table)
+        op.create_index(
+            f'ix_{table}_filters', table, ['media_id', 'paywall', 'date_time'],
+            postgresql_include=[column, 'score']
+        )
+        op.create_index(f'ix_{table}_{column[:-3]}', table, [column, 'media_id', 'date_time'])
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    for table, column, entity_table in ENTITIES:
+        op.drop_index(f'ix_{table}_{column[:-3]}', table)
+        op.drop_index(f'ix_{table}_filters', table)
+        op.create_index(
+            f'ix_{table}_filters', table, ['media_id', 'paywall', 'date_time'],
+            postgresql_include=['name', 'score']
+        )
+        op.drop_constraint(f'{table}_{column}_fkey', table, type_='foreignkey')
+        op.drop_column(table, column)
+
+        op.drop_index(f'uq_{entity_table}_name_key', entity_table)
+        op.drop_column(entity_table, 'name_key')
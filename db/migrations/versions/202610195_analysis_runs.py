@@ -0,0 +1,47 @@
+"""Checkpointed analyzer runs
+
+Tracks analyzer runs with a persisted cursor and counters, so an interrupted
+`python -m lib.sentiment` resumes from its last checkpoint.
+
+Revision ID: 202610195
+Revises: 202610194
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '202610195'
+down_revision: Union[str, None] = '202610194'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analysis_runs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('media_id', sa.Integer(), nullable=False),
+        sa.Column('model', sa.String(25), nullable=False),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('cursor_date_time', sa.DateTime(), nullable=True),
+        sa.Column('cursor_article_id', sa.Integer(), nullable=True),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('analyzed', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['media_id'], ['medias.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_analysis_runs_status', 'analysis_runs', ['media_id', 'model', 'status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analysis_runs_status', 'analysis_runs')
+    op.drop_table('analysis_runs')
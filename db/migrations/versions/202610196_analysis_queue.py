@@ -0,0 +1,50 @@
+"""Analysis work queue
+
+Queue of articles waiting for analysis, filled by the crawler pipeline and
+leased by `python -m lib.sentiment.worker` processes.
+
+Revision ID: 202610196
+Revises: 202610195
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '202610196'
+down_revision: Union[str, None] = '202610195'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analysis_queue',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('article_id', sa.Integer(), nullable=False),
+        sa.Column('media_id', sa.Integer(), nullable=False),
+        sa.Column('date_time', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('leased_by', sa.String(64), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('enqueued_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['article_id', 'date_time'], ['articles.id', 'articles.date_time'],
+            onupdate='CASCADE', ondelete='CASCADE', name='fk_analysis_queue_article'
+        ),
+        sa.ForeignKeyConstraint(['media_id'], ['medias.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('article_id')
+    )
+    op.create_index('ix_analysis_queue_claim', 'analysis_queue', ['status', 'lease_expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analysis_queue_claim', 'analysis_queue')
+    op.drop_table('analysis_queue')
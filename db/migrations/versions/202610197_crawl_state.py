@@ -0,0 +1,49 @@
+"""Per-media crawl state
+
+Stores the crawled date range of every media, so incremental crawls only
+search the window since the last crawl and backfills continue where they
+stopped.
+
+Revision ID: 202610197
+Revises: 202610196
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '202610197'
+down_revision: Union[str, None] = '202610196'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'crawl_state',
+        sa.Column('media_id', sa.Integer(), nullable=False),
+        sa.Column('newest_date_time', sa.DateTime(), nullable=True),
+        sa.Column('oldest_date_time', sa.DateTime(), nullable=True),
+        sa.Column('last_window_start', sa.DateTime(), nullable=True),
+        sa.Column('last_window_end', sa.DateTime(), nullable=True),
+        sa.Column('last_crawl_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['media_id'], ['medias.id']),
+        sa.PrimaryKeyConstraint('media_id')
+    )
+
+    # Seed the range from the articles crawled so far
+    op.execute("""
+        INSERT INTO crawl_state (media_id, newest_date_time, oldest_date_time)
+        SELECT media_id, max(date_time), min(date_time)
+        FROM articles
+        WHERE date_time IS NOT NULL
+        GROUP BY media_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('crawl_state')
@@ -0,0 +1,44 @@
+"""Sharded crawl windows
+
+Date windows of sharded backfill crawls, claimed by spider processes so
+windows are crawled concurrently without overlapping.
+
+Revision ID: 202610198
+Revises: 202610197
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '202610198'
+down_revision: Union[str, None] = '202610197'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'crawl_windows',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('media_id', sa.Integer(), nullable=False),
+        sa.Column('start_date_time', sa.DateTime(), nullable=False),
+        sa.Column('end_date_time', sa.DateTime(), nullable=False),
+        sa.Column('cursor_end', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(16), nullable=False),
+        sa.Column('claimed_by', sa.String(64), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['media_id'], ['medias.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('media_id', 'start_date_time', name='uq_crawl_windows_start')
+    )
+    op.create_index('ix_crawl_windows_claim', 'crawl_windows', ['media_id', 'status', 'start_date_time'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_crawl_windows_claim', 'crawl_windows')
+    op.drop_table('crawl_windows')
@@ -0,0 +1,55 @@
+"""Article fingerprints
+
+MinHash signatures of articles with an LSH bucket index, linking
+near-duplicate articles to their canonical version.
+
+Revision ID: 202610199
+Revises: 202610198
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '202610199'
+down_revision: Union[str, None] = '202610198'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'article_fingerprints',
+        sa.Column('article_id', sa.Integer(), nullable=False),
+        sa.Column('media_id', sa.Integer(), nullable=False),
+        sa.Column('date_time', sa.DateTime(), nullable=False),
+        sa.Column('signature', sa.LargeBinary(), nullable=True),
+        sa.Column('canonical_article_id', sa.Integer(), nullable=True),
+        sa.Column('similarity', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['article_id', 'date_time'], ['articles.id', 'articles.date_time'],
+            onupdate='CASCADE', ondelete='CASCADE', name='fk_article_fingerprints_article'
+        ),
+        sa.ForeignKeyConstraint(['media_id'], ['medias.id']),
+        sa.PrimaryKeyConstraint('article_id')
+    )
+    op.create_index('ix_article_fingerprints_canonical', 'article_fingerprints', ['canonical_article_id'])
+
+    op.create_table(
+        'article_lsh_buckets',
+        sa.Column('band', sa.SmallInteger(), nullable=False),
+        sa.Column('bucket', sa.BigInteger(), nullable=False),
+        sa.Column('article_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['article_id'], ['article_fingerprints.article_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('band', 'bucket', 'article_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('article_lsh_buckets')
+    op.drop_index('ix_article_fingerprints_canonical', 'article_fingerprints')
+    op.drop_table('article_fingerprints')
@@ -1,16 +1,21 @@
 from sqlalchemy import Column, Integer, Text, ForeignKey, DateTime, Boolean, String, Date, func, JSON, UniqueConstraint, \
-    Index
+    Index, DDL, ForeignKeyConstraint, event, BigInteger, SmallInteger, LargeBinary, Float
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from typing import List, Dict, Any, Optional
 
 Base = declarative_base()
+# Materialized views are created with DDL listeners below, not by `create_all`
+ViewBase = declarative_base()
 
 
 class Article(Base):
     """
     Model representing news articles.
+    The table is range-partitioned by month on `date_time`, so the partition key
+    is part of the primary key and of the unique constraint. The (article_id, media_id)
+    key alone is kept unique in `ArticleKey`.
     """
     __tablename__ = 'articles'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -18,7 +23,7 @@ class Article(Base):
     media_id = Column(Integer, ForeignKey('medias.id'), nullable=False)
     url = Column(Text, nullable=False)
     title = Column(Text, nullable=False)
-    date_time = Column(DateTime, nullable=False)
+    date_time = Column(DateTime, primary_key=True, nullable=False)
     authors = Column(Text)
     paywall = Column(Boolean, nullable=False)
     category = Column(String(100))
@@ -27,8 +32,9 @@ class Article(Base):
     created_at = Column(DateTime, default=func.now())
 
     __table_args__ = (
-        UniqueConstraint('article_id', 'media_id', name='uq_article_media'),
-        Index('ix_title', 'title')  # PostgreSQL compatible index
+        UniqueConstraint('article_id', 'media_id', 'date_time', name='uq_article_media'),
+        Index('ix_title', 'title'),  # PostgreSQL compatible index
+        {'postgresql_partition_by': 'RANGE (date_time)'}
     )
 
     def to_tooltip_dict(self) -> Dict[str, Any]:
@@ -57,6 +63,30 @@ class Article(Base):
         }
 
 
+class ArticleKey(Base):
+    """
+    The (article_id, media_id) key of every article with its row id and current date.
+    Postgres only enforces unique constraints on `articles` together with the partition
+    key, so the key is kept unique here. An article republished under another date is
+    found by it and moved, instead of being stored a second time.
+    """
+    __tablename__ = 'article_keys'
+
+    article_id = Column(Integer, primary_key=True)
+    media_id = Column(Integer, ForeignKey('medias.id'), primary_key=True)
+    # `articles.id`, drawn from its sequence when the key is claimed
+    id = Column(Integer, nullable=False, unique=True)
+    date_time = Column(DateTime, nullable=False)
+
+
+# Rows outside of any monthly partition land here until their month is created
+event.listen(
+    Article.__table__,
+    'after_create',
+    DDL('CREATE TABLE IF NOT EXISTS articles_default PARTITION OF articles DEFAULT')
+)
+
+
 class Media(Base):
     """
     Model representing media sources (newspapers, websites, etc).
@@ -106,6 +136,12 @@ class Parties(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String(255), nullable=False)
     aliases = Column(Text)
+    # Normalized title of the entity, unique so concurrent resolvers register a name once, see `entity_key`
+    name_key = Column(Text)
+
+    __table_args__ = (
+        Index('uq_parties_name_key', 'name_key', unique=True),
+    )
 
 
 class Politicians(Base):
@@ -118,6 +154,12 @@ class Politicians(Base):
     title = Column(String(255), nullable=False)
     aliases = Column(Text)
     current_party = Column(Integer, ForeignKey('parties.id'))
+    # See `Parties.name_key`
+    name_key = Column(Text)
+
+    __table_args__ = (
+        Index('uq_politicians_name_key', 'name_key', unique=True),
+    )
 
 
 class SentimentAnalysis(Base):
@@ -126,11 +168,25 @@ class SentimentAnalysis(Base):
     """
     __tablename__ = 'sentiment_analysis'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    article_id = Column(Integer, ForeignKey('articles.id'), nullable=False)
+    article_id = Column(Integer, nullable=False)
+    # Denormalized from the article so range filters don't need the articles table
+    media_id = Column(Integer, ForeignKey('medias.id'), nullable=False)
+    date_time = Column(DateTime, nullable=False)
     model = Column(String(25), nullable=False)
     sentiment = Column(JSONB, nullable=False)  # Using PostgreSQL's native JSONB type
     analysed_at = Column(DateTime, default=func.now())
 
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ['article_id', 'date_time'],
+            ['articles.id', 'articles.date_time'],
+            onupdate='CASCADE',
+            name='fk_sentiment_analysis_article'
+        ),
+        Index('ix_sentiment_analysis_media_date', 'media_id', 'date_time'),
+        Index('ix_sentiment_analysis_article', 'article_id'),
+    )
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert sentiment analysis to dictionary"""
         return {
@@ -189,8 +245,24 @@ class PartyAnalysis(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     sentiment_id = Column(Integer, ForeignKey('sentiment_analysis.id'), nullable=False)
     name = Column(Text)
+    # Resolved from `name` through the alias index, see `EntityResolver`
+    party_id = Column(Integer, ForeignKey('parties.id'))
     score = Column(Text)
     explanation = Column(Text)
+    # Copied from the article at write time, so aggregates don't join articles
+    media_id = Column(Integer, ForeignKey('medias.id'), nullable=False)
+    date_time = Column(DateTime, nullable=False)
+    paywall = Column(Boolean, nullable=False)
+    category = Column(String(100))
+
+    __table_args__ = (
+        Index(
+            'ix_parties_analysis_filters', 'media_id', 'paywall', 'date_time',
+            postgresql_include=['party_id', 'score']
+        ),
+        Index('ix_parties_analysis_sentiment', 'sentiment_id'),
+        Index('ix_parties_analysis_party', 'party_id', 'media_id', 'date_time'),
+    )
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert party analysis to dictionary"""
@@ -211,8 +283,24 @@ class PoliticianAnalysis(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     sentiment_id = Column(Integer, ForeignKey('sentiment_analysis.id'), nullable=False)
     name = Column(Text)
+    # Resolved from `name` through the alias index, see `EntityResolver`
+    politician_id = Column(Integer, ForeignKey('politicians.id'))
     score = Column(Text)
     explanation = Column(Text)
+    # Copied from the article at write time, so aggregates don't join articles
+    media_id = Column(Integer, ForeignKey('medias.id'), nullable=False)
+    date_time = Column(DateTime, nullable=False)
+    paywall = Column(Boolean, nullable=False)
+    category = Column(String(100))
+
+    __table_args__ = (
+        Index(
+            'ix_politicians_analysis_filters', 'media_id', 'paywall', 'date_time',
+            postgresql_include=['politician_id', 'score']
+        ),
+        Index('ix_politicians_analysis_sentiment', 'sentiment_id'),
+        Index('ix_politicians_analysis_politician', 'politician_id', 'media_id', 'date_time'),
+    )
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert politician analysis to dictionary"""
@@ -222,3 +310,240 @@ class PoliticianAnalysis(Base):
             "score": self.score,
             "explanation": self.explanation
         }
+
+
+class AnalysisRun(Base):
+    """
+    Checkpoint of an analyzer run over the pending articles of one media.
+    Articles are processed newest first, the cursor is the (date_time, id)
+    of the last processed article.
+    """
+    __tablename__ = 'analysis_runs'
+
+    RUNNING = 'running'
+    FINISHED = 'finished'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    media_id = Column(Integer, ForeignKey('medias.id'), nullable=False)
+    model = Column(String(25), nullable=False)
+    status = Column(String(16), nullable=False, default=RUNNING)
+    cursor_date_time = Column(DateTime)
+    cursor_article_id = Column(Integer)
+    processed = Column(Integer, nullable=False, default=0)
+    analyzed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    started_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_analysis_runs_status', 'media_id', 'model', 'status'),
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "media_id": self.media_id,
+            "model": self.model,
+            "status": self.status,
+            "processed": self.processed,
+            "analyzed": self.analyzed,
+            "failed": self.failed,
+        }
+
+
+class AnalysisQueue(Base):
+    """
+    Work queue of articles waiting for analysis, filled by the crawler pipeline.
+    Workers lease entries for a limited time and extend the lease with heartbeats,
+    entries of crashed workers become claimable again once their lease expires.
+    Entries are deleted when the analysis is stored.
+    """
+    __tablename__ = 'analysis_queue'
+
+    QUEUED = 'queued'
+    LEASED = 'leased'
+    FAILED = 'failed'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    article_id = Column(Integer, nullable=False, unique=True)
+    media_id = Column(Integer, ForeignKey('medias.id'), nullable=False)
+    date_time = Column(DateTime, nullable=False)
+    status = Column(String(16), nullable=False, default=QUEUED)
+    attempts = Column(Integer, nullable=False, default=0)
+    leased_by = Column(String(64))
+    lease_expires_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    enqueued_at = Column(DateTime, default=func.now())
+    last_error = Column(Text)
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ['article_id', 'date_time'],
+            ['articles.id', 'articles.date_time'],
+            onupdate='CASCADE',
+            ondelete='CASCADE',
+            name='fk_analysis_queue_article'
+        ),
+        Index('ix_analysis_queue_claim', 'status', 'lease_expires_at'),
+    )
+
+
+class CrawlState(Base):
+    """
+    Per-media crawl progress. Articles between `oldest_date_time` and
+    `newest_date_time` have been crawled, incremental crawls start from the
+    newest mark and backfills continue below the oldest one.
+    """
+    __tablename__ = 'crawl_state'
+
+    media_id = Column(Integer, ForeignKey('medias.id'), primary_key=True)
+    newest_date_time = Column(DateTime)
+    oldest_date_time = Column(DateTime)
+    last_window_start = Column(DateTime)
+    last_window_end = Column(DateTime)
+    last_crawl_at = Column(DateTime)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class CrawlWindow(Base):
+    """
+    Date range of a sharded crawl. Windows of a media never overlap, they are
+    claimed by spider processes and crawled independently, `cursor_end` is
+    the end of the part that is still left.
+    """
+    __tablename__ = 'crawl_windows'
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    media_id = Column(Integer, ForeignKey('medias.id'), nullable=False)
+    start_date_time = Column(DateTime, nullable=False)
+    end_date_time = Column(DateTime, nullable=False)
+    cursor_end = Column(DateTime)
+    status = Column(String(16), nullable=False, default=PENDING)
+    claimed_by = Column(String(64))
+    claimed_at = Column(DateTime)
+    completed_at = Column(DateTime)
+
+    __table_args__ = (
+        UniqueConstraint('media_id', 'start_date_time', name='uq_crawl_windows_start'),
+        Index('ix_crawl_windows_claim', 'media_id', 'status', 'start_date_time'),
+    )
+
+
+class ArticleFingerprint(Base):
+    """
+    MinHash signature of an article, see `lib.crawler.helpers.fingerprint`.
+    Near-duplicates (republished or updated versions under a new URL) point to
+    the first stored version in `canonical_article_id`, their analysis is copied
+    from it instead of being requested again.
+    """
+    __tablename__ = 'article_fingerprints'
+
+    article_id = Column(Integer, primary_key=True)
+    media_id = Column(Integer, ForeignKey('medias.id'), nullable=False)
+    date_time = Column(DateTime, nullable=False)
+    # NULL for texts too short to be compared
+    signature = Column(LargeBinary)
+    canonical_article_id = Column(Integer)
+    similarity = Column(Float)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ['article_id', 'date_time'],
+            ['articles.id', 'articles.date_time'],
+            onupdate='CASCADE',
+            ondelete='CASCADE',
+            name='fk_article_fingerprints_article'
+        ),
+        Index('ix_article_fingerprints_canonical', 'canonical_article_id'),
+    )
+
+
+class ArticleLshBucket(Base):
+    """LSH index of the fingerprints, one row per signature band"""
+    __tablename__ = 'article_lsh_buckets'
+
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    article_id = Column(
+        Integer, ForeignKey('article_fingerprints.article_id', ondelete='CASCADE'), primary_key=True
+    )
+
+
+class CoMention(Base):
+    """
+    Monthly co-mention counts of two entities (parties or politicians) in the
+    analyses of one media, with the sums of both entities' scores in those
+    analyses. Pairs are ordered, (entity_a_type, entity_a_id) < (entity_b_type, entity_b_id).
+    Maintained incrementally by `SentimentParser.sync_analysis`.
+    """
+    __tablename__ = 'co_mentions'
+
+    PARTY = 'party'
+    POLITICIAN = 'politician'
+
+    media_id = Column(Integer, ForeignKey('medias.id'), primary_key=True)
+    month = Column(Date, primary_key=True)
+    entity_a_type = Column(String(10), primary_key=True)
+    entity_a_id = Column(Integer, primary_key=True)
+    entity_b_type = Column(String(10), primary_key=True)
+    entity_b_id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    score_a_sum = Column(Integer, nullable=False, default=0)
+    score_b_sum = Column(Integer, nullable=False, default=0)
+
+
+class CoMentionSource(Base):
+    """
+    Analyses counted in `co_mentions` with the mentions they contributed, so syncing an
+    analysis again does not count it twice and a replaced analysis is counted anew
+    """
+    __tablename__ = 'co_mention_sources'
+
+    sentiment_id = Column(Integer, ForeignKey('sentiment_analysis.id', ondelete='CASCADE'), primary_key=True)
+    media_id = Column(Integer, ForeignKey('medias.id'), nullable=False)
+    month = Column(Date, nullable=False)
+    # The counted mentions as {"party:12": 7, ...}, subtracted again when the analysis is replaced
+    mentions = Column(JSONB, nullable=False)
+
+
+class MediaCounts(ViewBase):
+    """
+    Materialized view with per-media article and analysis counts.
+    Refreshed after crawl and analysis runs, see `DBConnector.refresh_media_counts`.
+    """
+    __tablename__ = 'media_counts'
+
+    media_id = Column(Integer, primary_key=True)
+    total_count = Column(Integer, nullable=False)
+    analyzed_count = Column(Integer, nullable=False)
+    refreshed_at = Column(DateTime)
+
+
+# `analyzed_count` counts analyses, an article analyzed by several models counts once per model
+MEDIA_COUNTS_VIEW = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS media_counts AS
+SELECT m.id AS media_id,
+       COALESCE(a.total_count, 0) AS total_count,
+       COALESCE(s.analyzed_count, 0) AS analyzed_count,
+       now() AS refreshed_at
+FROM medias m
+LEFT JOIN (
+    SELECT media_id, count(*) AS total_count FROM articles GROUP BY media_id
+) a ON a.media_id = m.id
+LEFT JOIN (
+    SELECT media_id, count(*) AS analyzed_count FROM sentiment_analysis GROUP BY media_id
+) s ON s.media_id = m.id
+"""
+
+# A unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+MEDIA_COUNTS_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS ix_media_counts_media ON media_counts (media_id)"
+
+event.listen(Base.metadata, 'after_create', DDL(MEDIA_COUNTS_VIEW))
+event.listen(Base.metadata, 'after_create', DDL(MEDIA_COUNTS_INDEX))
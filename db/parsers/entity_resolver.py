@@ -0,0 +1,160 @@
+import re
+import time
+from typing import Dict, Iterable, Optional, Set, Type
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from db.helpers.utils import slugify
+from db.models.models import Parties, Politicians
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+ALIAS_SEPARATORS = re.compile(r'[,;\n]')
+
+
+def normalize_name(name: str) -> str:
+    """Case-, diacritic- and script-insensitive key of an entity name"""
+    return slugify(name or '')
+
+
+def name_keys(name: str) -> Iterable[str]:
+    """Keys a name is indexed under: normalized and with tokens in sorted order"""
+    key = normalize_name(name)
+    if not key:
+        return []
+    sorted_key = '-'.join(sorted(key.split('-')))
+    return [key] if sorted_key == key else [key, sorted_key]
+
+
+def entity_key(name: str) -> Optional[str]:
+    """Value of the unique `name_key` column for an entity titled `name`, insensitive to token order"""
+    keys = name_keys(name)
+    return keys[-1] if keys else None
+
+
+class AliasIndex:
+    """
+    Precompiled lookup of normalized titles and aliases to entity ids
+    for one entity table (`Parties` or `Politicians`).
+    """
+
+    def __init__(self, model: Type, register_unknown: bool = True):
+        self.model = model
+        self.register_unknown = register_unknown
+        self.index: Dict[str, int] = {}
+        # Keys of entities registered in the open transaction, dropped from the index if it is rolled back
+        self.uncommitted: Set[str] = set()
+
+    def load(self, session: Session):
+        self.index.clear()
+        self.uncommitted.clear()
+        rows = session.query(self.model.id, self.model.title, self.model.aliases).order_by(self.model.id).all()
+        for entity_id, title, aliases in rows:
+            self.add(entity_id, title, aliases)
+        return self
+
+    def add(self, entity_id: int, title: str, aliases: Optional[str] = None) -> Set[str]:
+        """Index the title and aliases of an entity, returns the keys it claimed"""
+        claimed = set()
+        names = [title, *ALIAS_SEPARATORS.split(aliases or '')]
+        for name in names:
+            for key in name_keys(name):
+                # The first entity claiming a key wins, so canonical titles loaded in id order are stable
+                if key not in self.index:
+                    self.index[key] = entity_id
+                    claimed.add(key)
+        return claimed
+
+    def committed(self):
+        self.uncommitted.clear()
+
+    def rolled_back(self):
+        for key in self.uncommitted:
+            self.index.pop(key, None)
+        self.uncommitted.clear()
+
+    def resolve(self, session: Session, name: str) -> Optional[int]:
+        """Return the entity id for `name`, registering unknown names as new entities"""
+        keys = name_keys(name)
+        for key in keys:
+            if key in self.index:
+                return self.index[key]
+
+        if not keys or not self.register_unknown:
+            return None
+
+        # Another worker may register the same name concurrently, the unique key makes one of them win
+        title, key = name.strip(), entity_key(name)
+        entity_id = session.execute(
+            insert(self.model)
+            .values(title=title, name_key=key)
+            .on_conflict_do_nothing(index_elements=['name_key'])
+            .returning(self.model.id)
+        ).scalar()
+        if entity_id is None:
+            entity_id = session.execute(select(self.model.id).where(self.model.name_key == key)).scalar_one()
+        else:
+            logger.info("Registered new entity", extra={"entity": self.model.__tablename__, "title": title})
+
+        self.uncommitted |= self.add(entity_id, title)
+        return entity_id
+
+
+class CachedAliasIndex:
+    """
+    Read-only alias index kept across requests. It is rebuilt when entities were added
+    (the row count or highest id changed), after `max_age` seconds so edited aliases are
+    picked up, or after `invalidate`.
+    """
+
+    def __init__(self, model: Type, max_age: float = 300):
+        self.model = model
+        self.max_age = max_age
+        self.index: Optional[AliasIndex] = None
+        self.version = None
+        self.loaded_at = 0.0
+
+    def invalidate(self):
+        self.index = None
+
+    def get(self, session: Session) -> AliasIndex:
+        version = tuple(session.query(func.count(self.model.id), func.max(self.model.id)).one())
+        if self.index is None or version != self.version or time.monotonic() - self.loaded_at > self.max_age:
+            # Built aside and swapped in, concurrent requests keep reading the previous index
+            self.index = AliasIndex(self.model, register_unknown=False).load(session)
+            self.version, self.loaded_at = version, time.monotonic()
+        return self.index
+
+
+class EntityResolver:
+    """Maps free-text party and politician names from model responses to entity ids"""
+
+    def __init__(self, session: Session, register_unknown: bool = True):
+        self.session = session
+        self.parties = AliasIndex(Parties, register_unknown).load(session)
+        self.politicians = AliasIndex(Politicians, register_unknown).load(session)
+        # Ids registered in a transaction that is rolled back don't exist, so they must not stay cached
+        event.listen(session, 'after_commit', self.committed)
+        event.listen(session, 'after_rollback', self.rolled_back)
+
+    def committed(self, session: Session):
+        self.parties.committed()
+        self.politicians.committed()
+
+    def rolled_back(self, session: Session):
+        self.parties.rolled_back()
+        self.politicians.rolled_back()
+
+    def reload(self):
+        """Reload both indexes, picking up entities registered or edited elsewhere"""
+        self.parties.load(self.session)
+        self.politicians.load(self.session)
+
+    def resolve_party(self, name: str) -> Optional[int]:
+        return self.parties.resolve(self.session, name)
+
+    def resolve_politician(self, name: str) -> Optional[int]:
+        return self.politicians.resolve(self.session, name)
@@ -1,23 +1,38 @@
 from db.db_connector import DBConnector
 from db.models.models import *
+from db.parsers.entity_resolver import EntityResolver
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class SentimentParser:
     def __init__(self):
         self.db = DBConnector()
+        self.resolver = EntityResolver(self.db.session)
+
+    def rollback(self):
+        """Discard a failed transaction and reload the entity indexes it may have changed"""
+        self.db.session.rollback()
+        self.resolver.reload()
+
+    def sync_analysis(self, analysis: SentimentAnalysis, article: Optional[Article] = None):
+        logger.debug("Syncing analysis", extra={"sentiment_id": analysis.id})
 
-    def sync_analysis(self, analysis: SentimentAnalysis):
-        print("Syncing analysis...")
+        if article is None:
+            article = self.db.session.query(Article).filter(Article.id == analysis.article_id).first()
 
         article_analysis = self.parse_article_analysis(analysis)
         self.db.insert_article_analysis(article_analysis)
 
-        parties_analysis = self.parse_parties_analysis(analysis)
+        parties_analysis = self.parse_parties_analysis(analysis, article, self.resolver)
         self.db.insert_parties_analysis(parties_analysis)
 
-        politicians_analysis = self.parse_politicians_analysis(analysis)
+        politicians_analysis = self.parse_politicians_analysis(analysis, article, self.resolver)
         self.db.insert_politician_analysis(politicians_analysis)
 
+        self.db.record_co_mentions(analysis, parties_analysis, politicians_analysis)
+
     @staticmethod
     def parse_article_analysis(response: SentimentAnalysis) -> ArticleAnalysis:
         return ArticleAnalysis(
@@ -29,23 +44,47 @@ class SentimentParser:
         )
 
     @staticmethod
-    def parse_parties_analysis(response: SentimentAnalysis) -> List[PartyAnalysis]:
+    def article_filter_columns(article: Article) -> Dict[str, Any]:
+        """Article columns copied onto analysis rows for join-free filtering"""
+        return {
+            "media_id": article.media_id,
+            "date_time": article.date_time,
+            "paywall": article.paywall,
+            "category": article.category,
+        }
+
+    @staticmethod
+    def parse_parties_analysis(
+        response: SentimentAnalysis,
+        article: Article,
+        resolver: Optional[EntityResolver] = None
+    ) -> List[PartyAnalysis]:
+        filter_columns = SentimentParser.article_filter_columns(article)
         return [
             PartyAnalysis(
                 sentiment_id=response.id,
                 name=party['name'],
+                party_id=resolver.resolve_party(party['name']) if resolver else None,
                 score=party['score'],
                 explanation=party['explanation'],
+                **filter_columns
             ) for party in response.sentiment["parties"]
         ]
 
     @staticmethod
-    def parse_politicians_analysis(response: SentimentAnalysis) -> List[PoliticianAnalysis]:
+    def parse_politicians_analysis(
+        response: SentimentAnalysis,
+        article: Article,
+        resolver: Optional[EntityResolver] = None
+    ) -> List[PoliticianAnalysis]:
+        filter_columns = SentimentParser.article_filter_columns(article)
         return [
             PoliticianAnalysis(
                 sentiment_id=response.id,
                 name=politician['name'],
+                politician_id=resolver.resolve_politician(politician['name']) if resolver else None,
                 score=politician['score'],
                 explanation=politician['explanation'],
+                **filter_columns
             ) for politician in response.sentiment["politicians"]
         ]
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from lib.crawler.helpers.archive import HtmlArchive, archive_path
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class HtmlArchiveExtension:
+    """
+    Appends the raw HTML of article pages to the media's archive (see `HtmlArchive`),
+    so extraction changes can be re-run over the archive instead of re-crawling.
+    Only requests with `meta["archive"]` and 200 responses are archived, a page
+    is stored again only when its body changed.
+    """
+
+    def __init__(self, directory: str, segment_size: int):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.archive = None
+        self.archived = 0
+        self.unchanged = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("HTML_ARCHIVE_ENABLED"):
+            raise NotConfigured
+        extension = cls(
+            crawler.settings.get("HTML_ARCHIVE_DIR"),
+            crawler.settings.getint("HTML_ARCHIVE_SEGMENT_MB") * 1024 * 1024
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        return extension
+
+    def spider_opened(self, spider):
+        self.archive = HtmlArchive(archive_path(spider.media_id, self.directory), self.segment_size)
+
+    def response_received(self, response, request, spider):
+        if self.archive is None or not request.meta.get("archive") or response.status != 200:
+            return
+        if self.archive.append(response.url, response.body, response.status, datetime.now()):
+            self.archived += 1
+        else:
+            self.unchanged += 1
+
+    def spider_closed(self, spider):
+        if self.archive is None:
+            return
+        self.archive.close()
+        logger.info("HTML archive updated", extra={"archived": self.archived, "unchanged": self.unchanged})
@@ -0,0 +1,292 @@
+"""
+Raw HTML archive of crawled article pages.
+
+Pages are appended to segment files of independently zstd-compressed records,
+`<length: uint32 LE><zstd frame>` each, and a frame holds a JSON header line
+(url, status, fetched_at) followed by the page body. A SQLite index maps every
+URL to the segment and offset of its newest record, so single pages are read
+with one mmap slice and whole segments are re-processed sequentially.
+
+    python -m lib.crawler.helpers.archive stats --media-id 1
+    python -m lib.crawler.helpers.archive reextract --media-id 1
+    python -m lib.crawler.helpers.archive reindex --media-id 1
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import struct
+from datetime import datetime
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+ARCHIVE_DIR = "archive"
+SEGMENT_SIZE = 256 * 1024 * 1024
+COMPRESSION_LEVEL = 6
+# Index rows are committed, and segments flushed, every this many records
+COMMIT_EVERY = 100
+
+LENGTH = struct.Struct("<I")
+SEGMENT_NAME = "segment-{:06d}.zst"
+
+
+class ArchivedPage(NamedTuple):
+    url: str
+    status: int
+    fetched_at: str
+    body: bytes
+
+
+def zstd():
+    # Optional dependency, only needed where the archive is written or read
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("The HTML archive requires the `zstandard` package") from e
+    return zstandard
+
+
+class HtmlArchive:
+    """Append-only segment files with a URL index, one archive directory per media"""
+
+    def __init__(self, directory: str, segment_size: int = SEGMENT_SIZE, level: int = COMPRESSION_LEVEL):
+        zstandard = zstd()
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.decompressor = zstandard.ZstdDecompressor()
+
+        self.index = sqlite3.connect(os.path.join(directory, "index.sqlite"))
+        self.index.execute("PRAGMA journal_mode=WAL")
+        self.index.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, segment INTEGER NOT NULL, offset INTEGER NOT NULL, "
+            "length INTEGER NOT NULL, digest TEXT NOT NULL, fetched_at TEXT NOT NULL)"
+        )
+
+        self.writer = None
+        self.segment = None
+        self.uncommitted = 0
+        self.maps: Dict[int, Tuple[object, mmap.mmap]] = {}
+
+    def segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, SEGMENT_NAME.format(segment))
+
+    def segments(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith("segment-"))
+        return [int(name[len("segment-"):-len(".zst")]) for name in names]
+
+    def open_writer(self, size: int):
+        """Continue the last segment, or start the next one when the record does not fit"""
+        if self.writer is None:
+            segments = self.segments()
+            self.segment = segments[-1] if segments else 1
+            self.writer = open(self.segment_path(self.segment), "ab")
+        if self.writer.tell() and self.writer.tell() + size > self.segment_size:
+            self.flush()
+            self.writer.close()
+            self.segment += 1
+            self.writer = open(self.segment_path(self.segment), "ab")
+
+    def append(self, url: str, body: bytes, status: int = 200, fetched_at: datetime = None) -> bool:
+        """Archive a page, returns False when the newest archived copy has the same body"""
+        digest = hashlib.sha1(body).hexdigest()
+        known = self.index.execute("SELECT digest FROM pages WHERE url = ?", (url,)).fetchone()
+        if known is not None and known[0] == digest:
+            return False
+
+        fetched_at = (fetched_at or datetime.now()).isoformat()
+        header = json.dumps({"url": url, "status": status, "fetched_at": fetched_at}).encode()
+        frame = self.compressor.compress(header + b"\n" + body)
+
+        self.open_writer(LENGTH.size + len(frame))
+        offset = self.writer.tell()
+        self.writer.write(LENGTH.pack(len(frame)))
+        self.writer.write(frame)
+        self.index.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+            (url, self.segment, offset, len(frame), digest, fetched_at)
+        )
+
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_EVERY:
+            self.flush()
+        return True
+
+    def flush(self):
+        # Segment data reaches the disk before the index rows pointing at it
+        if self.writer is not None:
+            self.writer.flush()
+            os.fsync(self.writer.fileno())
+        self.index.commit()
+        self.uncommitted = 0
+
+    def mapped(self, segment: int) -> mmap.mmap:
+        file, mapping = self.maps.get(segment, (None, None))
+        size = os.path.getsize(self.segment_path(segment))
+        # The segment being written grows, map it again when it did
+        if mapping is None or len(mapping) < size:
+            if mapping is not None:
+                mapping.close()
+                file.close()
+            file = open(self.segment_path(segment), "rb")
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[segment] = (file, mapping)
+        return mapping
+
+    def decode(self, frame) -> ArchivedPage:
+        header, body = self.decompressor.decompress(frame).split(b"\n", 1)
+        metadata = json.loads(header)
+        return ArchivedPage(metadata["url"], metadata["status"], metadata["fetched_at"], body)
+
+    def get(self, url: str) -> Optional[ArchivedPage]:
+        """Newest archived copy of a page"""
+        location = self.index.execute("SELECT segment, offset, length FROM pages WHERE url = ?", (url,)).fetchone()
+        if location is None:
+            return None
+        segment, offset, length = location
+        start = offset + LENGTH.size
+        return self.decode(self.mapped(segment)[start:start + length])
+
+    def records(self, segment: int) -> Iterator[Tuple[int, memoryview]]:
+        """(offset, frame) of every complete record of a segment, in file order"""
+        mapping = self.mapped(segment)
+        view = memoryview(mapping)
+        offset = 0
+        try:
+            while offset + LENGTH.size <= len(mapping):
+                length, = LENGTH.unpack_from(mapping, offset)
+                start = offset + LENGTH.size
+                if start + length > len(mapping):
+                    # Torn write at the end of a segment
+                    break
+                yield offset, view[start:start + length]
+                offset = start + length
+        finally:
+            view.release()
+
+    def pages(self) -> Iterator[ArchivedPage]:
+        """Newest copy of every archived page, read sequentially segment by segment"""
+        for segment in self.segments():
+            newest = {
+                offset for offset, in self.index.execute("SELECT offset FROM pages WHERE segment = ?", (segment,))
+            }
+            for offset, frame in self.records(segment):
+                if offset in newest:
+                    yield self.decode(frame)
+
+    def reindex(self) -> int:
+        """Rebuild the index from the segments, e.g. after records were written without their index rows"""
+        self.flush()
+        self.index.execute("DELETE FROM pages")
+        indexed = 0
+        for segment in self.segments():
+            for offset, frame in self.records(segment):
+                page = self.decode(frame)
+                self.index.execute(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                    (page.url, segment, offset, len(frame), hashlib.sha1(page.body).hexdigest(), page.fetched_at)
+                )
+                indexed += 1
+        self.index.commit()
+        return indexed
+
+    def stats(self) -> dict:
+        pages, = self.index.execute("SELECT count(*) FROM pages").fetchone()
+        segments = self.segments()
+        return {
+            "pages": pages,
+            "segments": len(segments),
+            "size_mb": round(sum(os.path.getsize(self.segment_path(segment)) for segment in segments) / 2 ** 20, 1),
+        }
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        for file, mapping in self.maps.values():
+            mapping.close()
+            file.close()
+        self.maps.clear()
+        self.index.close()
+
+
+def archive_path(media_id: int, directory: str = None) -> str:
+    return os.path.join(directory or os.getenv("HTML_ARCHIVE_DIR", ARCHIVE_DIR), str(media_id))
+
+
+def reextract(archive: HtmlArchive, media_id: int, dry_run: bool = False, batch_size: int = 500) -> dict:
+    """Run the current extraction over every archived page and overwrite the stored article fields"""
+    from collections import Counter
+
+    from parsel import Selector
+
+    from db.db_connector import DBConnector
+    from lib.crawler.helpers.extraction import extract_article
+    from lib.crawler.items import ArticleItem
+    from lib.crawler.pipelines import article_from_item
+
+    db = None if dry_run else DBConnector()
+    stats = Counter()
+    batch = []
+
+    def store():
+        if db is not None:
+            stats.update(db.upsert_articles(batch, enqueue=True, overwrite=True))
+        batch.clear()
+
+    for page in archive.pages():
+        stats["pages"] += 1
+        if page.status != 200:
+            stats["skipped"] += 1
+            continue
+
+        root = Selector(text=page.body.decode("utf-8", errors="replace")).root
+        article = article_from_item(ArticleItem(media_id=media_id, url=page.url, **extract_article(root)))
+        if article is None:
+            stats["skipped"] += 1
+            continue
+        batch.append(article)
+        if len(batch) >= batch_size:
+            store()
+    store()
+
+    if db is not None:
+        db.refresh_media_counts()
+    return dict(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m lib.crawler.helpers.archive")
+    parser.add_argument("command", choices=["stats", "reextract", "reindex"])
+    parser.add_argument("--media-id", type=int, required=True)
+    parser.add_argument("--dir", help=f"Archive root, HTML_ARCHIVE_DIR or '{ARCHIVE_DIR}' by default")
+    parser.add_argument("--dry-run", action="store_true", help="reextract without writing to the database")
+    args = parser.parse_args()
+
+    archive = HtmlArchive(archive_path(args.media_id, args.dir))
+    try:
+        if args.command == "stats":
+            logger.info("Archive stats", extra=archive.stats())
+        elif args.command == "reindex":
+            logger.info("Archive reindexed", extra={"pages": archive.reindex()})
+        else:
+            started_at = datetime.now()
+            stats = reextract(archive, args.media_id, args.dry_run)
+            elapsed = (datetime.now() - started_at).total_seconds()
+            logger.info("Archive re-extracted", extra={
+                **stats, "pages_per_sec": round(stats["pages"] / elapsed, 1) if elapsed else None
+            })
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+MinHash signatures of article texts for near-duplicate detection.
+
+The Jaccard similarity of the word 5-gram sets of two articles is estimated by
+the share of equal signature values. For lookups, the signature is cut into
+`BANDS` bands whose hashes are stored as LSH buckets, articles sharing a bucket
+are candidates and are compared on the full signature.
+
+Articles stored before fingerprinting was added are fingerprinted with
+
+    python -m lib.crawler.helpers.fingerprint --media-id 1
+"""
+import argparse
+import hashlib
+import random
+import re
+from array import array
+from typing import List, Optional, Set
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 5
+# Shorter texts (e.g. paywall teasers) are too generic to be compared
+MIN_WORDS = 50
+DUPLICATE_THRESHOLD = 0.8
+
+WORD = re.compile(r"\w+")
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# Fixed seed, signatures must stay comparable with the stored ones
+_rng = random.Random(20261019)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+_A = np.array([a for a, _ in PERMUTATIONS], dtype=np.uint64)[:, None]
+_B = np.array([b for _, b in PERMUTATIONS], dtype=np.uint64)[:, None]
+# Permuted values of this many shingles at a time, bounds the (NUM_PERM, n) working arrays
+MINHASH_CHUNK = 4096
+
+
+def hash64(data: bytes, signed: bool = False) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=signed)
+
+
+def shingles(text: str) -> Optional[Set[int]]:
+    """Hashed word 5-grams of the text, None when it is too short"""
+    words = WORD.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    return {
+        hash64(" ".join(words[index:index + SHINGLE_WORDS]).encode())
+        for index in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def _mod_prime(values: np.ndarray) -> np.ndarray:
+    """Partial reduction modulo 2^61 - 1, the result is below 2^61 + 8"""
+    return (values & np.uint64(MERSENNE_PRIME)) + (values >> np.uint64(61))
+
+
+def _permute(values: np.ndarray) -> np.ndarray:
+    """
+    (a * value + b) mod 2^61 - 1 of every permutation and value, computed in uint64.
+    The product is split into 32-bit halves, 2^64 = 8 and 2^61 = 1 modulo the prime.
+    """
+    low = np.uint64(MAX_HASH)
+    shift = np.uint64(32)
+    a_high, a_low = _A >> shift, _A & low
+    v_high, v_low = values >> shift, values & low
+
+    middle = a_high * v_low + a_low * v_high
+    total = (
+        _mod_prime((a_high * v_high) << np.uint64(3))
+        + _mod_prime(((middle & np.uint64((1 << 29) - 1)) << shift) + (middle >> np.uint64(29)))
+        + _mod_prime(a_low * v_low)
+        + _B
+    )
+    total = _mod_prime(_mod_prime(total))
+    return np.where(total >= np.uint64(MERSENNE_PRIME), total - np.uint64(MERSENNE_PRIME), total)
+
+
+def minhash(hashes: Set[int]) -> List[int]:
+    values = np.fromiter((value % MERSENNE_PRIME for value in hashes), dtype=np.uint64, count=len(hashes))
+    signature = np.full(NUM_PERM, MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(values), MINHASH_CHUNK):
+        permuted = _permute(values[start:start + MINHASH_CHUNK][None, :]) & np.uint64(MAX_HASH)
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature.tolist()
+
+
+def signature(title: str, body: str) -> Optional[bytes]:
+    """Packed MinHash signature of an article, None when the text is too short"""
+    hashes = shingles(f"{title or ''} {body or ''}")
+    if hashes is None:
+        return None
+    return array("I", minhash(hashes)).tobytes()
+
+
+def unpack(packed: bytes) -> array:
+    values = array("I")
+    values.frombytes(packed)
+    return values
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimated Jaccard similarity of two packed signatures"""
+    return sum(a == b for a, b in zip(unpack(first), unpack(second))) / NUM_PERM
+
+
+def band_buckets(packed: bytes) -> List[int]:
+    """LSH bucket of every band, as signed 64-bit values for a BIGINT column"""
+    size = ROWS * array("I").itemsize
+    return [hash64(bytes([band]) + packed[band * size:(band + 1) * size], signed=True) for band in range(BANDS)]
+
+
+def main():
+    from db.db_connector import DBConnector
+
+    parser = argparse.ArgumentParser(prog="python -m lib.crawler.helpers.fingerprint")
+    parser.add_argument("--media-id", type=int, required=True)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    DBConnector().fingerprint_missing(args.media_id, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import random
+import time
+from typing import Dict, List, Optional
+
+PROXY_LIST_PATH = "proxies.txt"
+
+# Weight of the newest sample in the moving averages
+SMOOTHING = 0.2
+
+
+def load_proxies(path: str = PROXY_LIST_PATH) -> List[str]:
+    """Proxy URLs of a proxies.txt file, one per line, `#` comments and blank lines skipped"""
+    try:
+        with open(path, encoding="utf-8") as file:
+            lines = [line.strip() for line in file]
+    except FileNotFoundError:
+        return []
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def get_proxies() -> List[str]:
+    """Getter of the `ROTATING_PROXY_LIST_GETTER` setting"""
+    return load_proxies()
+
+
+def moving_average(average: Optional[float], sample: float) -> float:
+    return sample if average is None else (1 - SMOOTHING) * average + SMOOTHING * sample
+
+
+class ProxyHealth:
+    """Latency and error rate of one proxy, as exponential moving averages"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.banned_until = 0.0
+
+    def succeeded(self, latency: float):
+        self.requests += 1
+        self.latency = moving_average(self.latency, latency)
+        self.error_rate = moving_average(self.error_rate, 0)
+        self.consecutive_failures = 0
+
+    def failed(self, backoff_base: float, backoff_cap: float):
+        """Count a failure and take the proxy out of rotation for an exponentially growing backoff"""
+        self.requests += 1
+        self.failures += 1
+        self.error_rate = moving_average(self.error_rate, 1)
+        self.consecutive_failures += 1
+        backoff = min(backoff_cap, backoff_base * 2 ** (self.consecutive_failures - 1))
+        self.banned_until = time.monotonic() + backoff * random.uniform(0.5, 1)
+
+    def available(self, now: float) -> bool:
+        return self.banned_until <= now
+
+    def score(self, default_latency: float) -> float:
+        """Lower is healthier: expected latency inflated by the error rate"""
+        latency = default_latency if self.latency is None else self.latency
+        return latency * (1 + 4 * self.error_rate)
+
+    def to_dict(self) -> Dict:
+        return {
+            "proxy": self.url,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000),
+            "error_rate": round(self.error_rate, 3),
+        }
+
+
+class ProxyPool:
+    """
+    Proxies with their health. `choose` samples two available proxies and takes
+    the healthier one, which steers traffic away from slow or failing proxies
+    without sending every request to the single best one.
+    """
+
+    def __init__(self, urls: List[str], backoff_base: float = 30, backoff_cap: float = 300):
+        self.proxies = {url: ProxyHealth(url) for url in urls}
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    def __bool__(self):
+        return bool(self.proxies)
+
+    def default_latency(self) -> float:
+        # Unmeasured proxies are assumed as fast as the measured average, so they get tried
+        latencies = [proxy.latency for proxy in self.proxies.values() if proxy.latency is not None]
+        return sum(latencies) / len(latencies) if latencies else 1.0
+
+    def choose(self) -> Optional[ProxyHealth]:
+        if not self.proxies:
+            return None
+
+        now = time.monotonic()
+        candidates = [proxy for proxy in self.proxies.values() if proxy.available(now)]
+        if not candidates:
+            # Every proxy is backing off, use the one that recovers first
+            return min(self.proxies.values(), key=lambda proxy: proxy.banned_until)
+        if len(candidates) == 1:
+            return candidates[0]
+
+        default_latency = self.default_latency()
+        return min(random.sample(candidates, 2), key=lambda proxy: proxy.score(default_latency))
+
+    def succeeded(self, url: str, latency: float):
+        if url in self.proxies:
+            self.proxies[url].succeeded(latency)
+
+    def failed(self, url: str):
+        if url in self.proxies:
+            self.proxies[url].failed(self.backoff_base, self.backoff_cap)
+
+    def report(self) -> List[Dict]:
+        return [proxy.to_dict() for proxy in self.proxies.values()]
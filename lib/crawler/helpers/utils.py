@@ -1,11 +1,21 @@
 import re
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+from zoneinfo import ZoneInfo
+
+# Naive timestamps in the database are Estonian local time
+LOCAL_TIMEZONE = ZoneInfo("Europe/Tallinn")
+
+
+SPACE_CHARACTERS = str.maketrans({"\xa0": " ", "\u200b": " "})
+HTML_ENTITY = re.compile(r'&[a-zA-Z]+;')
 
 
 def clean_text(text):
-    cleaned_text = re.sub(r'[\xa0\u200b]', ' ', text)  # Replace NBSP and Zero Width Space with a space
-    cleaned_text = re.sub(r'&[a-zA-Z]+;', '', cleaned_text)  # Remove HTML entities like &amp;, &lt;, etc.
-    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)  # Normalize whitespace to a single space
-    return cleaned_text.strip()
+    cleaned_text = text.translate(SPACE_CHARACTERS)  # Replace NBSP and Zero Width Space with a space
+    if "&" in cleaned_text:
+        cleaned_text = HTML_ENTITY.sub('', cleaned_text)  # Remove HTML entities like &amp;, &lt;, etc.
+    return " ".join(cleaned_text.split())  # Normalize whitespace to a single space and strip
 
 
 def serialize_text_prop(value):
@@ -29,3 +39,48 @@ def format_article_request(media_id, title, body):
                 """
 
     raise Exception("No media_id provided for format_article_request")
+
+
+def format_batch_request(articles, bodies=None):
+    """`bodies` optionally maps article ids to preprocessed bodies sent instead of `article.body`"""
+    bodies = bodies or {}
+    return "\n\n".join(
+        f"ARTICLE_ID: {article.id}\n"
+        f"{format_article_request(article.media_id, article.title, bodies.get(article.id, article.body))}"
+        for article in articles
+    )
+
+
+def parse_date_time(value):
+    """Parse an ISO date string such as the article publish date, None when missing or malformed"""
+    if isinstance(value, datetime) or value is None:
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def to_local_naive(value):
+    """Local wall-clock time without the offset, as stored in the database"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(LOCAL_TIMEZONE).replace(tzinfo=None)
+
+
+def format_search_date(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=LOCAL_TIMEZONE)
+    return value.isoformat(timespec="seconds")
+
+
+def search_url(base_url, start, end=None):
+    """Search URL of `base_url` restricted to the window from `start` to `end`, open-ended without `end`"""
+    parsed_url = urlparse(base_url)
+    query_params = parse_qs(parsed_url.query)
+    query_params["start"] = [format_search_date(start)]
+    if end is not None:
+        query_params["end"] = [format_search_date(end)]
+    else:
+        query_params.pop("end", None)
+    return urlunparse(parsed_url._replace(query=urlencode(query_params, doseq=True)))
@@ -4,13 +4,21 @@
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
 import os
-from urllib.parse import urlencode
+import time
+from collections import Counter
+from urllib.parse import urlencode, urlparse
 from dotenv import load_dotenv
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from lib.crawler.helpers.proxy_utils import PROXY_LIST_PATH, ProxyPool, load_proxies, moving_average
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
 
 class SpidersSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -65,12 +73,17 @@ class ScraperAPIMiddleware:
     
     This middleware modifies the request URL to use ScraperAPI's proxy service.
     It adds the API key and other configuration options to the request.
+    The API key is read from the environment once, when the crawler starts.
     """
-    
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+
     @classmethod
     def from_crawler(cls, crawler):
         # Initialize middleware from crawler
-        middleware = cls()
+        load_dotenv()
+        middleware = cls(os.getenv("SCRAPER_API_KEY"))
         crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
         return middleware
         
@@ -84,12 +97,7 @@ class ScraperAPIMiddleware:
         if request.meta.get("proxy_applied"):
             return None
         
-        # Load the API key from environment
-        load_dotenv()
-        api_key = os.getenv("SCRAPER_API_KEY")
-        
-        if not api_key:
-            spider.logger.error("No ScraperAPI key found in .env file!")
+        if not self.api_key:
             return None
             
         # Original URL
@@ -97,7 +105,7 @@ class ScraperAPIMiddleware:
         
         # Parameters for ScraperAPI
         params = {
-            "api_key": api_key,
+            "api_key": self.api_key,
             "url": original_url,
             "country_code": "ee",  # Estonia, change as needed
             "keep_headers": "true"
@@ -121,9 +129,208 @@ class ScraperAPIMiddleware:
         return None
         
     def spider_opened(self, spider):
+        if not self.api_key:
+            spider.logger.error("No ScraperAPI key found in .env file!")
         spider.logger.info("ScraperAPIMiddleware initialized")
 
 
+class DomainThrottle:
+    """Delay, concurrency and throughput of one download slot (a domain by default)"""
+
+    def __init__(self, delay: float, concurrency: int):
+        self.delay = delay
+        self.concurrency = concurrency
+        self.successes_since_increase = 0
+        self.latency = None
+        self.responses = 0
+        self.errors = 0
+        self.throttled = 0
+        self.bytes = 0
+        self.statuses = Counter()
+        self.first_seen = None
+        self.last_seen = None
+
+    def seen(self):
+        now = time.monotonic()
+        self.first_seen = self.first_seen or now
+        self.last_seen = now
+
+    def to_dict(self):
+        elapsed = (self.last_seen - self.first_seen) if self.first_seen else 0
+        return {
+            "responses": self.responses,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "pages_per_sec": round(self.responses / elapsed, 2) if elapsed else None,
+            "kb_per_sec": round(self.bytes / 1024 / elapsed, 1) if elapsed else None,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000),
+            "delay_ms": round(self.delay * 1000),
+            "concurrency": self.concurrency,
+            "statuses": dict(self.statuses),
+        }
+
+
+class AdaptiveProxyMiddleware:
+    """
+    Routes requests through the healthiest proxies of `proxies.txt` and adapts
+    the download delay and concurrency of every slot to the observed responses.
+
+    Proxies are scored by their latency and error rate (see `ProxyPool`), a
+    failing proxy backs off for `ROTATING_PROXY_BACKOFF_BASE` seconds, doubling
+    up to `ROTATING_PROXY_BACKOFF_CAP`. Without proxies requests go out directly
+    and are only throttled.
+
+    The delay follows the response time like AutoThrottle (latency divided by the
+    slot concurrency). A 429 or 503 halves the concurrency and doubles the delay,
+    or waits for Retry-After; the concurrency grows back by one after as many
+    successful responses as the current concurrency, up to
+    `CONCURRENT_REQUESTS_PER_DOMAIN`. Per-domain throughput is logged when the
+    spider closes. Do not combine with the AutoThrottle extension.
+    """
+
+    THROTTLE_CODES = {429, 503}
+    PROXY_FAILURE_CODES = {403, 407, 429, 502, 503, 504}
+
+    def __init__(self, crawler, pool: ProxyPool, start_delay: float, min_delay: float, max_delay: float,
+                 max_concurrency: int):
+        self.crawler = crawler
+        self.pool = pool
+        self.start_delay = start_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self.domains = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_THROTTLE_ENABLED", True):
+            raise NotConfigured
+
+        # Configuration and the proxy list are loaded once, not per request
+        pool = ProxyPool(
+            load_proxies(settings.get("ROTATING_PROXY_LIST_PATH", PROXY_LIST_PATH)),
+            backoff_base=settings.getfloat("ROTATING_PROXY_BACKOFF_BASE", 30),
+            backoff_cap=settings.getfloat("ROTATING_PROXY_BACKOFF_CAP", 300)
+        )
+        middleware = cls(
+            crawler,
+            pool,
+            start_delay=settings.getfloat("DOWNLOAD_DELAY"),
+            min_delay=settings.getfloat("ADAPTIVE_THROTTLE_MIN_DELAY", 0.1),
+            max_delay=settings.getfloat("ADAPTIVE_THROTTLE_MAX_DELAY", 30),
+            max_concurrency=settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
+        )
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def domain(self, request) -> DomainThrottle:
+        key = request.meta.get("download_slot") or urlparse(request.url).hostname or ""
+        if key not in self.domains:
+            self.domains[key] = DomainThrottle(self.start_delay, self.max_concurrency)
+        return self.domains[key]
+
+    def apply(self, request, throttle: DomainThrottle):
+        # Slots are garbage collected when idle, so the state is kept here and written back
+        slot = self.crawler.engine.downloader.slots.get(request.meta.get("download_slot"))
+        if slot is not None:
+            slot.delay = throttle.delay
+            slot.concurrency = throttle.concurrency
+
+    def process_request(self, request, spider):
+        if not self.pool or request.meta.get("dont_proxy") or request.meta.get("proxy_applied"):
+            return None
+        # Keep explicitly set proxies, but pick again when a retry comes back with ours
+        if request.meta.get("proxy") and request.meta.get("proxy") != request.meta.get("adaptive_proxy"):
+            return None
+
+        proxy = self.pool.choose()
+        request.meta["proxy"] = proxy.url
+        request.meta["adaptive_proxy"] = proxy.url
+        return None
+
+    def process_response(self, request, response, spider):
+        latency = request.meta.get("download_latency")
+        if latency is None:
+            # Served from the HTTP cache without touching the network
+            return response
+
+        throttle = self.domain(request)
+        throttle.seen()
+        throttle.responses += 1
+        throttle.bytes += len(response.body)
+        throttle.statuses[response.status] += 1
+
+        proxy = request.meta.get("adaptive_proxy")
+        if proxy:
+            if response.status in self.PROXY_FAILURE_CODES:
+                self.pool.failed(proxy)
+            else:
+                self.pool.succeeded(proxy, latency)
+
+        if response.status in self.THROTTLE_CODES:
+            self.back_off(throttle, response)
+        else:
+            self.adjust(throttle, latency, response.status)
+        self.apply(request, throttle)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        throttle = self.domain(request)
+        throttle.seen()
+        throttle.errors += 1
+        proxy = request.meta.get("adaptive_proxy")
+        if proxy:
+            self.pool.failed(proxy)
+        return None
+
+    def back_off(self, throttle: DomainThrottle, response):
+        throttle.throttled += 1
+        throttle.successes_since_increase = 0
+        throttle.concurrency = max(1, throttle.concurrency // 2)
+
+        retry_after = response.headers.get(b"Retry-After", b"").decode("latin-1").strip()
+        delay = float(retry_after) if retry_after.isdigit() else max(throttle.delay * 2, self.min_delay)
+        throttle.delay = min(self.max_delay, delay)
+        logger.warning("Server is throttling, backing off", extra={
+            "status": response.status,
+            "url": response.url,
+            "delay": throttle.delay,
+            "concurrency": throttle.concurrency
+        })
+
+    def adjust(self, throttle: DomainThrottle, latency: float, status: int):
+        throttle.latency = moving_average(throttle.latency, latency)
+
+        # Send a request every latency/N seconds to keep N requests in flight
+        target_delay = throttle.latency / throttle.concurrency
+        delay = max(target_delay, (throttle.delay + target_delay) / 2)
+        delay = min(max(self.min_delay, delay), self.max_delay)
+        # Error pages are small and fast, they must not speed the crawl up
+        if status == 200 or delay > throttle.delay:
+            throttle.delay = delay
+
+        if status == 200:
+            throttle.successes_since_increase += 1
+            if throttle.successes_since_increase >= throttle.concurrency and throttle.concurrency < self.max_concurrency:
+                throttle.concurrency += 1
+                throttle.successes_since_increase = 0
+
+    def spider_opened(self, spider):
+        logger.info("Adaptive proxy middleware initialized", extra={
+            "proxies": len(self.pool.proxies),
+            "start_delay": self.start_delay,
+            "max_concurrency": self.max_concurrency
+        })
+
+    def spider_closed(self, spider, reason):
+        for domain, throttle in self.domains.items():
+            logger.info("Domain throughput", extra={"domain": domain, **throttle.to_dict()})
+        if self.pool:
+            logger.info("Proxy health", extra={"proxies": self.pool.report()})
+
+
 class SpidersDownloaderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the downloader middleware does not modify the
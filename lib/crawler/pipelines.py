@@ -1,31 +1,75 @@
+from collections import Counter
+from typing import Optional
+
 from itemadapter import ItemAdapter
 
 from lib.crawler.helpers.utils import serialize_text_prop
 from db.db_connector import DBConnector
 from db.models.models import Article
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def article_from_item(item) -> Optional[Article]:
+    """Normalize the fields of a scraped item, None when the article can't be stored"""
+    adapter = ItemAdapter(item)
+    field_names = adapter.field_names()
+
+    for field_name in field_names:
+        value = adapter.get(field_name)
+        if field_name == 'body':
+            adapter[field_name] = serialize_text_prop(value)
+        elif field_name in ['title', 'authors', 'category']:
+            if isinstance(value, str):
+                adapter[field_name] = value.strip()
+        elif field_name == 'paywall':
+            adapter[field_name] = bool(value)
+        elif field_name == 'date_time':
+            if not value:
+                logger.warning("Article doesn't have a date_time field", extra={"url": adapter.get('url')})
+                return None
+        elif field_name == 'article_id':
+            # Scraped from a meta tag as text, the column and the upsert key are integers
+            try:
+                adapter[field_name] = int(value)
+            except (TypeError, ValueError):
+                logger.warning("Article doesn't have a numeric article_id", extra={
+                    "url": adapter.get('url'), "article_id": value
+                })
+                return None
+
+    return Article(**item)
 
 
 class PostimeesPipeline:
+    # Inserted and updated counts are logged every this many items
+    report_every = 100
+
+    def __init__(self):
+        self.db = None
+        self.counts = Counter()
+
     def process_item(self, item, spider):
         """Process each item and insert it into the database."""
-        adapter = ItemAdapter(item)
-        field_names = adapter.field_names()
-
-        for field_name in field_names:
-            value = adapter.get(field_name)
-            if field_name == 'body':
-                adapter[field_name] = serialize_text_prop(value)
-            elif field_name in ['title', 'authors', 'category']:
-                if isinstance(value, str):
-                    adapter[field_name] = value.strip()
-            elif field_name == 'paywall':
-                adapter[field_name] = bool(value)
-            elif field_name == 'date_time':
-                if not value:
-                    print("Article doesn't have a date_time field")
-                    return None
-
-        article = Article(**item)
-        db = DBConnector()
-        db.insert_or_update_article(article)
+        article = article_from_item(item)
+        if article is None:
+            return None
+
+        # One connection for the whole crawl
+        if self.db is None:
+            self.db = DBConnector()
+        counts = self.db.insert_or_update_article(
+            article, enqueue=True, overwrite=getattr(spider, "overwrite_articles", False)
+        )
+        self.counts.update(counts)
+        if counts.get("failed") and hasattr(spider, "store_failed"):
+            spider.store_failed(article.url)
+        if sum(self.counts.values()) % self.report_every == 0:
+            logger.info("Articles stored", extra=dict(self.counts))
         return item
+
+    def close_spider(self, spider):
+        if self.db is not None:
+            logger.info("Articles stored", extra=dict(self.counts))
+            self.db.close()
@@ -7,6 +7,8 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
+
 BOT_NAME = "transparency-scope"
 
 SPIDER_MODULES = ["lib.crawler.spiders"]
@@ -24,12 +26,18 @@ CONCURRENT_REQUESTS = 32
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
-# See also autothrottle settings and docs
+# With AdaptiveProxyMiddleware this is only the starting delay of every domain
 DOWNLOAD_DELAY = 0.5
 # The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+# With AdaptiveProxyMiddleware this is the upper bound of the per-domain concurrency
+CONCURRENT_REQUESTS_PER_DOMAIN = 16
 #CONCURRENT_REQUESTS_PER_IP = 16
 
+# Bounds of the delay chosen by AdaptiveProxyMiddleware from response times and 429s
+ADAPTIVE_THROTTLE_ENABLED = True
+ADAPTIVE_THROTTLE_MIN_DELAY = 0.1
+ADAPTIVE_THROTTLE_MAX_DELAY = 30
+
 # Disable cookies (enabled by default)
 #COOKIES_ENABLED = False
 
@@ -53,7 +61,10 @@ DOWNLOAD_DELAY = 0.5
 DOWNLOADER_MIDDLEWARES = {
    # Use ScraperAPIMiddleware or RotatingProxyMiddleware based on needs
    # "lib.crawler.middlewares.ScraperAPIMiddleware": 543,
-   
+
+   # Proxy health routing (proxies.txt) and adaptive delay / concurrency, sees responses before RetryMiddleware
+   "lib.crawler.middlewares.AdaptiveProxyMiddleware": 560,
+
    # Rotating proxy middleware
    # 'rotating_proxies.middlewares.RotatingProxyMiddleware': 610,
    # 'rotating_proxies.middlewares.BanDetectionMiddleware': 620,
@@ -61,9 +72,17 @@ DOWNLOADER_MIDDLEWARES = {
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
+EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+   "lib.crawler.extensions.HtmlArchiveExtension": 500,
+}
+
+# Raw HTML of article pages, zstd-compressed in HTML_ARCHIVE_DIR/<media_id>
+# Off by default, HTML_ARCHIVE=on enables it (requires `pip install zstandard`).
+# Re-run the extraction over it with `python -m lib.crawler.helpers.archive reextract --media-id 1`.
+HTML_ARCHIVE_ENABLED = os.getenv("HTML_ARCHIVE", "off") == "on"
+HTML_ARCHIVE_DIR = os.getenv("HTML_ARCHIVE_DIR", "archive")
+HTML_ARCHIVE_SEGMENT_MB = 256
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
@@ -72,6 +91,7 @@ ITEM_PIPELINES = {
 }
 
 # Enable and configure the AutoThrottle extension (disabled by default)
+# Keep it disabled while AdaptiveProxyMiddleware adjusts the delays
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 #AUTOTHROTTLE_ENABLED = True
 # The initial download delay
@@ -84,13 +104,28 @@ ITEM_PIPELINES = {
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
-# Enable and configure HTTP caching (disabled by default)
+# HTTP cache of article pages, gzip-compressed on disk in .scrapy/httpcache
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# CRAWL_CACHE=revalidate (default): stored pages are revalidated with conditional GETs
+# (If-None-Match / If-Modified-Since from the stored ETag and Last-Modified), a 304 serves the stored copy.
+# CRAWL_CACHE=replay: pages are only served from the cache, never from the network,
+# use with `-a mode=replay` to re-run `parse_article` over stored HTML.
+# CRAWL_CACHE=off: no cache.
+# Search listing pages are never cached, see `BasePostimeesSpider.window_request`.
+CRAWL_CACHE = os.getenv("CRAWL_CACHE", "revalidate")
+HTTPCACHE_ENABLED = CRAWL_CACHE != "off"
+HTTPCACHE_EXPIRATION_SECS = 0
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_GZIP = True
+HTTPCACHE_IGNORE_HTTP_CODES = [301, 302, 403, 404, 429, 500, 502, 503, 504]
+HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+if CRAWL_CACHE == "replay":
+    HTTPCACHE_POLICY = "scrapy.extensions.httpcache.DummyPolicy"
+    HTTPCACHE_IGNORE_MISSING = True
+else:
+    HTTPCACHE_POLICY = "scrapy.extensions.httpcache.RFC2616Policy"
+    # Store pages sent with no-store as well, they are still revalidated on the next visit
+    HTTPCACHE_ALWAYS_STORE = True
 
 # Set settings whose default value is deprecated to a future-proof value
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
@@ -105,7 +140,7 @@ FEED_EXPORT_ENCODING = "utf-8"
 #     # For free proxies, format: 'http://host:port'
 # ]
 
-# Option 2: Load proxies from a file
+# Option 2: Load proxies from a file, also read by AdaptiveProxyMiddleware
 ROTATING_PROXY_LIST_PATH = 'proxies.txt'
 
 # Option 3: Load proxies dynamically from the proxy_utils module
@@ -1,8 +1,60 @@
-from urllib.parse import urlparse, quote, parse_qs, urlencode, urlunparse
+import os
+import socket
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
 import scrapy
+from scrapy import signals
 from lib.crawler.items import ArticleItem
+from lib.crawler.helpers.extraction import extract_article
+from lib.crawler.helpers.utils import parse_date_time, search_url, to_local_naive
 from db.db_connector import DBConnector
+from lib.logger import get_logger, set_correlation_id
+
+logger = get_logger(__name__)
+
+# Crawl modes: new articles since the last crawl, older articles below the crawled range,
+# or stored articles re-parsed from the HTTP cache
+INCREMENTAL = "incremental"
+BACKFILL = "backfill"
+REPLAY = "replay"
+EPOCH = datetime(1970, 1, 1)
+# Claims of sharded windows not renewed for this long are taken over by other processes
+STALE_WINDOW_CLAIM = timedelta(hours=1)
+
+
+def grid_floor(value: datetime, days: int) -> datetime:
+    """Start of the `days`-long grid window containing `value`, so windows of all runs line up"""
+    return EPOCH + timedelta(days=(value - EPOCH).days // days * days)
+
+
+class SearchWindow:
+    """
+    Date range of the search walked from its top downwards. The search pages
+    of a window are limited, so once they run out the window end moves down
+    to the oldest article listed so far.
+    """
+
+    def __init__(self, start: datetime, end: datetime = None, row_id: int = None, cursor_end: datetime = None):
+        self.start = start
+        self.end = cursor_end or end
+        self.top = end
+        # `crawl_windows` row of a sharded crawl
+        self.row_id = row_id
+        # Article requests in flight, the end only moves once they are handled
+        self.pending = 0
+        # Article URLs requested for this window, a URL listed on several search pages counts once
+        self.requested = set()
+        self.listing_done = False
+        self.oldest = None
+        self.newest = None
+
+    def listed(self, date_time):
+        if date_time is None:
+            return
+        date_time = to_local_naive(date_time)
+        self.oldest = date_time if self.oldest is None else min(self.oldest, date_time)
+        self.newest = date_time if self.newest is None else max(self.newest, date_time)
 
 
 class BasePostimeesSpider(scrapy.Spider):
@@ -10,7 +62,6 @@ class BasePostimeesSpider(scrapy.Spider):
     media_id = None  # Must be defined in subclass
     base_url = None  # Must be defined in subclass
     next_page_selector = None  # Must be defined in subclass
-    last_scrapped_article = None
     prohibited_subdomains = [
         'prognoz',
         'zdorovje',
@@ -47,70 +98,253 @@ class BasePostimeesSpider(scrapy.Spider):
         'haridus'
     ]
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, mode=INCREMENTAL, overlap_hours=24, window_days=None, since=None, until=None,
+                 parallel_windows=8, *args, **kwargs):
+        """
+        Spider arguments (`scrapy crawl <name> -a mode=backfill`):
+        mode - `incremental` crawls from the newest crawled article to now,
+        `backfill` continues below the oldest crawled article,
+        `replay` re-parses the stored articles from the HTTP cache only (with CRAWL_CACHE=replay).
+        overlap_hours - how far before the newest mark incremental crawls start,
+        to pick up articles published with a delay.
+        window_days - backfill only, shard the range from `since` to `until` (ISO dates,
+        by default the year below the oldest mark) into windows of this many days,
+        `parallel_windows` of them are crawled concurrently. Several processes can share the windows.
+        """
         super(BasePostimeesSpider, self).__init__(*args, **kwargs)
-        print("Initialized crawler for media:", self.media_id)
+        if mode not in (INCREMENTAL, BACKFILL, REPLAY):
+            raise ValueError(f"Unknown crawl mode '{mode}', expected '{INCREMENTAL}', '{BACKFILL}' or '{REPLAY}'")
+        if window_days and mode != BACKFILL:
+            raise ValueError("Sharded windows are only supported with mode=backfill")
+
+        set_correlation_id()
         self.db = DBConnector()
-        self.start_urls = [self.base_url]
+        self.mode = mode
+        self.started_at = datetime.now()
+        self.state = self.db.get_crawl_state(self.media_id)
+        # Without a crawled range yet, the whole history is walked and tracked as it goes
+        self.fresh = self.state.newest_date_time is None
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.window_days = int(window_days) if window_days else None
+        self.parallel_windows = int(parallel_windows)
+        # Replayed articles overwrite the stored fields with the output of the current parser
+        self.overwrite_articles = mode == REPLAY
+        # Articles the pipeline failed to store, crawl progress is no longer saved once there are any
+        self.store_failures = 0
+
+        if mode == REPLAY:
+            self.window = None
+        elif self.window_days:
+            self.window = None
+            self.plan_windows(parse_date_time(since), parse_date_time(until))
+        else:
+            self.window = self.initial_window(timedelta(hours=int(overlap_hours)))
+        logger.info("Initialized crawler", extra={
+            "spider": self.name, "media_id": self.media_id, "mode": mode, "window_days": self.window_days,
+            "window_start": self.window and self.window.start, "window_end": self.window and self.window.end
+        })
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.request_dropped, signal=signals.request_dropped)
+        return spider
+
+    def plan_windows(self, since: datetime = None, until: datetime = None):
+        # Windows never reach into the current grid window, which is still being published to
+        current = grid_floor(self.started_at, self.window_days)
+        until = until or self.state.oldest_date_time or current
+        until = min(grid_floor(until, self.window_days) + timedelta(days=self.window_days), current)
+        since = grid_floor(since or until - timedelta(days=365), self.window_days)
+
+        planned = self.db.plan_crawl_windows(self.media_id, since, until, timedelta(days=self.window_days))
+        logger.info("Planned crawl windows", extra={"since": since, "until": until, "planned": planned})
+
+    def claim_windows(self, limit: int):
+        for row_id, start, end, cursor_end in self.db.claim_crawl_windows(
+            self.media_id, self.worker_id, limit, STALE_WINDOW_CLAIM
+        ):
+            logger.debug("Claimed crawl window", extra={"window_start": start, "window_end": end})
+            yield self.window_request(SearchWindow(start, end, row_id=row_id, cursor_end=cursor_end))
+
+    def initial_window(self, overlap: timedelta) -> SearchWindow:
+        if self.mode == BACKFILL:
+            return SearchWindow(EPOCH, self.state.oldest_date_time)
+        if self.fresh:
+            return SearchWindow(EPOCH)
+        return SearchWindow(self.state.newest_date_time - overlap)
+
+    def window_request(self, window: SearchWindow):
+        # The search includes both ends. The top is excluded, since it is the start of the window
+        # above (or the oldest crawled article). A moved end is kept, other articles may share that second.
+        end = window.end
+        if end is not None and end == window.top:
+            end -= timedelta(seconds=1)
+        url = search_url(self.base_url, window.start, end)
+        # Search results change all the time, only article pages go through the HTTP cache
+        return scrapy.Request(url=url, callback=self.parse, meta={"window": window, "dont_cache": True})
+
+    def replay_requests(self):
+        if self.settings.get("CRAWL_CACHE") != "replay":
+            raise ValueError("mode=replay requires CRAWL_CACHE=replay, otherwise the pages are downloaded again")
+
+        for article_url in self.db.article_urls(self.media_id):
+            yield scrapy.Request(url=article_url, callback=self.parse_article, meta={"archive": True})
 
     def start_requests(self):
-        print("start_requests", self.start_urls)
-        for url in self.start_urls:
-            yield scrapy.Request(url=url, callback=self.parse)
+        if self.mode == REPLAY:
+            yield from self.replay_requests()
+            return
+
+        if self.window_days:
+            yield from self.claim_windows(self.parallel_windows)
+            return
+
+        request = self.window_request(self.window)
+        logger.info("Starting requests", extra={"urls": [request.url]})
+        yield request
+
+    def closed(self, reason):
+        """Refresh precomputed counts once the crawl has written its articles"""
+        logger.info("Spider closed", extra={"spider": self.name, "reason": reason})
+        self.db.refresh_media_counts()
+
+    def store_failed(self, url: str):
+        """
+        Called by the pipeline for an article it could not store. The crawled range
+        must not move past it, so the next crawl (or another process, once the
+        window claim goes stale) lists it again.
+        """
+        self.store_failures += 1
+        logger.warning("Article not stored, crawl progress is no longer saved", extra={
+            "url": url, "store_failures": self.store_failures
+        })
+
+    def window_progress(self, window: SearchWindow):
+        """Everything between the window end and its top has been crawled"""
+        if self.store_failures:
+            return
+        if window.row_id is not None:
+            self.db.update_crawl_window(window.row_id, window.end)
+            return
+
+        if self.mode == BACKFILL or self.fresh:
+            self.state.oldest_date_time = window.end
+        if self.fresh and window.newest is not None:
+            self.state.newest_date_time = max(self.state.newest_date_time or window.newest, window.newest)
+        self.db.save_crawl_state(self.state)
+
+    def window_finished(self, window: SearchWindow):
+        if self.store_failures:
+            logger.warning("Search window crawled, not saved after store failures", extra={
+                "window_start": window.start, "window_end": window.top, "store_failures": self.store_failures
+            })
+            return
+        if window.row_id is not None:
+            # A sharded window is done, extend the crawled range and take the next one
+            self.db.complete_crawl_window(window.row_id)
+            self.db.extend_crawl_state(self.state)
+            logger.info("Crawl window done", extra={"window_start": window.start, "window_end": window.top})
+            yield from self.claim_windows(1)
+            return
+
+        if self.mode == BACKFILL or self.fresh:
+            self.state.oldest_date_time = window.start
+        if self.mode == INCREMENTAL and window.newest is not None:
+            self.state.newest_date_time = max(self.state.newest_date_time or window.newest, window.newest)
+        self.state.last_window_start = window.start
+        self.state.last_window_end = window.top or self.started_at
+        self.state.last_crawl_at = datetime.now()
+        self.db.save_crawl_state(self.state)
+        logger.info("Search window crawled", extra={
+            "window_start": window.start, "window_end": self.state.last_window_end
+        })
+
+    def next_window(self, window: SearchWindow):
+        """Once every article listed in the window is handled, continue the search below the oldest one"""
+        if not window.listing_done or window.pending:
+            return
+
+        window.listing_done = False
+        oldest = window.oldest
+        if oldest is None or oldest <= window.start or (window.end is not None and oldest >= window.end):
+            yield from self.window_finished(window)
+            return
+
+        window.end = oldest
+        window.oldest = None
+        self.window_progress(window)
+        logger.info("Next page not found, continuing from the oldest listed article", extra={"date_time": oldest})
+        yield self.window_request(window)
 
     def parse(self, response):
         """Parse the search results page and follow article links."""
-        articles = response.css("article a::attr(href)")
-        if articles is None:
-            return
+        window = response.meta["window"]
+
+        for article_url in response.css("article a::attr(href)").getall():
+            subdomain = urlparse(article_url).netloc.split(".")[0]
+            if subdomain in self.prohibited_subdomains:
+                continue
 
-        for article in articles:
-            article_url = article.get()
-            parsed_url = urlparse(article_url)
-            subdomain = parsed_url.netloc.split(".")[0]
+            known_date_time = self.db.article_date_time(article_url)
+            if known_date_time is not None:
+                window.listed(known_date_time)
+                continue
 
-            if subdomain not in self.prohibited_subdomains and not self.db.article_exists(article_url):
-                yield response.follow(article_url, self.parse_article)
+            article_url = response.urljoin(article_url)
+            if article_url in window.requested:
+                continue
+            window.requested.add(article_url)
+            window.pending += 1
+            yield response.follow(article_url, self.parse_article, errback=self.article_failed,
+                                  meta={"window": window, "archive": True})
 
         next_page = response.xpath(self.next_page_selector).get()
         if next_page is not None:
-            print('Following next page:', next_page)
-            yield response.follow(next_page, self.parse)
+            logger.debug("Following next page", extra={"next_page": next_page})
+            yield response.follow(next_page, self.parse, meta={"window": window, "dont_cache": True})
         else:
-            formatted_datetime = self.last_scrapped_article['date_time'].strftime("%Y-%m-%dT23:59:59+02:00")
-
-            parsed_url = urlparse(self.base_url)
-            query_params = parse_qs(parsed_url.query)
-            query_params["end"] = [formatted_datetime]
+            window.listing_done = True
+            yield from self.next_window(window)
 
-            new_query_string = urlencode(query_params, doseq=True)
-            updated_url = urlunparse(parsed_url._replace(query=new_query_string))
+    def article_failed(self, failure):
+        window = failure.request.meta["window"]
+        window.pending -= 1
+        logger.warning("Article request failed: %s", failure.value, extra={"url": failure.request.url})
+        yield from self.next_window(window)
 
-            print(
-                'Next page not found, adding time variable from the last scrapped article:',
-                updated_url, self.last_scrapped_article['date_time']
-            )
-            yield response.follow(str(updated_url), self.parse)
+    def request_dropped(self, request, spider):
+        """
+        The dupefilter drops an article already requested by another window without
+        calling the errback, it is released from its window like a failed request
+        """
+        window = request.meta.get("window")
+        if spider is not self or window is None or request.callback != self.parse_article:
+            return
+        window.pending -= 1
+        logger.debug("Article request dropped", extra={"url": request.url})
+        for next_request in self.next_window(window):
+            self.crawler.engine.crawl(next_request)
 
     def parse_article(self, response):
         """Parse the article page and extract details."""
-        article = ArticleItem()
-
-        article['article_id'] = response.css('meta[name="cXenseParse:articleId"]::attr(content)').get()
-        article['media_id'] = self.media_id
-        article['url'] = response.url
-        article['date_time'] = response.css('.article__publish-date::attr(content)').get()
-        article['authors'] = response.css('.author .author__name::text').get()
-        article['paywall'] = response.css('.article__premium-flag')
-        article['category'] = response.css("ul.breadcrumb__items li.breadcrumb-item:last-child a::text").get()
-        article['preview_url'] = response.css(".figure__image-wrapper img::attr(src)").get()
-
-        title = response.css('.article__headline::text').get()
-        if not title:
-            title = response.css('.article-superheader__headline::text').get()
-        article['title'] = title
-
-        article['body'] = response.css('.article-body-content p ::text').getall()
-
-        self.last_scrapped_article = article
-        yield article
+        window = response.meta.get("window")
+        try:
+            article = ArticleItem(
+                media_id=self.media_id,
+                url=response.url,
+                **extract_article(response.selector.root)
+            )
+        except Exception as e:
+            # The window still has to move on, so the error doesn't propagate
+            logger.error("Article extraction failed: %s", e, extra={"url": response.url})
+            article = None
+
+        if article is not None:
+            yield article
+
+        if window is not None:
+            window.pending -= 1
+            if article is not None:
+                window.listed(parse_date_time(article['date_time']))
+            yield from self.next_window(window)
@@ -0,0 +1,127 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# Correlation id of the current API request or analysis/crawl run
+correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+# Top-level packages whose loggers are routed through the queue handler
+LOGGER_NAMESPACES = ("api", "db", "lib")
+
+# Attributes present on every LogRecord, everything else is treated as `extra`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        cid = getattr(record, "correlation_id", None)
+        if cid:
+            payload["correlation_id"] = cid
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key != "correlation_id":
+                payload[key] = value
+
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class CorrelationQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that captures the correlation id in the calling context.
+    Formatting and writing happen on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.correlation_id = correlation_id.get()
+        return record
+
+
+def configure_logging(level: Optional[str] = None, force: bool = False):
+    """
+    Configure non-blocking JSON logging for the api, db and lib packages.
+    The level is taken from the LOG_LEVEL environment variable by default.
+    """
+    global _listener
+
+    if _listener is not None and not force:
+        return
+
+    if _listener is not None:
+        stop_logging()
+    else:
+        atexit.register(stop_logging)
+
+    load_dotenv()
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = CorrelationQueueHandler(log_queue)
+
+    for namespace in LOGGER_NAMESPACES:
+        namespace_logger = logging.getLogger(namespace)
+        namespace_logger.handlers = [queue_handler]
+        namespace_logger.setLevel(level)
+        namespace_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a module logger, configuring the logging setup on first use"""
+    configure_logging()
+    # Modules run with `python -m` log under their package name, not as `__main__`
+    if name == "__main__" and getattr(sys.modules["__main__"], "__spec__", None) is not None:
+        name = sys.modules["__main__"].__spec__.name
+    return logging.getLogger(name)
+
+
+def new_correlation_id() -> str:
+    """Generate a short random correlation id"""
+    return uuid.uuid4().hex[:16]
+
+
+def set_correlation_id(value: Optional[str] = None) -> contextvars.Token:
+    """Bind a correlation id to the current context and return the reset token"""
+    return correlation_id.set(value or new_correlation_id())
+
+
+def reset_correlation_id(token: contextvars.Token):
+    """Restore the correlation id that was active before `set_correlation_id`"""
+    correlation_id.reset(token)
@@ -1,16 +1,49 @@
+import argparse
 from unicodedata import category
 
 from sqlalchemy import desc
 
 from db.db_connector import DBConnector
 from db.models.models import Article
-from lib.sentiment.analyzers.gemini import GeminiSentimentModel
+from lib.logger import get_logger
+from lib.sentiment.analyzers.registry import ANALYZERS, default_analyzer_name, get_analyzer
+from lib.sentiment.offline import BATCH_CLIENTS, OfflineBatchRunner
+from lib.sentiment.runs import CheckpointedRun
+from lib.sentiment.preprocessing import CHUNK, MEDIA_POLICIES, TRUNCATE, BudgetPolicy, policy_for
+
+logger = get_logger(__name__)
+
+parser = argparse.ArgumentParser(prog="python -m lib.sentiment")
+parser.add_argument("--media-id", type=int, default=2)
+parser.add_argument("--backend", choices=sorted(ANALYZERS), default=default_analyzer_name(),
+                    help="Analyzer backend, defaults to the ANALYZER_BACKEND env variable")
+parser.add_argument("--batch-size", type=int, default=1, help="Articles packed into one model request")
+parser.add_argument("--page-size", type=int, default=50, help="Articles claimed and checkpointed at once")
+parser.add_argument("--resync", action="store_true",
+                    help="Walk all articles instead of resuming a checkpointed run, re-syncing existing analyses")
+parser.add_argument("--max-article-tokens", type=int, help="Token budget of article bodies, overrides the media policy")
+parser.add_argument("--long-articles", choices=[TRUNCATE, CHUNK],
+                    help="Handling of bodies over the budget, overrides the media policy")
+parser.add_argument("--offline", action="store_true", help="Analyze pending articles through a batch job")
+parser.add_argument("--batch-client", choices=sorted(BATCH_CLIENTS), default="gemini")
+parser.add_argument("--workdir", default="batch_jobs", help="Directory for batch request and result files")
+parser.add_argument("--poll-interval", type=float, default=60)
+args = parser.parse_args()
 
 db = DBConnector()
 session = db.session
 
 # MEDIA ANALYSIS
-media_id = 2
+media_id = args.media_id
+if args.max_article_tokens or args.long_articles:
+    policy = policy_for(media_id)
+    MEDIA_POLICIES[media_id] = BudgetPolicy(
+        max_tokens=args.max_article_tokens or policy.max_tokens,
+        strategy=args.long_articles or policy.strategy,
+        chunk_tokens=min(policy.chunk_tokens, args.max_article_tokens or policy.chunk_tokens),
+        chars_per_token=policy.chars_per_token,
+        max_chunks=policy.max_chunks
+    )
 categories = [
     'Arvamus',
     'Eesti',
@@ -18,7 +51,20 @@ categories = [
     # 'Postimees',
     'Tallinn'
 ]
-model = GeminiSentimentModel(media_id)
+
+if args.offline:
+    runner = OfflineBatchRunner(BATCH_CLIENTS[args.batch_client]())
+    pending = db.pending_articles(media_id, runner.model_name).yield_per(1000)
+    stats = runner.run(pending, args.workdir, args.poll_interval)
+    logger.info("Offline analysis finished", extra={"media_id": media_id, **stats})
+    raise SystemExit(0)
+
+model = get_analyzer(args.backend, media_id, batch_size=args.batch_size)
+
+if not args.resync:
+    stats = CheckpointedRun(model, media_id, page_size=args.page_size).start()
+    logger.info("Analysis finished", extra=stats)
+    raise SystemExit(0)
 
 articles = (
     session
@@ -29,5 +75,5 @@ articles = (
     .all()
 )
 
-print("Articles to analyze:", len(articles))
+logger.info("Articles to analyze: %d", len(articles), extra={"media_id": media_id})
 sentiments = model.analyze(articles)
@@ -0,0 +1,102 @@
+import json
+import os
+import random
+import re
+import time
+import zlib
+
+from lib.sentiment.analyzers.sentiment_base_analyzer import SentimentBaseAnalyzer
+
+FAKE_PARTIES = [
+    "Eesti Reformierakond",
+    "Eesti Konservatiivne Rahvaerakond",
+    "Eesti Keskerakond",
+    "ISAMAA Erakond",
+    "Sotsiaaldemokraatlik Erakond",
+    "Erakond Eesti 200",
+]
+
+ARTICLE_ID_PATTERN = re.compile(r"^ARTICLE_ID: (\d+)$", re.MULTILINE)
+
+
+class FakeTransientError(Exception):
+    """Simulated API failure, e.g. a rate limit or a timeout"""
+
+
+class FakeSentimentModel(SentimentBaseAnalyzer):
+    """
+    Deterministic local backend for load testing and benchmarks.
+    Responses depend only on the request text; latency, failures, malformed
+    output and token counts are configurable through arguments or FAKE_ANALYZER_* env variables.
+    """
+
+    retry_delay = 0
+
+    def __init__(
+        self,
+        media_id: int,
+        batch_size: int = 1,
+        latency: float = None,
+        error_rate: float = None,
+        malformed_rate: float = None,
+        system_prompt_tokens: int = None,
+        seed: int = 0
+    ):
+        super().__init__("fake-model", batch_size=batch_size)
+        self.media_id = media_id
+        self.latency = latency if latency is not None else float(os.getenv("FAKE_ANALYZER_LATENCY", 0))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("FAKE_ANALYZER_ERROR_RATE", 0))
+        self.malformed_rate = (
+            malformed_rate if malformed_rate is not None else float(os.getenv("FAKE_ANALYZER_MALFORMED_RATE", 0))
+        )
+        self.system_prompt_tokens = (
+            system_prompt_tokens if system_prompt_tokens is not None
+            else int(os.getenv("FAKE_ANALYZER_SYSTEM_PROMPT_TOKENS", 1500))
+        )
+        # Failures and latency jitter follow the call order, the content follows the text
+        self.random = random.Random(seed)
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+    @staticmethod
+    def fake_analysis(text: str) -> dict:
+        """Schema-valid analysis derived from the hash of the request text"""
+        rng = random.Random(zlib.crc32(text.strip().encode("utf-8")))
+        mention = lambda name: {"name": name, "score": rng.randint(0, 10), "explanation": "fake"}
+        return {
+            "article": {
+                "title": {"score": rng.randint(0, 10), "explanation": "fake"},
+                "body": {"score": rng.randint(0, 10), "explanation": "fake"},
+            },
+            "parties": [mention(name) for name in rng.sample(FAKE_PARTIES, rng.randint(0, 3))],
+            "politicians": [mention(f"Poliitik {index:04d}") for index in rng.sample(range(1, 201), rng.randint(0, 4))],
+        }
+
+    def simulate_call(self, text: str, articles: int, response: str, mode: str) -> str:
+        if self.latency:
+            time.sleep(self.random.uniform(0.5, 1.5) * self.latency)
+        if self.random.random() < self.error_rate:
+            raise FakeTransientError("Simulated API error")
+        if self.random.random() < self.malformed_rate:
+            response = response[:len(response) // 2]
+
+        self.usage.record(
+            mode,
+            articles,
+            self.system_prompt_tokens + self.estimate_tokens(text),
+            self.estimate_tokens(response)
+        )
+        return response
+
+    def send_message(self, text: str):
+        return self.simulate_call(text, 1, json.dumps(self.fake_analysis(text)), "single")
+
+    def send_batch_message(self, text: str, articles: int):
+        chunks = ARTICLE_ID_PATTERN.split(text)[1:]
+        response = [
+            {"article_id": int(article_id), **self.fake_analysis(body)}
+            for article_id, body in zip(chunks[::2], chunks[1::2])
+        ]
+        return self.simulate_call(text, articles, json.dumps(response), "batch")
@@ -7,111 +7,159 @@ from google.ai.generativelanguage_v1beta.types import content
 from lib.sentiment.analyzers.sentiment_base_analyzer import SentimentBaseAnalyzer
 from lib.sentiment.analyzers.prompts.article_analysis_prompt_ru import article_analysis_prompt_ru
 from lib.sentiment.analyzers.prompts.article_analysis_prompt_ee import article_analysis_prompt_ee
+from lib.sentiment.analyzers.prompts.batch_instruction import batch_instruction_ee, batch_instruction_ru
 
-generation_config = {
-    "temperature": 0.5,
-    "top_p": 0.95,
-    "top_k": 40,
-    "max_output_tokens": 8192,
-    "response_schema": content.Schema(
+# Fields of a single article analysis, shared by the single and batched response schemas
+analysis_properties = {
+    "article": content.Schema(
         type=content.Type.OBJECT,
         enum=[],
-        required=["article", "parties", "politicians"],
+        required=["title", "body"],
         properties={
-            "article": content.Schema(
+            "title": content.Schema(
                 type=content.Type.OBJECT,
                 enum=[],
-                required=["title", "body"],
+                required=["score", "explanation"],
                 properties={
-                    "title": content.Schema(
-                        type=content.Type.OBJECT,
-                        enum=[],
-                        required=["score", "explanation"],
-                        properties={
-                            "score": content.Schema(
-                                type=content.Type.NUMBER,
-                            ),
-                            "explanation": content.Schema(
-                                type=content.Type.STRING,
-                            ),
-                        },
+                    "score": content.Schema(
+                        type=content.Type.NUMBER,
                     ),
-                    "body": content.Schema(
-                        type=content.Type.OBJECT,
-                        enum=[],
-                        required=["score", "explanation"],
-                        properties={
-                            "score": content.Schema(
-                                type=content.Type.INTEGER,
-                            ),
-                            "explanation": content.Schema(
-                                type=content.Type.STRING,
-                            ),
-                        },
+                    "explanation": content.Schema(
+                        type=content.Type.STRING,
                     ),
                 },
             ),
-            "parties": content.Schema(
-                type=content.Type.ARRAY,
-                items=content.Schema(
-                    type=content.Type.OBJECT,
-                    enum=[],
-                    required=["name", "score", "explanation"],
-                    properties={
-                        "name": content.Schema(
-                            type=content.Type.STRING,
-                        ),
-                        "score": content.Schema(
-                            type=content.Type.INTEGER,
-                        ),
-                        "explanation": content.Schema(
-                            type=content.Type.STRING,
-                        ),
-                    },
-                ),
-            ),
-            "politicians": content.Schema(
-                type=content.Type.ARRAY,
-                items=content.Schema(
-                    type=content.Type.OBJECT,
-                    enum=[],
-                    required=["name", "score", "explanation"],
-                    properties={
-                        "name": content.Schema(
-                            type=content.Type.STRING,
-                        ),
-                        "score": content.Schema(
-                            type=content.Type.INTEGER,
-                        ),
-                        "explanation": content.Schema(
-                            type=content.Type.STRING,
-                        ),
-                    },
-                ),
+            "body": content.Schema(
+                type=content.Type.OBJECT,
+                enum=[],
+                required=["score", "explanation"],
+                properties={
+                    "score": content.Schema(
+                        type=content.Type.INTEGER,
+                    ),
+                    "explanation": content.Schema(
+                        type=content.Type.STRING,
+                    ),
+                },
             ),
         },
     ),
+    "parties": content.Schema(
+        type=content.Type.ARRAY,
+        items=content.Schema(
+            type=content.Type.OBJECT,
+            enum=[],
+            required=["name", "score", "explanation"],
+            properties={
+                "name": content.Schema(
+                    type=content.Type.STRING,
+                ),
+                "score": content.Schema(
+                    type=content.Type.INTEGER,
+                ),
+                "explanation": content.Schema(
+                    type=content.Type.STRING,
+                ),
+            },
+        ),
+    ),
+    "politicians": content.Schema(
+        type=content.Type.ARRAY,
+        items=content.Schema(
+            type=content.Type.OBJECT,
+            enum=[],
+            required=["name", "score", "explanation"],
+            properties={
+                "name": content.Schema(
+                    type=content.Type.STRING,
+                ),
+                "score": content.Schema(
+                    type=content.Type.INTEGER,
+                ),
+                "explanation": content.Schema(
+                    type=content.Type.STRING,
+                ),
+            },
+        ),
+    ),
+}
+
+generation_config = {
+    "temperature": 0.5,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+    "response_schema": content.Schema(
+        type=content.Type.OBJECT,
+        enum=[],
+        required=["article", "parties", "politicians"],
+        properties=analysis_properties,
+    ),
     "response_mime_type": "application/json",
 }
 
+# Batched requests return one analysis per article, keyed by the article id
+batch_generation_config = {
+    **generation_config,
+    "response_schema": content.Schema(
+        type=content.Type.ARRAY,
+        items=content.Schema(
+            type=content.Type.OBJECT,
+            enum=[],
+            required=["article_id", "article", "parties", "politicians"],
+            properties={
+                "article_id": content.Schema(
+                    type=content.Type.INTEGER,
+                ),
+                **analysis_properties,
+            },
+        ),
+    ),
+}
+
+
+system_instructions = {
+    1: article_analysis_prompt_ru,
+    2: article_analysis_prompt_ee,
+}
+
+batch_instructions = {
+    1: batch_instruction_ru,
+    2: batch_instruction_ee,
+}
+
+
+def system_instruction_for(media_id: int) -> str:
+    system_instruction = system_instructions.get(media_id)
+    if not system_instruction: raise Exception("No system prompt found! Aborting the analysis")
+    return system_instruction
+
+
+def schema_to_dict(schema: content.Schema) -> dict:
+    """Convert a response schema to the plain JSON form used in REST and batch requests"""
+    result = {"type": content.Type(schema.type).name}
+    if schema.properties:
+        result["properties"] = {key: schema_to_dict(value) for key, value in schema.properties.items()}
+    if schema.required:
+        result["required"] = list(schema.required)
+    if "items" in schema:
+        result["items"] = schema_to_dict(schema.items)
+    return result
+
 
 class GeminiSentimentModel(SentimentBaseAnalyzer):
     """Google Gemini interface specific model"""
 
     # noinspection PyTypeChecker
-    def __init__(self, media_id: int):
+    def __init__(self, media_id: int, batch_size: int = 1):
         self.model_name = "gemini-2.0-flash"
-        super().__init__(self.model_name)
+        super().__init__(self.model_name, batch_size=batch_size)
 
         load_dotenv()
         genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 
-        if media_id == 1:
-            system_instruction = article_analysis_prompt_ru
-        elif media_id == 2:
-            system_instruction = article_analysis_prompt_ee
-
-        if not system_instruction: raise Exception("No system prompt found! Aborting the analysis")
+        system_instruction = system_instruction_for(media_id)
+        batch_instruction = batch_instructions[media_id]
 
         self.model = genai.GenerativeModel(
             model_name=self.model_name,
@@ -120,6 +168,27 @@ class GeminiSentimentModel(SentimentBaseAnalyzer):
         )
         self.chat_session = self.model.start_chat()
 
+        self.batch_model = genai.GenerativeModel(
+            model_name=self.model_name,
+            generation_config=batch_generation_config,
+            system_instruction=system_instruction + batch_instruction,
+        )
+
+    def record_usage(self, mode: str, articles: int, response):
+        usage = getattr(response, "usage_metadata", None)
+        self.usage.record(
+            mode,
+            articles,
+            getattr(usage, "prompt_token_count", None),
+            getattr(usage, "candidates_token_count", None)
+        )
+
     def send_message(self, text: str):
         response = self.chat_session.send_message(text)
+        self.record_usage("single", 1, response)
+        return response.text
+
+    def send_batch_message(self, text: str, articles: int):
+        response = self.batch_model.generate_content(text)
+        self.record_usage("batch", articles, response)
         return response.text
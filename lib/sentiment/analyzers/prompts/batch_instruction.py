@@ -0,0 +1,15 @@
+batch_instruction_ru = """
+
+**Пакетный режим:**
+
+Тебе будет передано несколько статей, каждая начинается со строки "ARTICLE_ID: <id>". Проанализируй каждую статью отдельно и независимо от остальных.
+Верни JSON-массив, в котором для каждой статьи есть ровно один объект с полем "article_id" (ID статьи из строки ARTICLE_ID) и результатами анализа в полях "article", "parties" и "politicians".
+"""
+
+batch_instruction_ee = """
+
+**Pakett-režiim:**
+
+Sulle antakse mitu artiklit, igaüks algab reaga "ARTICLE_ID: <id>". Analüüsi iga artiklit eraldi ja teistest sõltumatult.
+Tagasta JSON-massiiv, milles on iga artikli kohta täpselt üks objekt väljaga "article_id" (artikli ID realt ARTICLE_ID) ning analüüsi tulemustega väljadel "article", "parties" ja "politicians".
+"""
@@ -0,0 +1,26 @@
+import importlib
+import os
+
+from lib.sentiment.analyzers.sentiment_base_analyzer import SentimentBaseAnalyzer
+
+# Backends are imported lazily, so e.g. the fake backend works without the Gemini SDK
+ANALYZERS = {
+    "gemini": "lib.sentiment.analyzers.gemini.GeminiSentimentModel",
+    "fake": "lib.sentiment.analyzers.fake.FakeSentimentModel",
+}
+
+DEFAULT_ANALYZER = "gemini"
+
+
+def default_analyzer_name() -> str:
+    return os.getenv("ANALYZER_BACKEND", DEFAULT_ANALYZER)
+
+
+def get_analyzer(name: str, media_id: int, **kwargs) -> SentimentBaseAnalyzer:
+    """Instantiate the analyzer backend registered under `name`"""
+    if name not in ANALYZERS:
+        raise ValueError(f"Unknown analyzer backend '{name}', expected one of: {', '.join(sorted(ANALYZERS))}")
+
+    module_name, class_name = ANALYZERS[name].rsplit(".", 1)
+    analyzer_class = getattr(importlib.import_module(module_name), class_name)
+    return analyzer_class(media_id, **kwargs)
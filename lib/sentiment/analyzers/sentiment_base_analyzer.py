@@ -1,97 +1,271 @@
-import json
-import re
 import time
 from abc import abstractmethod
-from typing import List
+from collections import Counter
+from typing import Dict, List, Optional
 
 from db.db_connector import DBConnector
 from db.models.models import Article, SentimentAnalysis
 from db.parsers.sentiment_parser import SentimentParser
-from lib.crawler.helpers.utils import format_article_request
+from lib.crawler.helpers.utils import format_article_request, format_batch_request
+from lib.logger import get_logger, set_correlation_id, reset_correlation_id
+from lib.sentiment.analyzers.token_usage import TokenUsage
+from lib.sentiment.analyzers.validation import InvalidResponseError, ResponseValidator
+from lib.sentiment.preprocessing import ArticlePreprocessor, PreparedArticle, PreprocessingStats, merge_chunk_analyses
+
+logger = get_logger(__name__)
 
 
 class SentimentBaseAnalyzer:
     """Sentiment Analyzer is an abstract interface to """
 
-    def __init__(self, model_name: str):
-        """Initialize the sentiment analyzer and configure the model"""
+    # Attempts per article and the pause between them
+    max_retries = 3
+    retry_delay = 30
+
+    def __init__(self, model_name: str, batch_size: int = 1, batch_max_chars: int = 6000):
+        """
+        Initialize the sentiment analyzer and configure the model.
+        With `batch_size` > 1, articles shorter than `batch_max_chars` are packed
+        into shared requests to pay the system prompt cost once per batch.
+        """
         self.model_name = model_name
+        self.batch_size = batch_size
+        self.batch_max_chars = batch_max_chars
+        self.usage = TokenUsage()
+        self.validator = ResponseValidator()
+        self.preprocessor = ArticlePreprocessor()
+        self.preprocessing = PreprocessingStats()
+        # Articles per outcome: analyzed, failed, synced from an existing analysis
+        # or reused from the analysis of the near-duplicate's canonical article
+        self.outcomes = Counter()
         self.db = DBConnector()
-        print(f"Initializing '{model_name}' model for article analysis'")
+        logger.info("Initializing model for article analysis", extra={"model": model_name, "batch_size": batch_size})
 
     @abstractmethod
     def send_message(self, text: str):
         pass
 
-    @staticmethod
-    def parse_sentiment(response: json):
-        if isinstance(response, str):
-            cleaned_response = re.sub(r",\s*([}\]])", r"\1", response)
+    def send_batch_message(self, text: str, articles: int):
+        """
+        Send several articles in one request, the response must be a JSON array.
+        Optional, backends that don't override it get every article analyzed on its own.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support batched requests")
 
-            try:
-                parsed_json = json.loads(cleaned_response)
-                return parsed_json
-            except json.JSONDecodeError as e:
-                print(f"JSON decoding error: {e}")
-                return None
-        else:
-            parsed_json = response
-            return parsed_json
+    @property
+    def supports_batching(self) -> bool:
+        return type(self).send_batch_message is not SentimentBaseAnalyzer.send_batch_message
 
     def check_if_analysis_exists(self, article: Article):
         analysis_found = self.db.analysis_exists(article.id, self.model_name)
         if analysis_found:
-            print(f"Analyses found for article '{article.title}'. Skipping article...")
+            logger.debug("Analysis found, skipping article", extra={"article_id": article.id})
             return analysis_found
         return None
 
-    def request_sentiment_analysis(self, article):
-        print(f"Analysis for article '{article.title}' wasn't found. Making a request...")
-
+    def send_with_retries(self, article: Article, body: str):
+        """
+        Send one article text and validate the response, retrying failed calls and
+        responses that could not be repaired. Raises the last error after `max_retries` attempts.
+        """
         retries = 0
-        max_retries = 3
-        retry_delay = 30
-        while retries < max_retries:
+        while True:
             try:
-                response = self.send_message(format_article_request(article.media_id, article.title, article.body))
-                analysis = SentimentAnalysis(
-                    article_id=article.id,
-                    model=self.model_name,
-                    sentiment=self.parse_sentiment(response)
-                )
-                return analysis
+                response = self.send_message(format_article_request(article.media_id, article.title, body))
+                return self.validator.validate(response)
             except Exception as e:
                 retries += 1
-                print(f"Error analyzing '{article.title}': {e}")
-                if retries < max_retries:
-                    print(f"Retrying in {retry_delay} seconds... ({retries}/{max_retries})")
-                    time.sleep(retry_delay)
-                else:
-                    print(f"Skipping '{article.title}' after {max_retries} failed attempts.")
-        return None
+                logger.warning("Error analyzing article: %s", e, extra={"article_id": article.id, "attempt": retries})
+                if retries >= self.max_retries:
+                    raise
+                logger.info("Retrying in %d seconds (%d/%d)", self.retry_delay, retries, self.max_retries,
+                            extra={"article_id": article.id})
+                time.sleep(self.retry_delay)
 
-    def analyze(self, articles: List[Article]):
-        print(f"Analyzing scope is {len(articles)} articles...")
-        parser = SentimentParser()
+    def request_sentiment_analysis(self, article, prepared: Optional[PreparedArticle] = None):
+        logger.debug("Analysis not found, making a request", extra={"article_id": article.id})
+        prepared = prepared or self.preprocessor.prepare(article)
+
+        try:
+            sentiments = [self.send_with_retries(article, chunk) for chunk in prepared.chunks]
+        except Exception:
+            logger.error("Skipping article after %d failed attempts", self.max_retries,
+                         extra={"article_id": article.id})
+            return None
+
+        if prepared.chunked:
+            # Map-reduce of a long article, one request per chunk
+            sentiment = merge_chunk_analyses(sentiments, [len(chunk) for chunk in prepared.chunks])
+            if sentiment is None:
+                logger.error("Skipping article, no chunk was analyzed", extra={
+                    "article_id": article.id, "chunks": len(prepared.chunks)
+                })
+                return None
+        else:
+            sentiment = sentiments[0]
+
+        return SentimentAnalysis(
+            article_id=article.id,
+            media_id=article.media_id,
+            date_time=article.date_time,
+            model=self.model_name,
+            sentiment=sentiment
+        )
+
+    def is_batchable(self, article: Article, prepared: PreparedArticle) -> bool:
+        return (
+            self.batch_size > 1
+            and self.supports_batching
+            and not prepared.chunked
+            and len(article.title) + len(prepared.body) <= self.batch_max_chars
+        )
+
+    def request_batch_analysis(self, articles: List[Article], bodies: Optional[Dict[int, str]] = None) -> Dict[int, dict]:
+        """
+        Request analyses of several articles at once.
+        Returns the well-formed responses keyed by article id, malformed or
+        missing entries are left out so the caller can fall back to single requests.
+        """
+        try:
+            response = self.send_batch_message(format_batch_request(articles, bodies), len(articles))
+            sentiments = self.validator.validate_batch(response)
+        except Exception as e:
+            logger.warning("Batch request failed: %s", e, extra={"articles": len(articles)})
+            return {}
+
+        requested_ids = {article.id for article in articles}
+        return {article_id: sentiment for article_id, sentiment in sentiments.items() if article_id in requested_ids}
+
+    def revalidate(self, analysis: SentimentAnalysis) -> bool:
+        """Normalize a stored analysis in place, returns False when it can not be repaired"""
+        try:
+            sentiment = self.validator.validate(analysis.sentiment)
+        except InvalidResponseError:
+            return False
+
+        if sentiment != analysis.sentiment:
+            analysis.sentiment = sentiment
+            self.db.session.commit()
+        return True
 
+    def sync_analysis(self, parser: SentimentParser, article: Article, analysis: SentimentAnalysis,
+                      validated: bool = False):
+        """Derive the analysis rows, analyses stored without validation are checked and repaired first"""
+        if not validated and not self.revalidate(analysis):
+            logger.warning("Stored analysis is invalid, requesting it again", extra={"article_id": article.id})
+            replacement = self.request_sentiment_analysis(article)
+            analysis = self.db.update_analysis_response(replacement) if replacement else None
+            if analysis is None:
+                logger.error("Did not succeed to override sentiment analysis", extra={"article_id": article.id})
+                return
+
+        parser.sync_analysis(analysis, article)
+
+    def reuse_canonical_analysis(self, parser: SentimentParser, article: Article) -> bool:
+        """Copy the analysis of the canonical article to a near-duplicate instead of requesting it"""
+        canonical = self.db.canonical_analysis(article.id, self.model_name)
+        if canonical is None:
+            return False
+
+        analysis = SentimentAnalysis(
+            article_id=article.id,
+            media_id=article.media_id,
+            date_time=article.date_time,
+            model=self.model_name,
+            sentiment=canonical.sentiment
+        )
+        self.db.insert_analysis_response(analysis)
+        self.outcomes["reused"] += 1
+        logger.debug("Reused analysis of the canonical article", extra={
+            "article_id": article.id, "canonical_article_id": canonical.article_id
+        })
+        self.sync_analysis(parser, article, analysis)
+        return True
+
+    def analyze_article(self, parser: SentimentParser, article: Article, prepared: Optional[PreparedArticle] = None):
+        logger.debug("Analyzing article", extra={"article_id": article.id})
+
+        analysis = self.request_sentiment_analysis(article, prepared)
+        if analysis is None:
+            self.outcomes["failed"] += 1
+            return
+
+        self.db.insert_analysis_response(analysis)
+        self.outcomes["analyzed"] += 1
+        self.sync_analysis(parser, article, analysis, validated=True)
+
+    def analyze_batch(self, parser: SentimentParser, articles: List[Article], prepared: Dict[int, PreparedArticle]):
+        logger.debug("Analyzing batch", extra={"article_ids": [article.id for article in articles]})
+
+        bodies = {article.id: prepared[article.id].body for article in articles}
+        sentiments = self.request_batch_analysis(articles, bodies) if len(articles) > 1 else {}
         for article in articles:
-            print(f"Analyzing article: {article.title} ({article.id})...")
+            sentiment = sentiments.get(article.id)
+            if sentiment is None:
+                # Malformed or missing in the batch response, ask for this article alone
+                self.analyze_article(parser, article, prepared[article.id])
+                continue
+
+            analysis = SentimentAnalysis(
+                article_id=article.id,
+                media_id=article.media_id,
+                date_time=article.date_time,
+                model=self.model_name,
+                sentiment=sentiment
+            )
+            self.db.insert_analysis_response(analysis)
+            self.outcomes["analyzed"] += 1
+            self.sync_analysis(parser, article, analysis, validated=True)
 
+    def analyze(self, articles: List[Article]):
+        token = set_correlation_id()
+        try:
+            self._analyze(articles)
+        finally:
+            reset_correlation_id(token)
+
+    def _analyze(self, articles: List[Article]):
+        logger.info("Analyzing scope is %d articles", len(articles), extra={"model": self.model_name})
+        self.process(SentimentParser(), articles)
+        self.finish()
+
+    def process(self, parser: SentimentParser, articles: List[Article]):
+        """Analyze a page of articles, existing analyses are only synced"""
+        pending, prepared = [], {}
+
+        for article in articles:
             analysis = self.check_if_analysis_exists(article)
-            if not analysis:
-                analysis = self.request_sentiment_analysis(article)
-                self.db.insert_analysis_response(analysis)
+            if analysis:
+                self.outcomes["synced"] += 1
+                self.sync_analysis(parser, article, analysis)
+                continue
+            if self.reuse_canonical_analysis(parser, article):
+                continue
 
-            try:
-                parser.sync_analysis(analysis)
-            except TypeError as e:
-                print("Type error in returned analysis: ", e)
-                print("Will try to rewrite result")
-
-                try:
-                    analysis = self.db.update_analysis_response(self.request_sentiment_analysis(article))
-                    parser.sync_analysis(analysis)
-                except Exception as e:
-                    print(f"Did not succeed to override sentiment analysis for: {article.title}({article.id})", e)
-
-        print("All articles were analyzed")
+            prepared_article = self.preprocessor.prepare(article)
+            self.preprocessing.record(prepared_article)
+            if self.is_batchable(article, prepared_article):
+                pending.append(article)
+                prepared[article.id] = prepared_article
+                if len(pending) >= self.batch_size:
+                    self.analyze_batch(parser, pending, prepared)
+                    pending, prepared = [], {}
+            else:
+                self.analyze_article(parser, article, prepared_article)
+
+        if pending:
+            self.analyze_batch(parser, pending, prepared)
+
+    def rollback(self, parser: SentimentParser):
+        """Discard the failed transactions of the analyzer and the parser after an error"""
+        self.db.session.rollback()
+        parser.rollback()
+
+    def finish(self):
+        self.db.refresh_media_counts()
+        logger.info("All articles were analyzed", extra={
+            "outcomes": dict(self.outcomes),
+            "validation": self.validator.report(),
+            "token_usage": self.usage.report(),
+            "preprocessing": self.preprocessing.report()
+        })
@@ -0,0 +1,35 @@
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+
+class TokenUsage:
+    """Accumulates model token counts per request mode (single, batch, ...)"""
+
+    def __init__(self):
+        self.modes = defaultdict(lambda: {"requests": 0, "articles": 0, "prompt_tokens": 0, "output_tokens": 0})
+
+    def record(self, mode: str, articles: int, prompt_tokens: Optional[int], output_tokens: Optional[int]):
+        stats = self.modes[mode]
+        stats["requests"] += 1
+        stats["articles"] += articles
+        stats["prompt_tokens"] += prompt_tokens or 0
+        stats["output_tokens"] += output_tokens or 0
+
+    def tokens_per_article(self, mode: str) -> Optional[float]:
+        stats = self.modes.get(mode)
+        if not stats or not stats["articles"]:
+            return None
+        return (stats["prompt_tokens"] + stats["output_tokens"]) / stats["articles"]
+
+    def report(self) -> Dict[str, Any]:
+        """Per-mode totals with tokens per article and the batch savings over single requests"""
+        report = {
+            mode: {**stats, "tokens_per_article": round(self.tokens_per_article(mode), 1)}
+            for mode, stats in self.modes.items() if stats["articles"]
+        }
+
+        single, batch = self.tokens_per_article("single"), self.tokens_per_article("batch")
+        if single and batch:
+            report["batch_savings"] = round(1 - batch / single, 3)
+
+        return report
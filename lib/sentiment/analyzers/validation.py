@@ -0,0 +1,235 @@
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
+
+MIN_SCORE = 0
+MAX_SCORE = 10
+
+CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+NUMBER = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+
+class InvalidResponseError(ValueError):
+    """Model response that could not be parsed or repaired into a valid analysis"""
+
+
+def clamp_score(value: Any) -> int:
+    """Coerce a score like 7, 7.4, "7" or "7/10" into an integer within the scale"""
+    if isinstance(value, bool):
+        raise ValueError("score must be a number")
+    if isinstance(value, str):
+        match = NUMBER.search(value)
+        if match is None:
+            raise ValueError(f"score is not a number: {value!r}")
+        value = float(match.group().replace(",", "."))
+    if not isinstance(value, (int, float)):
+        raise ValueError("score must be a number")
+    return min(MAX_SCORE, max(MIN_SCORE, round(value)))
+
+
+class ScoredText(BaseModel):
+    score: int
+    explanation: str = ""
+
+    @model_validator(mode="before")
+    @classmethod
+    def bare_score(cls, value):
+        # {"title": 7} instead of {"title": {"score": 7, ...}}
+        if isinstance(value, (int, float, str)):
+            return {"score": value}
+        return value
+
+    @field_validator("score", mode="before")
+    @classmethod
+    def clamp(cls, value):
+        return clamp_score(value)
+
+    @field_validator("explanation", mode="before")
+    @classmethod
+    def text(cls, value):
+        return "" if value is None else str(value)
+
+
+class ArticleScores(BaseModel):
+    title: ScoredText
+    body: ScoredText
+
+
+class Mention(ScoredText):
+    name: str
+
+    @field_validator("name")
+    @classmethod
+    def strip(cls, value):
+        value = value.strip()
+        if not value:
+            raise ValueError("name is empty")
+        return value
+
+
+class SentimentResponse(BaseModel):
+    """Mirror of `generation_config['response_schema']` in `gemini.py`"""
+
+    article: ArticleScores
+    # Required: a response without one of the lists is re-requested, not repaired into an empty list
+    parties: List[Mention]
+    politicians: List[Mention]
+
+    @field_validator("parties", "politicians", mode="before")
+    @classmethod
+    def mentions(cls, value):
+        if not isinstance(value, list):
+            return value
+        # Drop nameless or unscored entries (e.g. cut off by truncation), unparseable scores and repeated names,
+        # the other mentions of the response are kept
+        mentions, names = [], set()
+        for mention in value:
+            if not isinstance(mention, dict) or not str(mention.get("name") or "").strip() or "score" not in mention:
+                continue
+            try:
+                clamp_score(mention["score"])
+            except ValueError:
+                continue
+            name = str(mention["name"]).strip()
+            if name in names:
+                continue
+            names.add(name)
+            mentions.append(mention)
+        return mentions
+
+
+class BatchSentimentResponse(SentimentResponse):
+    article_id: int
+
+
+def close_truncated(text: str) -> Optional[str]:
+    """
+    Repair output cut off by the token limit: drop the incomplete trailing element
+    and close the open brackets. Returns None when there is nothing to close.
+    """
+    stack, in_string, escaped = [], False, False
+    # Last position where the text can be cut, with the brackets open at that point
+    cut = None
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not stack:
+                return None
+            stack.pop()
+            cut = (index + 1, list(stack))
+        elif char == ",":
+            cut = (index, list(stack))
+
+    if not stack and not in_string:
+        return None
+    if cut is None:
+        return None
+
+    position, open_brackets = cut
+    return text[:position] + "".join(reversed(open_brackets))
+
+
+class ResponseValidator:
+    """
+    Validates model responses once on receipt. Common defects (code fences,
+    trailing commas, surrounding text, truncated output, out-of-range or textual
+    scores, bare scores) are repaired and nameless or unscorable mentions are
+    dropped. Everything else, such as a missing top-level key, is rejected
+    before anything is written.
+    """
+
+    def __init__(self):
+        self.stats = Counter()
+
+    def decode(self, response: Any) -> Any:
+        """Parse the response text into JSON, repairing the text when needed"""
+        if not isinstance(response, str):
+            return response
+
+        text = CODE_FENCE.sub("", response.strip())
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+
+        # Trailing commas and text around the JSON value
+        repaired = TRAILING_COMMA.sub(r"\1", text)
+        starts = [index for index in (repaired.find("{"), repaired.find("[")) if index >= 0]
+        if starts:
+            repaired = repaired[min(starts):]
+            end = max(repaired.rfind("}"), repaired.rfind("]"))
+            candidates = [repaired[:end + 1], repaired] if end >= 0 else [repaired]
+        else:
+            candidates = [repaired]
+
+        for candidate in candidates:
+            try:
+                parsed = json.loads(candidate)
+                self.stats["repaired_syntax"] += 1
+                return parsed
+            except json.JSONDecodeError:
+                pass
+
+        closed = close_truncated(repaired)
+        if closed is not None:
+            try:
+                parsed = json.loads(TRAILING_COMMA.sub(r"\1", closed))
+                self.stats["repaired_truncation"] += 1
+                return parsed
+            except json.JSONDecodeError:
+                pass
+
+        self.stats["undecodable"] += 1
+        raise InvalidResponseError("Response is not valid JSON")
+
+    def validate(self, response: Any) -> Dict[str, Any]:
+        """Return the normalized analysis of a single-article response or raise `InvalidResponseError`"""
+        parsed = self.decode(response)
+        if isinstance(parsed, list) and len(parsed) == 1:
+            parsed = parsed[0]
+
+        try:
+            sentiment = SentimentResponse.model_validate(parsed).model_dump()
+        except ValidationError as e:
+            self.stats["invalid"] += 1
+            raise InvalidResponseError(f"Response does not match the schema: {e.error_count()} errors") from e
+
+        self.stats["valid"] += 1
+        return sentiment
+
+    def validate_batch(self, response: Any) -> Dict[int, Dict[str, Any]]:
+        """Return the valid entries of a batched response keyed by article id, invalid entries are left out"""
+        parsed = self.decode(response)
+        if not isinstance(parsed, list):
+            self.stats["invalid"] += 1
+            raise InvalidResponseError("Batch response is not an array")
+
+        sentiments = {}
+        for item in parsed:
+            try:
+                entry = BatchSentimentResponse.model_validate(item).model_dump()
+            except ValidationError:
+                self.stats["invalid"] += 1
+                continue
+            self.stats["valid"] += 1
+            sentiments[entry.pop("article_id")] = entry
+        return sentiments
+
+    def report(self) -> Dict[str, int]:
+        return dict(self.stats)
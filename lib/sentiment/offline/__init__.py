@@ -0,0 +1,10 @@
+from .clients import BatchJobClient, LocalBatchJobClient, GeminiBatchJobClient, BATCH_CLIENTS
+from .runner import OfflineBatchRunner
+
+__all__ = [
+    "BatchJobClient",
+    "LocalBatchJobClient",
+    "GeminiBatchJobClient",
+    "BATCH_CLIENTS",
+    "OfflineBatchRunner"
+]
@@ -0,0 +1,163 @@
+import json
+import os
+import uuid
+from abc import abstractmethod
+from typing import Callable, Dict, Optional
+
+from lib.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Normalized batch job states
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+def neutral_response(request: dict) -> str:
+    """Schema-valid analysis with neutral scores and no mentions"""
+    return json.dumps({
+        "article": {
+            "title": {"score": 5, "explanation": "offline stub"},
+            "body": {"score": 5, "explanation": "offline stub"},
+        },
+        "parties": [],
+        "politicians": [],
+    })
+
+
+class BatchJobClient:
+    """
+    Interface of an offline batch job service.
+
+    Request files contain one JSON object per line: {"key", "media_id", "text"}.
+    Result files contain one JSON object per line: {"key", "response"} with the
+    raw model output text, or {"key", "error"} for requests that failed.
+    """
+
+    model_name: str = None
+
+    @abstractmethod
+    def submit(self, request_path: str) -> str:
+        """Submit a request file and return the job id"""
+        pass
+
+    @abstractmethod
+    def status(self, job_id: str) -> str:
+        """Return one of PENDING, RUNNING, SUCCEEDED or FAILED"""
+        pass
+
+    @abstractmethod
+    def download(self, job_id: str, results_path: str):
+        """Write the results of a finished job to `results_path`"""
+        pass
+
+
+class LocalBatchJobClient(BatchJobClient):
+    """
+    Local stub that answers every request of a file on submit.
+    `responder` maps a request line to the model output text.
+    """
+
+    def __init__(self, model_name: str = "local-batch", responder: Callable[[dict], str] = neutral_response):
+        self.model_name = model_name
+        self.responder = responder
+        self.jobs: Dict[str, str] = {}
+
+    def submit(self, request_path: str) -> str:
+        job_id = uuid.uuid4().hex
+        results_path = f"{request_path}.{job_id}.results"
+
+        with open(request_path, encoding="utf-8") as requests, open(results_path, "w", encoding="utf-8") as results:
+            for line in requests:
+                request = json.loads(line)
+                try:
+                    result = {"key": request["key"], "response": self.responder(request)}
+                except Exception as e:
+                    result = {"key": request["key"], "error": str(e)}
+                results.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+        self.jobs[job_id] = results_path
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        return SUCCEEDED if job_id in self.jobs else FAILED
+
+    def download(self, job_id: str, results_path: str):
+        os.replace(self.jobs.pop(job_id), results_path)
+
+
+class GeminiBatchJobClient(BatchJobClient):
+    """Gemini Batch Mode client, requires the optional `google-genai` package"""
+
+    states = {
+        "JOB_STATE_PENDING": PENDING,
+        "JOB_STATE_RUNNING": RUNNING,
+        "JOB_STATE_SUCCEEDED": SUCCEEDED,
+        "JOB_STATE_FAILED": FAILED,
+        "JOB_STATE_CANCELLED": FAILED,
+        "JOB_STATE_EXPIRED": FAILED,
+    }
+
+    def __init__(self, model_name: str = "gemini-2.0-flash", api_key: Optional[str] = None):
+        from dotenv import load_dotenv
+        from google import genai
+
+        load_dotenv()
+        self.model_name = model_name
+        self.client = genai.Client(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+
+    @staticmethod
+    def to_gemini_request(request: dict) -> dict:
+        from lib.sentiment.analyzers.gemini import generation_config, schema_to_dict, system_instruction_for
+
+        config = {key: value for key, value in generation_config.items() if key != "response_schema"}
+        config["response_schema"] = schema_to_dict(generation_config["response_schema"])
+        return {
+            "key": request["key"],
+            "request": {
+                "contents": [{"role": "user", "parts": [{"text": request["text"]}]}],
+                "system_instruction": {"parts": [{"text": system_instruction_for(request["media_id"])}]},
+                "generation_config": config,
+            },
+        }
+
+    def submit(self, request_path: str) -> str:
+        gemini_path = f"{request_path}.gemini"
+        with open(request_path, encoding="utf-8") as requests, open(gemini_path, "w", encoding="utf-8") as output:
+            for line in requests:
+                output.write(json.dumps(self.to_gemini_request(json.loads(line)), ensure_ascii=False) + "\n")
+
+        uploaded = self.client.files.upload(file=gemini_path, config={"mime_type": "jsonl"})
+        job = self.client.batches.create(model=self.model_name, src=uploaded.name)
+        logger.info("Submitted Gemini batch job", extra={"job": job.name, "file": uploaded.name})
+        return job.name
+
+    def status(self, job_id: str) -> str:
+        job = self.client.batches.get(name=job_id)
+        return self.states.get(job.state.name, RUNNING)
+
+    def download(self, job_id: str, results_path: str):
+        job = self.client.batches.get(name=job_id)
+        content = self.client.files.download(file=job.dest.file_name).decode("utf-8")
+
+        with open(results_path, "w", encoding="utf-8") as results:
+            for line in content.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                try:
+                    text = item["response"]["candidates"][0]["content"]["parts"][0]["text"]
+                    result = {"key": item["key"], "response": text}
+                except (KeyError, IndexError, TypeError):
+                    result = {"key": item.get("key"), "error": item.get("error") or "Empty response"}
+                results.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+BATCH_CLIENTS = {
+    "local": LocalBatchJobClient,
+    "gemini": GeminiBatchJobClient,
+}
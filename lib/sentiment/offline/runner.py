@@ -0,0 +1,164 @@
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List
+
+from db.db_connector import DBConnector
+from db.models.models import Article, SentimentAnalysis
+from db.parsers.sentiment_parser import SentimentParser
+from lib.crawler.helpers.utils import format_article_request
+from lib.logger import get_logger
+from lib.sentiment.analyzers.validation import InvalidResponseError, ResponseValidator
+from lib.sentiment.offline.clients import BatchJobClient, FAILED, FINISHED_STATES
+from lib.sentiment.preprocessing import ArticlePreprocessor, PreprocessingStats
+
+logger = get_logger(__name__)
+
+
+class OfflineBatchRunner:
+    """
+    Runs analyses through an offline batch job service instead of interactive calls:
+    export pending articles to a JSONL request file, submit and poll the job,
+    then ingest the results file in bulk through `SentimentParser`.
+    """
+
+    def __init__(self, client: BatchJobClient, ingest_chunk_size: int = 500):
+        self.client = client
+        self.model_name = client.model_name
+        self.ingest_chunk_size = ingest_chunk_size
+        self.db = DBConnector()
+        self.preprocessor = ArticlePreprocessor()
+        self.preprocessing = PreprocessingStats()
+        self.validator = ResponseValidator()
+
+    def export(self, articles: Iterable[Article], request_path: str) -> int:
+        """
+        Write one request line per article, returns the number of requests.
+        Results are ingested per key, so long bodies are truncated rather than chunked.
+        """
+        count = 0
+        with open(request_path, "w", encoding="utf-8") as requests:
+            for article in articles:
+                prepared = self.preprocessor.prepare(article, chunking=False)
+                self.preprocessing.record(prepared)
+                requests.write(json.dumps({
+                    "key": str(article.id),
+                    "media_id": article.media_id,
+                    "text": format_article_request(article.media_id, article.title, prepared.body),
+                }, ensure_ascii=False) + "\n")
+                count += 1
+
+        logger.info("Exported batch requests",
+                    extra={"path": request_path, "requests": count, "preprocessing": self.preprocessing.report()})
+        return count
+
+    def wait(self, job_id: str, poll_interval: float = 60) -> str:
+        while True:
+            status = self.client.status(job_id)
+            if status in FINISHED_STATES:
+                return status
+            logger.debug("Batch job is %s", status, extra={"job": job_id})
+            time.sleep(poll_interval)
+
+    def ingest(self, results_path: str) -> Dict[str, Any]:
+        """Store all valid results of a results file, returns ingest statistics"""
+        stats = {"results": 0, "ingested": 0, "skipped": 0, "errors": 0, "invalid": 0}
+        parser = SentimentParser()
+
+        chunk = []
+        with open(results_path, encoding="utf-8") as results:
+            for line in results:
+                if not line.strip():
+                    continue
+                stats["results"] += 1
+                chunk.append(json.loads(line))
+                if len(chunk) >= self.ingest_chunk_size:
+                    self._ingest_chunk(parser, chunk, stats)
+                    chunk = []
+
+        if chunk:
+            self._ingest_chunk(parser, chunk, stats)
+
+        logger.info("Ingested batch results", extra={"path": results_path, "validation": self.validator.report(), **stats})
+        return stats
+
+    @staticmethod
+    def _article_id(result: dict):
+        """Article id a result is keyed by, None for a missing or malformed key"""
+        try:
+            return int(result.get("key"))
+        except (TypeError, ValueError):
+            return None
+
+    def _ingest_chunk(self, parser: SentimentParser, results: List[dict], stats: Dict[str, int]):
+        article_ids = list({self._article_id(result) for result in results} - {None})
+        articles = {
+            article.id: article
+            for article in self.db.session.query(Article).filter(Article.id.in_(article_ids)).all()
+        }
+        # Articles analyzed by this model before, e.g. by an interactive run or an earlier ingest of the file
+        analyzed = {
+            article_id for (article_id,) in self.db.session.query(SentimentAnalysis.article_id).filter(
+                SentimentAnalysis.article_id.in_(article_ids),
+                SentimentAnalysis.model == self.model_name
+            )
+        }
+
+        analyses = []
+        for result in results:
+            article_id = self._article_id(result)
+            article = articles.get(article_id)
+            if article_id in analyzed:
+                stats["skipped"] += 1
+                logger.debug("Analysis found, skipping article", extra={"article_id": article_id})
+                continue
+            if "error" in result or article is None:
+                stats["errors"] += 1
+                logger.warning("Batch request failed: %s", result.get("error"), extra={"article_id": result.get("key")})
+                continue
+
+            try:
+                sentiment = self.validator.validate(result["response"])
+            except InvalidResponseError as e:
+                stats["invalid"] += 1
+                logger.warning("Invalid batch response: %s", e, extra={"article_id": article.id})
+                continue
+
+            analyzed.add(article.id)
+            analyses.append((article, SentimentAnalysis(
+                article_id=article.id,
+                media_id=article.media_id,
+                date_time=article.date_time,
+                model=self.model_name,
+                sentiment=sentiment
+            )))
+
+        # One commit for the whole chunk, then derive the analysis rows from the validated responses
+        self.db.session.add_all([analysis for _, analysis in analyses])
+        self.db.session.commit()
+
+        for article, analysis in analyses:
+            parser.sync_analysis(analysis, article)
+            stats["ingested"] += 1
+
+    def run(self, articles: Iterable[Article], workdir: str, poll_interval: float = 60) -> Dict[str, Any]:
+        """Export, submit, wait for and ingest a batch job"""
+        os.makedirs(workdir, exist_ok=True)
+        request_path = os.path.join(workdir, f"requests-{int(time.time())}.jsonl")
+        results_path = f"{request_path[:-len('.jsonl')]}.results.jsonl"
+
+        if not self.export(articles, request_path):
+            return {"requests": 0}
+
+        job_id = self.client.submit(request_path)
+        logger.info("Batch job submitted", extra={"job": job_id})
+
+        status = self.wait(job_id, poll_interval)
+        if status == FAILED:
+            logger.error("Batch job failed", extra={"job": job_id})
+            return {"job": job_id, "status": status}
+
+        self.client.download(job_id, results_path)
+        stats = self.ingest(results_path)
+        self.db.refresh_media_counts()
+        return {"job": job_id, "status": status, **stats}
@@ -0,0 +1,236 @@
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+# Strategies for bodies over the token budget
+TRUNCATE = "truncate"
+CHUNK = "chunk"
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+# Related-article links, the marker and the linked headline up to the end of its sentence
+RELATED_LINKS = re.compile(
+    r"(?:\b(?:Loe ka|Loe lisaks|Vaata ka)\b|Читайте также|Смотрите также)\s*:?[^.!?]{0,150}[.!?]?",
+    re.IGNORECASE
+)
+PHOTO_CREDITS = re.compile(r"\b(?:Foto|Фото)\s*:\s*[^/.!?]{1,60}/\s*\S+", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+class BudgetPolicy:
+    """Token budget of article bodies sent to the model"""
+
+    def __init__(self, max_tokens: int = 3000, strategy: str = CHUNK, chunk_tokens: int = 2000,
+                 chars_per_token: float = 4, max_chunks: int = 4):
+        if strategy not in (TRUNCATE, CHUNK):
+            raise ValueError(f"Unknown strategy '{strategy}', expected '{TRUNCATE}' or '{CHUNK}'")
+        self.max_tokens = max_tokens
+        self.strategy = strategy
+        self.chunk_tokens = chunk_tokens
+        self.chars_per_token = chars_per_token
+        # Chunks beyond this are dropped, so a single article can not fan out into dozens of requests
+        self.max_chunks = max_chunks
+
+    def estimate_tokens(self, text: str) -> int:
+        return int(len(text) / self.chars_per_token) + 1
+
+    def to_chars(self, tokens: int) -> int:
+        return int(tokens * self.chars_per_token)
+
+
+# Cyrillic text takes more tokens per character than Estonian
+MEDIA_POLICIES: Dict[int, BudgetPolicy] = {
+    1: BudgetPolicy(chars_per_token=3),
+    2: BudgetPolicy(chars_per_token=4),
+}
+
+DEFAULT_POLICY = BudgetPolicy()
+
+
+def policy_for(media_id: int) -> BudgetPolicy:
+    return MEDIA_POLICIES.get(media_id, DEFAULT_POLICY)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in SENTENCE_END.split(text) if sentence]
+
+
+def trim_boilerplate(body: str) -> str:
+    """
+    Drop related-article links, photo credits and sentences repeating the one
+    before them, such as a byline printed twice. Repeats further apart are kept,
+    a quote or refrain repeated in the text is content.
+    """
+    body = RELATED_LINKS.sub(" ", body)
+    body = PHOTO_CREDITS.sub(" ", body)
+
+    sentences = []
+    for sentence in split_sentences(WHITESPACE.sub(" ", body).strip()):
+        if sentences and sentence.lower() == sentences[-1].lower():
+            continue
+        sentences.append(sentence)
+
+    return " ".join(sentences)
+
+
+def pack_sentences(sentences: List[str], max_chars: int) -> List[str]:
+    """Group sentences into chunks of at most `max_chars`, splitting sentences only when they do not fit alone"""
+    chunks, current = [], ""
+    for sentence in sentences:
+        while len(sentence) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class PreparedArticle:
+    """Article body fitted into the token budget, as one or more chunks"""
+
+    def __init__(self, article_id: int, chunks: List[str], tokens_before: int, tokens_after: int,
+                 trimmed_chars: int, truncated: bool):
+        self.article_id = article_id
+        self.chunks = chunks
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.trimmed_chars = trimmed_chars
+        self.truncated = truncated
+
+    @property
+    def body(self) -> str:
+        return " ".join(self.chunks)
+
+    @property
+    def chunked(self) -> bool:
+        return len(self.chunks) > 1
+
+
+class ArticlePreprocessor:
+    """Trims boilerplate and fits article bodies into the budget of their media policy"""
+
+    def __init__(self, policies: Optional[Dict[int, BudgetPolicy]] = None):
+        self.policies = policies if policies is not None else MEDIA_POLICIES
+
+    def policy(self, media_id: int) -> BudgetPolicy:
+        return self.policies.get(media_id, DEFAULT_POLICY)
+
+    def prepare(self, article, chunking: bool = True) -> PreparedArticle:
+        """
+        Prepare the body of an article. Bodies over the budget are truncated at a
+        sentence boundary, or split into chunks for map-reduce when the policy and
+        `chunking` allow it.
+        """
+        policy = self.policy(article.media_id)
+        body = article.body or ""
+        trimmed = trim_boilerplate(body)
+        tokens_before = policy.estimate_tokens(body)
+
+        if policy.estimate_tokens(trimmed) <= policy.max_tokens:
+            chunks = [trimmed]
+            truncated = False
+        elif policy.strategy == CHUNK and chunking:
+            chunks = pack_sentences(split_sentences(trimmed), policy.to_chars(policy.chunk_tokens))
+            truncated = len(chunks) > policy.max_chunks
+            chunks = chunks[:policy.max_chunks]
+        else:
+            chunks = pack_sentences(split_sentences(trimmed), policy.to_chars(policy.max_tokens))[:1]
+            truncated = True
+
+        return PreparedArticle(
+            article_id=article.id,
+            chunks=chunks or [""],
+            tokens_before=tokens_before,
+            tokens_after=sum(policy.estimate_tokens(chunk) for chunk in chunks),
+            trimmed_chars=len(body) - len(trimmed),
+            truncated=truncated
+        )
+
+
+def weighted_score(scores: List[float], weights: List[float]) -> int:
+    return round(sum(score * weight for score, weight in zip(scores, weights)) / sum(weights))
+
+
+def merge_mentions(analyses: List[dict], weights: List[float], key: str) -> List[dict]:
+    mentions = defaultdict(list)
+    for analysis, weight in zip(analyses, weights):
+        for mention in analysis.get(key) or []:
+            mentions[mention["name"]].append((mention, weight))
+
+    merged = []
+    for name, items in mentions.items():
+        explanation = max(items, key=lambda item: item[1])[0].get("explanation")
+        merged.append({
+            "name": name,
+            "score": weighted_score([mention["score"] for mention, _ in items], [weight for _, weight in items]),
+            "explanation": explanation,
+        })
+    return merged
+
+
+def merge_chunk_analyses(analyses: List[Optional[dict]], weights: List[float]) -> Optional[dict]:
+    """
+    Reduce the analyses of the chunks of one article: scores are averaged
+    weighted by chunk length, mentions are merged by name and the explanations
+    are taken from the largest chunk.
+    """
+    valid = [
+        (analysis, weight) for analysis, weight in zip(analyses, weights)
+        if isinstance(analysis, dict) and isinstance(analysis.get("article"), dict)
+    ]
+    if not valid:
+        return None
+    analyses, weights = [analysis for analysis, _ in valid], [weight for _, weight in valid]
+    largest = analyses[weights.index(max(weights))]
+
+    article = {}
+    for part in ("title", "body"):
+        article[part] = {
+            "score": weighted_score([analysis["article"][part]["score"] for analysis in analyses], weights),
+            "explanation": largest["article"][part].get("explanation"),
+        }
+
+    return {
+        "article": article,
+        "parties": merge_mentions(analyses, weights, "parties"),
+        "politicians": merge_mentions(analyses, weights, "politicians"),
+    }
+
+
+class PreprocessingStats:
+    """Accumulates per-run statistics of the preprocessing stage"""
+
+    def __init__(self):
+        self.stats = {
+            "articles": 0,
+            "tokens_before": 0,
+            "tokens_after": 0,
+            "trimmed_chars": 0,
+            "truncated": 0,
+            "chunked": 0,
+            "chunks": 0,
+        }
+
+    def record(self, prepared: PreparedArticle):
+        self.stats["articles"] += 1
+        self.stats["tokens_before"] += prepared.tokens_before
+        self.stats["tokens_after"] += prepared.tokens_after
+        self.stats["trimmed_chars"] += prepared.trimmed_chars
+        self.stats["truncated"] += int(prepared.truncated)
+        self.stats["chunked"] += int(prepared.chunked)
+        self.stats["chunks"] += len(prepared.chunks)
+
+    def report(self) -> Dict[str, Any]:
+        report = dict(self.stats)
+        if self.stats["tokens_before"]:
+            report["tokens_saved"] = round(1 - self.stats["tokens_after"] / self.stats["tokens_before"], 3)
+        return report
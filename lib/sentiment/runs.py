@@ -0,0 +1,185 @@
+from collections import Counter
+from typing import Any, Dict, List
+
+from sqlalchemy import desc, exists, func, text, tuple_
+
+from db.db_connector import DBConnector
+from db.models.models import AnalysisRun, Article, SentimentAnalysis
+from db.parsers.sentiment_parser import SentimentParser
+from lib.logger import get_logger, set_correlation_id, reset_correlation_id
+from lib.sentiment.analyzers.sentiment_base_analyzer import SentimentBaseAnalyzer
+
+logger = get_logger(__name__)
+
+# Key space of the advisory locks held on runs, the second key is the run id
+RUN_LOCK_NAMESPACE = 20261019
+
+
+class CheckpointedRun:
+    """
+    Analyzer run over the pending articles of one media that checkpoints after every page.
+
+    The run is tracked in `analysis_runs`. A restarted process resumes the oldest
+    unfinished run that no live process holds (session-level advisory lock),
+    starting after its persisted cursor. Pages are claimed with
+    `FOR NO KEY UPDATE SKIP LOCKED`, so several processes can analyze the same
+    media without overlapping, and the checkpoint is committed together with
+    the release of the page.
+
+    A page that raises is retried article by article. An article still failing
+    after `max_attempts` is counted as failed and the cursor moves past it, it
+    stays pending for the next run.
+    """
+
+    max_attempts = 2
+
+    def __init__(self, analyzer: SentimentBaseAnalyzer, media_id: int, page_size: int = 50, paywall: bool = False):
+        self.analyzer = analyzer
+        self.media_id = media_id
+        self.page_size = page_size
+        self.paywall = paywall
+
+        # Claims, checkpoints and the run lock live on one dedicated connection,
+        # the analyzer commits its results through its own session
+        db = DBConnector()
+        self.connection = db.engine.connect()
+        self.session = db.Session(bind=self.connection)
+        self.run = None
+
+    def try_lock(self, run_id: int) -> bool:
+        return self.session.execute(
+            text("SELECT pg_try_advisory_lock(:namespace, :run_id)"),
+            {"namespace": RUN_LOCK_NAMESPACE, "run_id": run_id}
+        ).scalar()
+
+    def unlock(self, run_id: int):
+        self.session.execute(
+            text("SELECT pg_advisory_unlock(:namespace, :run_id)"),
+            {"namespace": RUN_LOCK_NAMESPACE, "run_id": run_id}
+        )
+
+    def acquire(self) -> AnalysisRun:
+        """Resume an unfinished run that no other process holds, or start a new one"""
+        unfinished = (
+            self.session
+            .query(AnalysisRun)
+            .filter_by(media_id=self.media_id, model=self.analyzer.model_name, status=AnalysisRun.RUNNING)
+            .order_by(AnalysisRun.id)
+            .all()
+        )
+        for run in unfinished:
+            if self.try_lock(run.id):
+                self.session.commit()
+                logger.info("Resuming analysis run", extra={**run.to_dict(), "cursor": run.cursor_article_id})
+                return run
+
+        run = AnalysisRun(
+            media_id=self.media_id,
+            model=self.analyzer.model_name,
+            status=AnalysisRun.RUNNING,
+            processed=0,
+            analyzed=0,
+            failed=0
+        )
+        self.session.add(run)
+        self.session.flush()
+        self.try_lock(run.id)
+        self.session.commit()
+        logger.info("Started analysis run", extra=run.to_dict())
+        return run
+
+    def claim_page(self) -> List[Article]:
+        """Lock the next page of pending articles after the cursor, skipping pages claimed by other processes"""
+        analysed = exists().where(
+            SentimentAnalysis.article_id == Article.id,
+            SentimentAnalysis.model == self.analyzer.model_name
+        )
+        query = (
+            self.session
+            .query(Article)
+            .filter(
+                Article.media_id == self.media_id,
+                Article.paywall == self.paywall,
+                Article.date_time.isnot(None),
+                ~analysed
+            )
+        )
+        if self.run.cursor_date_time is not None:
+            query = query.filter(
+                tuple_(Article.date_time, Article.id) < tuple_(self.run.cursor_date_time, self.run.cursor_article_id)
+            )
+
+        # NO KEY UPDATE does not conflict with the key share locks of the analyses referencing the article
+        return (
+            query
+            .order_by(desc(Article.date_time), desc(Article.id))
+            .limit(self.page_size)
+            .with_for_update(skip_locked=True, key_share=True, of=Article)
+            .all()
+        )
+
+    def checkpoint(self, page: List[Article], outcomes: Counter):
+        last = page[-1]
+        self.run.cursor_date_time = last.date_time
+        self.run.cursor_article_id = last.id
+        self.run.processed += len(page)
+        self.run.analyzed += outcomes["analyzed"]
+        self.run.failed += outcomes["failed"]
+        # Persists the checkpoint and releases the page locks at once
+        self.session.commit()
+        logger.debug("Checkpoint saved", extra={**self.run.to_dict(), "cursor": last.id})
+
+    def process_article(self, parser: SentimentParser, article: Article):
+        """Process a single article of a failed page, counting it as failed after `max_attempts`"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.analyzer.process(parser, [article])
+                return
+            except Exception as e:
+                self.analyzer.rollback(parser)
+                error = str(e)
+                logger.warning("Article failed: %s", e, extra={"article_id": article.id, "attempt": attempt})
+
+        self.analyzer.outcomes["failed"] += 1
+        self.run.last_error = error
+        logger.error("Skipping article after %d failed attempts", self.max_attempts, extra={"article_id": article.id})
+
+    def execute(self) -> Dict[str, Any]:
+        parser = SentimentParser()
+
+        while True:
+            page = self.claim_page()
+            if not page:
+                break
+
+            before = Counter(self.analyzer.outcomes)
+            try:
+                self.analyzer.process(parser, page)
+            except Exception as e:
+                self.analyzer.rollback(parser)
+                logger.error("Page failed, retrying article by article: %s", e, extra={"articles": len(page)})
+                for article in page:
+                    self.process_article(parser, article)
+
+            self.checkpoint(page, self.analyzer.outcomes - before)
+
+        self.run.status = AnalysisRun.FINISHED
+        self.run.finished_at = func.now()
+        self.session.commit()
+        self.analyzer.finish()
+        return self.run.to_dict()
+
+    def start(self) -> Dict[str, Any]:
+        """Run until no pending articles are left, returns the run counters"""
+        self.run = self.acquire()
+        token = set_correlation_id(f"analysis-run-{self.run.id}")
+        try:
+            stats = self.execute()
+            logger.info("Analysis run finished", extra=stats)
+            return stats
+        finally:
+            reset_correlation_id(token)
+            self.unlock(self.run.id)
+            self.session.commit()
+            self.session.close()
+            self.connection.close()
@@ -0,0 +1,250 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from datetime import timedelta
+from typing import Dict, List
+
+from sqlalchemy import case, delete, func, select, update
+
+from db.db_connector import DBConnector
+from db.models.models import AnalysisQueue, Article, SentimentAnalysis
+from db.parsers.sentiment_parser import SentimentParser
+from lib.logger import get_logger, set_correlation_id, reset_correlation_id
+from lib.sentiment.analyzers.registry import ANALYZERS, default_analyzer_name, get_analyzer
+from lib.sentiment.analyzers.sentiment_base_analyzer import SentimentBaseAnalyzer
+
+logger = get_logger(__name__)
+
+
+class AnalysisWorker:
+    """
+    Analyzer worker pulling articles from the `analysis_queue` table.
+
+    Entries are claimed with `FOR UPDATE SKIP LOCKED` under a time-limited lease,
+    a heartbeat thread extends the leases while the analysis runs. Entries of a
+    crashed worker are claimed again once their lease expires, until
+    `max_attempts` is reached.
+    """
+
+    def __init__(
+        self,
+        backend: str,
+        batch_size: int = 1,
+        claim_size: int = 10,
+        lease_seconds: int = 300,
+        max_attempts: int = 3,
+        poll_interval: float = 10,
+        worker_id: str = None
+    ):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.claim_size = claim_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.db = DBConnector()
+        self.parser = SentimentParser()
+        self.analyzers: Dict[int, SentimentBaseAnalyzer] = {}
+        self.stopping = threading.Event()
+
+    def analyzer(self, media_id: int) -> SentimentBaseAnalyzer:
+        # Prompts depend on the media, so each media gets its own analyzer
+        if media_id not in self.analyzers:
+            self.analyzers[media_id] = get_analyzer(self.backend, media_id, batch_size=self.batch_size)
+        return self.analyzers[media_id]
+
+    def claim(self) -> list:
+        """Lease up to `claim_size` queued or expired entries"""
+        claimable = (
+            select(AnalysisQueue.id)
+            .where(
+                (AnalysisQueue.status == AnalysisQueue.QUEUED)
+                | ((AnalysisQueue.status == AnalysisQueue.LEASED) & (AnalysisQueue.lease_expires_at < func.now()))
+            )
+            .order_by(AnalysisQueue.id)
+            .limit(self.claim_size)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = self.db.session.execute(
+            update(AnalysisQueue)
+            .where(AnalysisQueue.id.in_(claimable.scalar_subquery()))
+            .values(
+                status=AnalysisQueue.LEASED,
+                leased_by=self.worker_id,
+                lease_expires_at=func.now() + self.lease,
+                heartbeat_at=func.now(),
+                attempts=AnalysisQueue.attempts + 1
+            )
+            .returning(AnalysisQueue.id, AnalysisQueue.article_id, AnalysisQueue.media_id,
+                       AnalysisQueue.attempts, AnalysisQueue.enqueued_at)
+        ).all()
+        self.db.session.commit()
+        return claimed
+
+    def heartbeat(self):
+        """Extend the leases of this worker until it stops, on a connection of its own"""
+        db = DBConnector()
+        try:
+            while not self.stopping.wait(self.lease.total_seconds() / 3):
+                db.session.execute(
+                    update(AnalysisQueue)
+                    .where(AnalysisQueue.leased_by == self.worker_id, AnalysisQueue.status == AnalysisQueue.LEASED)
+                    .values(lease_expires_at=func.now() + self.lease, heartbeat_at=func.now())
+                )
+                db.session.commit()
+        finally:
+            db.close()
+
+    def complete(self, jobs, analysed_ids, error: str = None):
+        """Delete the analysed entries, requeue the others or give up after `max_attempts`"""
+        done = [job.id for job in jobs if job.article_id in analysed_ids]
+        retry = [job.id for job in jobs if job.article_id not in analysed_ids]
+
+        if done:
+            self.db.session.execute(delete(AnalysisQueue).where(AnalysisQueue.id.in_(done)))
+        if retry:
+            self.db.session.execute(
+                update(AnalysisQueue)
+                .where(AnalysisQueue.id.in_(retry), AnalysisQueue.leased_by == self.worker_id)
+                .values(
+                    status=case(
+                        (AnalysisQueue.attempts >= self.max_attempts, AnalysisQueue.FAILED),
+                        else_=AnalysisQueue.QUEUED
+                    ),
+                    leased_by=None,
+                    lease_expires_at=None,
+                    last_error=error or "No analysis stored"
+                )
+            )
+        self.db.session.commit()
+
+        if done:
+            logger.info("Analyzed queued articles", extra={
+                "done": len(done),
+                "retry": len(retry),
+                "oldest_enqueued_at": min(job.enqueued_at for job in jobs if job.id in done)
+            })
+
+    def process(self, jobs) -> int:
+        article_ids = [job.article_id for job in jobs]
+        articles = self.db.session.query(Article).filter(Article.id.in_(article_ids)).all()
+
+        error = None
+        by_media: Dict[int, List[Article]] = {}
+        for article in articles:
+            by_media.setdefault(article.media_id, []).append(article)
+
+        analysed_ids = set()
+        for media_id, media_articles in by_media.items():
+            analyzer = self.analyzer(media_id)
+            try:
+                analyzer.process(self.parser, media_articles)
+            except Exception as e:
+                analyzer.rollback(self.parser)
+                error = str(e)
+                logger.error("Analysis of queued articles failed: %s", e, extra={"media_id": media_id})
+
+            analysed_ids.update(
+                article_id for article_id, in self.db.session.query(SentimentAnalysis.article_id).filter(
+                    SentimentAnalysis.article_id.in_([article.id for article in media_articles]),
+                    SentimentAnalysis.model == analyzer.model_name
+                )
+            )
+
+        self.complete(jobs, analysed_ids, error)
+        return len(analysed_ids)
+
+    def run(self, once: bool = False):
+        """Process the queue until stopped, or until it is empty with `once`"""
+        token = set_correlation_id(self.worker_id)
+        heartbeat = threading.Thread(target=self.heartbeat, name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        logger.info("Worker started", extra={"backend": self.backend, "claim_size": self.claim_size})
+
+        processed_since_refresh = 0
+        try:
+            while not self.stopping.is_set():
+                jobs = self.claim()
+                if jobs:
+                    processed_since_refresh += self.process(jobs)
+                    continue
+
+                # The queue is drained, publish the new counts once
+                if processed_since_refresh:
+                    self.db.refresh_media_counts()
+                    processed_since_refresh = 0
+                if once:
+                    break
+                self.stopping.wait(self.poll_interval)
+        finally:
+            self.stopping.set()
+            heartbeat.join()
+            self.db.close()
+            reset_correlation_id(token)
+            logger.info("Worker stopped")
+
+    def stop(self, *_):
+        self.stopping.set()
+
+
+def run_worker(options: dict, once: bool):
+    worker = AnalysisWorker(**options)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=once)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m lib.sentiment.worker")
+    parser.add_argument("--backend", choices=sorted(ANALYZERS), default=default_analyzer_name())
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes to start on this host")
+    parser.add_argument("--batch-size", type=int, default=1, help="Articles packed into one model request")
+    parser.add_argument("--claim-size", type=int, default=10, help="Queue entries leased at once")
+    parser.add_argument("--lease-seconds", type=int, default=300)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--poll-interval", type=float, default=10)
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    parser.add_argument("--enqueue-pending", type=int, metavar="MEDIA_ID",
+                        help="Queue the media's articles without an analysis before starting")
+    args = parser.parse_args()
+
+    if args.enqueue_pending:
+        model_name = get_analyzer(args.backend, args.enqueue_pending).model_name
+        queued = DBConnector().enqueue_pending(args.enqueue_pending, model_name)
+        logger.info("Queued pending articles", extra={"media_id": args.enqueue_pending, "queued": queued})
+
+    options = {
+        "backend": args.backend,
+        "batch_size": args.batch_size,
+        "claim_size": args.claim_size,
+        "lease_seconds": args.lease_seconds,
+        "max_attempts": args.max_attempts,
+        "poll_interval": args.poll_interval,
+    }
+    if args.workers == 1:
+        run_worker(options, args.once)
+        return
+
+    # Spawned processes start with their own engine and logging listener
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(options, args.once), name=f"analysis-worker-{index}")
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+if __name__ == "__main__":
+    main()